@@ -2,12 +2,48 @@ import os
 import pandas as pd
 import yaml
 import logging
-from typing import Dict, List
+from typing import Dict, List, Tuple
 from datetime import datetime
 
 BASE_DATA_DIR=r"C:\Users\bhish\OneDrive\Desktop\AgriSupport\ML\TrainingReports"
+DEFAULT_CONFIG_PATH = r"C:\Users\bhish\OneDrive\Desktop\AgriSupport\ML\AgriYield_ForeCaster\configs\training_config.yaml"
+
+# Parsed YAML configs keyed by (path, mtime_ns) so repeated loaders skip re-reading the file
+_CONFIG_CACHE: Dict[tuple, Dict] = {}
+
+def discover_farm_ids(crop_name: str = None, config_path: str = DEFAULT_CONFIG_PATH) -> List[str]:
+    """Farm directories under the configured data root (with a CSV for ``crop_name``, if given)"""
+    with open(config_path) as f:
+        base_path = yaml.safe_load(f)['data']['base_path']
+    if not os.path.isdir(base_path):
+        return []
+
+    farm_ids = []
+    for farm_id in sorted(os.listdir(base_path)):
+        crops_dir = os.path.join(base_path, farm_id, "crops")
+        if not os.path.isdir(crops_dir):
+            continue
+        if crop_name and not os.path.exists(os.path.join(crops_dir, crop_name.replace(" ", "_") + ".csv")):
+            continue
+        farm_ids.append(farm_id)
+    return farm_ids
+
+def discover_crop_datasets(config_path: str = DEFAULT_CONFIG_PATH) -> List[Tuple[str, str]]:
+    """Every (farm_id, crop) with a crop CSV under the configured data root"""
+    with open(config_path) as f:
+        base_path = yaml.safe_load(f)['data']['base_path']
+
+    datasets = []
+    for farm_id in discover_farm_ids(config_path=config_path):
+        crops_dir = os.path.join(base_path, farm_id, "crops")
+        for name in sorted(os.listdir(crops_dir)):
+            if name.endswith(".csv"):
+                # Inverse of CropDataLoader.crop_file_path
+                datasets.append((farm_id, name[:-len(".csv")].replace("_", " ")))
+    return datasets
+
 class CropDataLoader:
-    def __init__(self, farm_id: str, config_path: str = r"C:\Users\bhish\OneDrive\Desktop\AgriSupport\ML\AgriYield_ForeCaster\configs\training_config.yaml"):
+    def __init__(self, farm_id: str, config_path: str = DEFAULT_CONFIG_PATH):
         self.farm_id = farm_id
         self.config = self._load_config(config_path)
         self.base_path = self.config['data']['base_path']
@@ -16,6 +52,10 @@ class CropDataLoader:
         self._validate_farm()
 
     def _load_config(self, config_path: str) -> Dict:
+        cache_key = (os.path.abspath(config_path), os.stat(config_path).st_mtime_ns)
+        if cache_key in _CONFIG_CACHE:
+            return _CONFIG_CACHE[cache_key]
+
         with open(config_path) as f:
             config = yaml.safe_load(f)
 
@@ -23,6 +63,7 @@ class CropDataLoader:
         missing = [k for k in required_keys if k not in config]
         if missing:
             raise ValueError(f"Missing keys in config: {missing}")
+        _CONFIG_CACHE[cache_key] = config
         return config
 
     def _validate_farm(self):
@@ -32,9 +73,12 @@ class CropDataLoader:
         if not os.path.exists(os.path.join(self.farm_path,"crops")):
             raise FileNotFoundError(f"'crops' directory missing for farm {self.farm_id}")
 
+    def crop_file_path(self, crop_name: str) -> str:
+        return os.path.join(self.farm_path, "crops", crop_name.replace(" ", "_") + ".csv")
+
     def load_crop_data(self, crop_name: str) -> pd.DataFrame:
         """Load and filter unified yield data for a specific crop"""
-        file_path = os.path.join(self.farm_path, "crops",crop_name.replace(" ", "_") + ".csv")
+        file_path = self.crop_file_path(crop_name)
         try:
             df = pd.read_csv(file_path, parse_dates=["date"])
             df = df[df["crop"] == crop_name]
@@ -124,6 +168,10 @@ class CropDataLoader:
                 static_features=static_overrides
             )
             generated_data = generator.generate()
+
+            # Fresh CSVs: drop any preprocessed datasets still held for this farm
+            from .DatasetCache import dataset_cache
+            dataset_cache.invalidate(farm_id)
             print(f"[SUCCESS] Regeneration complete. Crops processed: {list(generated_data.keys())}")
         except Exception as e:
             print(f"[ERROR] Failed to regenerate data: {str(e)}")
@@ -0,0 +1,141 @@
+import os
+import json
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+
+import pandas as pd
+
+from .DataSetLoader import CropDataLoader
+from .hashing import dataframe_hash
+from .featureEngineering import prepare_dataset_frame
+from ..Modeling.TFT_Training import build_config, build_dataset, preprocess_frame
+
+logger = logging.getLogger(__name__)
+
+DATASET_CACHE_SIZE = int(os.getenv("AGRIYIELD_DATASET_CACHE_SIZE", "32"))
+
+
+def config_hash(*configs: Dict) -> str:
+    payload = json.dumps(configs, sort_keys=True, default=str)
+    return hashlib.md5(payload.encode()).hexdigest()
+
+
+class CachedDataset:
+    """Loaded frame, trainer-preprocessed frame and TimeSeriesDataSet for one farm/crop.
+
+    Frames are shared between requests and must be treated as read-only;
+    copy before mutating.
+    """
+    __slots__ = ("farm_id", "crop", "raw", "processed", "dataset", "parameters", "config", "data_version",
+                 "_content_hash")
+
+    def __init__(self, farm_id, crop, raw, processed, dataset, config, data_version):
+        self.farm_id = farm_id
+        self.crop = crop
+        self.raw = raw
+        self.processed = processed
+        self.dataset = dataset
+        self.parameters = dataset.get_parameters()
+        self.config = config
+        self.data_version = data_version
+        self._content_hash = None
+
+    @property
+    def content_hash(self) -> str:
+        """Hash of the processed frame's contents, computed once per cached entry"""
+        if self._content_hash is None:
+            self._content_hash = dataframe_hash(self.processed)
+        return self._content_hash
+
+
+class DatasetCache:
+    """LRU cache of preprocessed datasets keyed by source-file (mtime, size) and config hash"""
+
+    def __init__(self, prepare: Callable[[pd.DataFrame], pd.DataFrame] = None, max_entries: int = None):
+        self.prepare = prepare
+        self.max_entries = max_entries or DATASET_CACHE_SIZE
+        self._entries: "OrderedDict[Tuple[str, str, str], CachedDataset]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._build_locks: Dict[tuple, threading.Lock] = {}
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _file_version(path: str) -> Tuple[int, int]:
+        stat = os.stat(path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def get(self, farm_id: str, crop: str, **trainer_kwargs) -> CachedDataset:
+        """Return the cached dataset, rebuilding it when the CSV or configuration changed"""
+        farm_id, crop = str(farm_id), str(crop)
+        loader = CropDataLoader(farm_id)
+        path = loader.crop_file_path(crop)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"No data file for crop '{crop}' in farm '{farm_id}'")
+
+        # Plain config merge; building a TFTTrainer per lookup would be wasted work on the hot path
+        config = build_config(**trainer_kwargs)
+        key = (farm_id, crop, config_hash(config))
+        data_version = config_hash(self._file_version(path), loader.config, config)
+
+        entry = self._lookup(key, data_version)
+        if entry is not None:
+            return entry
+
+        with self._build_lock(key):
+            data_version = config_hash(self._file_version(path), loader.config, config)
+            entry = self._lookup(key, data_version)
+            if entry is not None:
+                return entry
+
+            raw = loader.load_crop_data(crop)
+            if self.prepare is not None:
+                raw = self.prepare(raw)
+            processed = preprocess_frame(raw.copy())
+            dataset = build_dataset(processed, config)
+            entry = CachedDataset(farm_id, crop, raw, processed, dataset, config, data_version)
+
+            with self._lock:
+                self.misses += 1
+                self._entries[key] = entry
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+            logger.info(f"Built dataset for farm '{farm_id}', crop '{crop}' ({len(raw)} rows)")
+            return entry
+
+    def _lookup(self, key, data_version) -> Optional[CachedDataset]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.data_version == data_version:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+        return None
+
+    def _build_lock(self, key) -> threading.Lock:
+        with self._lock:
+            return self._build_locks.setdefault(key, threading.Lock())
+
+    def invalidate(self, farm_id: str = None, crop: str = None):
+        """Drop entries explicitly, e.g. right after new crop data has been written"""
+        with self._lock:
+            for key in list(self._entries):
+                if (farm_id is None or key[0] == str(farm_id)) and (crop is None or key[1] == str(crop)):
+                    del self._entries[key]
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "datasets": [f"{farm}/{crop}" for farm, crop, _ in self._entries],
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses
+            }
+
+
+# Module-level preparation so worker processes build the same datasets as the API
+dataset_cache = DatasetCache(prepare=prepare_dataset_frame)
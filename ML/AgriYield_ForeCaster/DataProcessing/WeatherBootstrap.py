@@ -0,0 +1,65 @@
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+WEATHER_COLUMNS = [
+    "temperature_2m_mean", "temperature_2m_max", "temperature_2m_min",
+    "relative_humidity_2m_mean", "wind_speed_10m_max", "wind_direction_10m_dominant",
+    "precipitation_sum", "shortwave_radiation_sum", "surface_pressure_mean",
+    "cloud_cover_mean", "soil_moisture", "ndvi"
+]
+# A historical block may start this many days off the target calendar date
+ALIGNMENT_TOLERANCE_DAYS = 3
+
+
+def _same_day(anchor: pd.Timestamp, year: int) -> pd.Timestamp:
+    try:
+        return anchor.replace(year=year)
+    except ValueError:
+        # 29 February in a non-leap year
+        return anchor.replace(year=year, day=28)
+
+
+def block_bootstrap_weather(history: pd.DataFrame, target_dates, features: List[str], members: int,
+                            block_days: int = 7, rng: Optional[np.random.Generator] = None) -> np.ndarray:
+    """Resample weather for ``target_dates`` in contiguous blocks taken from historical years.
+
+    Each block of ``block_days`` is copied, for every feature at once, from a randomly chosen
+    year at the same time of year, so within-block autocorrelation and cross-feature
+    correlation are preserved. Returns raw values shaped ``[members, len(target_dates), len(features)]``.
+    """
+    rng = rng or np.random.default_rng()
+    frame = history[["date"] + list(features)].copy()
+    frame["date"] = pd.to_datetime(frame["date"])
+    frame = frame.dropna().drop_duplicates("date").set_index("date").sort_index()
+    if frame.empty:
+        raise ValueError("No weather history to resample from")
+
+    index = frame.index
+    values = frame.to_numpy(dtype=np.float64)
+    years = sorted(set(index.year))
+    target_dates = pd.to_datetime(pd.Index(target_dates))
+    length = len(target_dates)
+    tolerance = pd.Timedelta(days=ALIGNMENT_TOLERANCE_DAYS)
+
+    out = np.empty((members, length, len(features)), dtype=np.float64)
+    for start in range(0, length, block_days):
+        size = min(block_days, length - start)
+        anchor = target_dates[start]
+        candidates = []
+        for year in years:
+            wanted = _same_day(anchor, year)
+            pos = int(index.searchsorted(wanted))
+            if pos + size > len(index) or abs(index[pos] - wanted) > tolerance:
+                continue
+            # Skip blocks that straddle gaps in the record
+            if (index[pos + size - 1] - index[pos]).days != size - 1:
+                continue
+            candidates.append(pos)
+        if not candidates:
+            raise ValueError(f"No historical block covers {anchor.date()}")
+
+        picks = rng.choice(np.asarray(candidates), size=members)
+        out[:, start:start + size, :] = values[picks[:, None] + np.arange(size)]
+    return out
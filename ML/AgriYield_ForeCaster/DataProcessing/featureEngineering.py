@@ -1,10 +1,55 @@
+import logging
+import numpy as np
 import pandas as pd
 from sklearn.preprocessing import MinMaxScaler
-from typing import Tuple
+from typing import List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def _fill_numeric(values):
+    return values.replace([np.inf, -np.inf], np.nan).interpolate().ffill().bfill().fillna(0)
+
+
+def ensure_numeric(df: pd.DataFrame, columns: List[str]) -> pd.DataFrame:
+    """Coerce ``columns`` to numbers, filling gaps by interpolation, then edge values, then 0"""
+    df = df.copy()
+    columns = [col for col in columns if col in df.columns]
+    if not columns:
+        return df
+    try:
+        values = df[columns]
+        # Only non-numeric columns need parsing; numeric ones go straight to the frame-wide fill
+        text = values.columns[[not pd.api.types.is_numeric_dtype(dtype) for dtype in values.dtypes]]
+        if len(text):
+            values = values.assign(**{col: pd.to_numeric(values[col], errors='coerce') for col in text})
+        df[columns] = _fill_numeric(values)
+    except Exception:
+        # Retry column by column so one bad column does not zero the others
+        for col in columns:
+            try:
+                df[col] = _fill_numeric(pd.to_numeric(df[col], errors='coerce'))
+            except Exception as e:
+                logger.error(f"Column {col} conversion failed: {e}")
+                df[col] = 0
+    return df
+
+
+def prepare_dataset_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Preparation applied to every loaded crop frame before the trainer's preprocessing"""
+    return ensure_numeric(df, ['yield'])
+
 
 class FeatureEngineer:
-    def __init__(self, config: dict):
+    """Column selection, gap filling and min-max scaling for the seasonal yield features.
+
+    One MinMaxScaler covers all numerical features. It is fitted when the engineer has
+    none and reused otherwise.
+    """
+
+    def __init__(self, config: dict, scaler: Optional[MinMaxScaler] = None):
         self.config = config
+        self.scaler = scaler
 
         # Columns to keep
         self.relevant_columns = [
@@ -32,7 +77,7 @@ class FeatureEngineer:
             'area_2025_26', 'area_2024_25', 'area_change_pct'
         ]
 
-    def preprocess_data(self, df: pd.DataFrame) -> Tuple[pd.DataFrame, dict]:
+    def preprocess_data(self, df: pd.DataFrame) -> Tuple[pd.DataFrame, MinMaxScaler]:
         # Select relevant columns
         df = df[self.relevant_columns].copy()
 
@@ -40,26 +85,26 @@ class FeatureEngineer:
         df = self._handle_missing_values(df)
 
         # Normalize numerical features
-        df, scalers = self._normalize_features(df)
+        df = self._normalize_features(df)
 
-        return df, scalers
+        return df, self.scaler
 
     def _handle_missing_values(self, df: pd.DataFrame) -> pd.DataFrame:
         # Fill numerical features with mean
-        for col in self.numerical_features:
-            df[col] = df[col].fillna(df[col].mean())
+        df[self.numerical_features] = df[self.numerical_features].fillna(df[self.numerical_features].mean())
 
         # Fill categorical (non-numeric) with mode
-        for col in df.columns.difference(self.numerical_features + ['yield']):
-            if df[col].dtype == object:
-                df[col] = df[col].fillna(df[col].mode().iloc[0])
+        categorical = [col for col in df.columns.difference(self.numerical_features + ['yield'])
+                       if df[col].dtype == object]
+        if categorical:
+            df[categorical] = df[categorical].fillna(df[categorical].mode().iloc[0])
 
         return df
 
-    def _normalize_features(self, df: pd.DataFrame) -> Tuple[pd.DataFrame, dict]:
-        scalers = {}
-        for col in self.numerical_features:
-            scaler = MinMaxScaler(feature_range=self.config.get("features", {}).get("scaler_range", (0, 1)))
-            df[col] = scaler.fit_transform(df[[col]])
-            scalers[col] = scaler
-        return df, scalers
+    def _normalize_features(self, df: pd.DataFrame) -> pd.DataFrame:
+        # Fitted on a frame, so transform also checks the columns arrive in the training order
+        if self.scaler is None:
+            feature_range = tuple(self.config.get("features", {}).get("scaler_range", (0, 1)))
+            self.scaler = MinMaxScaler(feature_range=feature_range).fit(df[self.numerical_features])
+        df[self.numerical_features] = self.scaler.transform(df[self.numerical_features])
+        return df
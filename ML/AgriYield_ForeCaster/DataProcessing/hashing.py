@@ -0,0 +1,38 @@
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+
+def schema_fingerprint(df: pd.DataFrame) -> str:
+    """Column names and dtypes in order, plus the index dtype"""
+    columns = "|".join(f"{name}:{dtype}" for name, dtype in df.dtypes.items())
+    return f"{columns}|index:{df.index.dtype}"
+
+
+def _row_hashes(df: pd.DataFrame, index: bool) -> np.ndarray:
+    try:
+        hashes = pd.util.hash_pandas_object(df, index=index, categorize=True)
+    except TypeError:
+        # Unhashable cells (lists, dicts) in object columns: hash their string form instead
+        df = df.copy()
+        for col in df.columns[df.dtypes == object]:
+            df[col] = df[col].astype(str)
+        hashes = pd.util.hash_pandas_object(df, index=index, categorize=True)
+    # Fixed byte order so the digest does not depend on the host
+    return hashes.to_numpy().astype("<u8", copy=False)
+
+
+def dataframe_hash(df: pd.DataFrame, index: bool = True) -> str:
+    """Content hash of a DataFrame, stable across processes and runs.
+
+    Uses pandas' vectorised per-row hashing (fixed default key, so no
+    PYTHONHASHSEED dependence) and folds in the schema so frames with equal
+    values but different columns or dtypes do not collide.
+    """
+    digest = hashlib.md5()
+    digest.update(schema_fingerprint(df).encode())
+    digest.update(np.int64(len(df)).tobytes())
+    if len(df):
+        digest.update(_row_hashes(df, index).tobytes())
+    return digest.hexdigest()
@@ -1,38 +1,89 @@
 import os
 import json
+import hashlib
+import logging
+import threading
 import torch
 import pandas as pd
-from datetime import datetime, timedelta
+from collections import OrderedDict
+from datetime import datetime
 from pathlib import Path
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Tuple
 
 from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
-from pytorch_forecasting import TemporalFusionTransformer, TimeSeriesDataSet
+from pytorch_forecasting import TimeSeriesDataSet
 
 from ..Modeling.TFTPredictor import TFTPredictor
-from ..MongoDb.MongoService import MongoService
+from ..Modeling.ModelRegistry import ModelRegistry, model_registry
+from ..MongoDb.MongoService import get_mongo_service
+from ..SessionManager import SessionManager, get_session_manager
+
+logger = logging.getLogger(__name__)
+
+CHAT_MODEL_NAME = os.getenv("AGRIYIELD_CHAT_MODEL", "google/flan-t5-base")
+# Dynamic int8 quantization of the Linear layers; CPU only
+CHAT_QUANTIZE = os.getenv("AGRIYIELD_CHAT_QUANTIZE", "1") == "1"
+# Greedy decoding by default; "1" opts into sampling (temperature 0.7), which varies replies and disables the cache
+CHAT_SAMPLING = os.getenv("AGRIYIELD_CHAT_SAMPLING", "0") == "1"
+# Replies are cached only under greedy decoding, where a prompt always yields the same text
+CHAT_RESPONSE_CACHE_SIZE = int(os.getenv("AGRIYIELD_CHAT_RESPONSE_CACHE", "512"))
+CHAT_DATASET_CACHE_SIZE = int(os.getenv("AGRIYIELD_CHAT_DATASET_CACHE", "16"))
 
 
 class AgriChatInterface:
-    def __init__(self, models_dir: str = "trainedCropModels"):
+    def __init__(self, models_dir: str = "trainedCropModels", session_manager: SessionManager = None):
         self.models_dir = Path(models_dir)
         self.device = "cuda" if torch.cuda.is_available() else "cpu"
 
-        # Initialize NLP components
-        self.tokenizer = AutoTokenizer.from_pretrained("google/flan-t5-base")
-        self.nlp_model = AutoModelForSeq2SeqLM.from_pretrained("google/flan-t5-base").to(self.device)
+        # NLP components are loaded on first use, not at import time
+        self._tokenizer = None
+        self._nlp_model = None
+        self._nlp_lock = threading.Lock()
+        # Separate from _nlp_lock, which is held through the model load and quantization
+        self._responses_lock = threading.Lock()
+        self._responses: "OrderedDict[str, str]" = OrderedDict()
+
+        # Checkpoints come from the shared registry; dataset.pt files are cached here by (mtime, size)
+        self.registry = (model_registry if os.path.abspath(model_registry.models_root) == os.path.abspath(models_dir)
+                         else ModelRegistry(models_root=str(models_dir)))
+        self._datasets: "OrderedDict[Tuple[str, str], Tuple[Tuple[int, int], TimeSeriesDataSet]]" = OrderedDict()
+        self._dataset_lock = threading.Lock()
 
         # Initialize MongoDB service
-        self.mongo_service = MongoService()
+        self.mongo_service = get_mongo_service()
 
-        # Session configuration
-        self.sessions = {}  # In-memory session cache
+        # Sessions live in the process-wide session manager shared with the REST and Socket.IO routes
+        self.session_manager = session_manager or get_session_manager(self.mongo_service)
         self.context_window = 5  # Number of past interactions to remember
-        self.session_timeout = 3600  # 1 hour in seconds
 
         # Load knowledge base
         self.load_knowledge_base()
 
+    @property
+    def tokenizer(self):
+        self._load_nlp()
+        return self._tokenizer
+
+    @property
+    def nlp_model(self):
+        self._load_nlp()
+        return self._nlp_model
+
+    def _load_nlp(self):
+        if self._nlp_model is not None:
+            return
+        with self._nlp_lock:
+            if self._nlp_model is not None:
+                return
+            tokenizer = AutoTokenizer.from_pretrained(CHAT_MODEL_NAME)
+            model = AutoModelForSeq2SeqLM.from_pretrained(CHAT_MODEL_NAME).eval()
+            if self.device == "cpu" and CHAT_QUANTIZE:
+                model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+            self._tokenizer = tokenizer
+            self._nlp_model = model.to(self.device)
+            logger.info(f"Loaded {CHAT_MODEL_NAME} on {self.device}"
+                        f"{' (int8 dynamic quantization)' if self.device == 'cpu' and CHAT_QUANTIZE else ''}")
+
     def load_knowledge_base(self):
         """Load or initialize the agricultural knowledge base"""
         self.knowledge_base = {
@@ -45,91 +96,27 @@ class AgriChatInterface:
             }
         }
 
-    def create_session(self, farm_id: str) -> str:
-        """Create a new session with MongoDB persistence"""
-        session_id = f"{farm_id}_{datetime.now().strftime('%Y%m%d%H%M%S')}"
-        expires_at = datetime.utcnow() + timedelta(seconds=self.session_timeout)
-
-        session_data = {
-            "session_id": session_id,
-            "farm_id": farm_id,
-            "context": [],
-            "created_at": datetime.utcnow(),
-            "last_accessed": datetime.utcnow(),
-            "expires_at": expires_at
-        }
-
-        # Store in memory and MongoDB
-        self.sessions[session_id] = session_data
-        self.mongo_service.save_session(session_data)
+    @property
+    def sessions(self) -> Dict[str, Dict]:
+        return self.session_manager.sessions
 
-        return session_id
+    def create_session(self, farm_id: str) -> str:
+        """Create a new session and return its id"""
+        return self.session_manager.create_session(farm_id)["session_id"]
 
     def validate_session(self, session_id: str) -> bool:
-        """Validate session checking both memory and MongoDB with proper synchronization"""
-        # First check in-memory cache
-        if session_id in self.sessions:
-            session = self.sessions[session_id]
-            if datetime.utcnow() > session["expires_at"]:
-                del self.sessions[session_id]
-                return False
-            return True
-
-        # If not in memory, check MongoDB
-        session_doc = self.mongo_service.get_active_session(session_id)
-        if not session_doc:
-            return False
-
-        # Convert string timestamps if needed
-        if isinstance(session_doc.get("last_accessed"), str):
-            session_doc["last_accessed"] = datetime.fromisoformat(session_doc["last_accessed"])
-        if isinstance(session_doc.get("expires_at"), str):
-            session_doc["expires_at"] = datetime.fromisoformat(session_doc["expires_at"])
-
-        # Check if expired
-        if datetime.utcnow() > session_doc["expires_at"]:
-            return False
-
-        # Load into memory cache
-        self.sessions[session_id] = {
-            "session_id": session_id,
-            "farm_id": session_doc["farm_id"],
-            "context": session_doc.get("context", []),
-            "last_accessed": session_doc["last_accessed"],
-            "expires_at": session_doc["expires_at"]
-        }
-
-        return True
+        return self.session_manager.validate_session(session_id)
 
     def get_session(self, session_id: str) -> Optional[Dict]:
         """Get complete session data with validation"""
-        if not self.validate_session(session_id):
-            return None
-
-        if session_id in self.sessions:
-            return self.sessions[session_id]
-
-        return None
+        return self.session_manager.get_session(session_id)
 
     def update_session_activity(self, session_id: str):
-        """Update session timestamp in both memory and MongoDB"""
-        if session_id in self.sessions:
-            now = datetime.utcnow()
-            new_expiry = now + timedelta(seconds=self.session_timeout)
-
-            self.sessions[session_id]["last_accessed"] = now
-            self.sessions[session_id]["expires_at"] = new_expiry
-
-            # Update MongoDB
-            update_data = {
-                "session_id": session_id,
-                "last_accessed": now,
-                "expires_at": new_expiry
-            }
-            self.mongo_service.save_session(update_data)
+        """Extend the session; persisted with the session manager's next batched flush"""
+        self.session_manager.update_session_activity(session_id)
 
     def load_crop_model(self, farm_id: str, crop: str) -> TFTPredictor:
-        """Load trained crop model with error handling"""
+        """Load trained crop model with error handling; files are only re-read when they change"""
         model_dir = self.models_dir / farm_id / crop
         checkpoint_path = model_dir / "best_model.ckpt"
         dataset_path = model_dir / "dataset.pt"
@@ -138,12 +125,31 @@ class AgriChatInterface:
             raise FileNotFoundError(f"Model or dataset not found for {crop} in farm {farm_id}")
 
         try:
-            dataset = torch.load(dataset_path)
-            model = TemporalFusionTransformer.load_from_checkpoint(checkpoint_path).to(self.device)
-            return TFTPredictor(model, dataset)
+            dataset = self._load_dataset(farm_id, crop, dataset_path)
+            return TFTPredictor.load_best_model(
+                farm_id, crop, dataset, registry=None if self.registry is model_registry else self.registry
+            )
         except Exception as e:
             raise RuntimeError(f"Failed to load model for {crop}: {str(e)}")
 
+    def _load_dataset(self, farm_id: str, crop: str, dataset_path: Path) -> TimeSeriesDataSet:
+        key = (farm_id, crop)
+        stat = dataset_path.stat()
+        version = (stat.st_mtime_ns, stat.st_size)
+        with self._dataset_lock:
+            cached = self._datasets.get(key)
+            if cached and cached[0] == version:
+                self._datasets.move_to_end(key)
+                return cached[1]
+
+        dataset = torch.load(dataset_path)
+        with self._dataset_lock:
+            self._datasets[key] = (version, dataset)
+            self._datasets.move_to_end(key)
+            while len(self._datasets) > CHAT_DATASET_CACHE_SIZE:
+                self._datasets.popitem(last=False)
+        return dataset
+
     def process_query(self, session_id: str, query: str, crop_data: Dict = None) -> Dict:
         """Process user query with full context and error handling"""
         # Validate session
@@ -180,14 +186,15 @@ class AgriChatInterface:
 
     def _build_prompt(self, session_id: str, query: str, crop_data: Dict = None) -> str:
         """Construct the prompt with context and relevant information"""
-        session = self.sessions.get(session_id, {})
+        session = self.get_session(session_id) or {}
         context = session.get("context", [])
         farm_id = session.get("farm_id", "unknown")
 
         # Base prompt
         prompt = [
             f"Agricultural Assistant for Farm {farm_id}",
-            f"Current Time: {datetime.utcnow().strftime('%Y-%m-%d %H:%M UTC')}",
+            # Day granularity keeps otherwise identical prompts cacheable
+            f"Current Date: {datetime.utcnow().strftime('%Y-%m-%d')}",
             ""
         ]
 
@@ -217,40 +224,42 @@ class AgriChatInterface:
         return "\n".join(prompt)
 
     def _generate_nlp_response(self, session_id: str, query: str, prompt: str) -> str:
-        """Generate response using the NLP model"""
+        """Generate response using the NLP model; under greedy decoding identical prompts are answered from cache"""
+        # The generated text also carries the intent tag ([PREDICTION], [ANALYSIS], ...),
+        # so one cache covers both classification and generation. Sampled replies are not
+        # cached: that would pin the first sample for every later identical prompt.
+        use_cache = not CHAT_SAMPLING and CHAT_RESPONSE_CACHE_SIZE > 0
+        cache_key = hashlib.md5(f"{CHAT_MODEL_NAME}|{prompt}".encode()).hexdigest()
+        if use_cache:
+            with self._responses_lock:
+                cached = self._responses.get(cache_key)
+                if cached is not None:
+                    self._responses.move_to_end(cache_key)
+                    return cached
+
         try:
             inputs = self.tokenizer(prompt, return_tensors="pt").to(self.device)
-            outputs = self.nlp_model.generate(
-                **inputs,
-                max_new_tokens=200,
-                temperature=0.7,
-                do_sample=True
-            )
+            sampling = {"do_sample": True, "temperature": 0.7} if CHAT_SAMPLING else {"do_sample": False}
+            with torch.inference_mode():
+                outputs = self.nlp_model.generate(
+                    **inputs,
+                    max_new_tokens=200,
+                    **sampling
+                )
             response = self.tokenizer.decode(outputs[0], skip_special_tokens=True)
-            return response
         except Exception as e:
             raise RuntimeError(f"NLP generation failed: {str(e)}")
 
-    def _save_conversation(self, session_id: str, query: str, response: Dict):
-        """Save conversation to both memory and MongoDB"""
-        if session_id not in self.sessions:
-            return
+        if use_cache:
+            with self._responses_lock:
+                self._responses[cache_key] = response
+                while len(self._responses) > CHAT_RESPONSE_CACHE_SIZE:
+                    self._responses.popitem(last=False)
+        return response
 
-        # Update in-memory context
-        self.sessions[session_id]["context"].append({
-            "query": query,
-            "response": response.get("response") if isinstance(response, dict) else str(response)
-        })
-
-        # Save to MongoDB
-        chat_data = {
-            "session_id": session_id,
-            "farm_id": self.sessions[session_id]["farm_id"],
-            "user_message": query,
-            "bot_response": response,
-            "timestamp": datetime.utcnow()
-        }
-        self.mongo_service.save_chat(chat_data)
+    def _save_conversation(self, session_id: str, query: str, response: Dict):
+        """Append the turn to the session context; ChatHistory is written in the next batch"""
+        self.session_manager.append_history(session_id, query, response)
 
     def _handle_data_required(self) -> Dict:
         return {
@@ -269,7 +278,7 @@ class AgriChatInterface:
         if not crop_data or "crop" not in crop_data:
             return {"error": "Crop data is missing for prediction."}
 
-        farm_id = self.sessions[session_id]["farm_id"]
+        farm_id = self.get_session(session_id)["farm_id"]
 
         try:
             # Load model and make prediction
@@ -323,8 +332,4 @@ class AgriChatInterface:
 
     def cleanup_expired_sessions(self):
         """Clean up expired sessions from memory"""
-        now = datetime.utcnow()
-        expired = [sid for sid, session in self.sessions.items()
-                  if now > session["expires_at"]]
-        for sid in expired:
-            del self.sessions[sid]
+        self.session_manager.cleanup_expired_sessions()
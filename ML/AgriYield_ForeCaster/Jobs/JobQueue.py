@@ -0,0 +1,279 @@
+import os
+import copy
+import uuid
+import socket
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+from pymongo import ASCENDING, DESCENDING, ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+JOB_WORKERS = int(os.getenv("AGRIYIELD_JOB_WORKERS", "1"))
+JOB_STORE = os.getenv("AGRIYIELD_JOB_STORE", "mongo")
+
+ACTIVE_STATUSES = ("queued", "running")
+
+
+class MongoJobStore:
+    """Jobs persisted in a Mongo collection; claims are atomic so several processes can share it"""
+
+    def __init__(self, collection):
+        # Indexes (including the partial unique dedup index) come from MongoConnection.INDEX_SPECS
+        self.collection = collection
+
+    def insert(self, job: Dict) -> Optional[Dict]:
+        """Insert a job, or return the active job already holding its dedup key"""
+        try:
+            self.collection.insert_one(job)
+            return None
+        except DuplicateKeyError:
+            return self.collection.find_one({"dedup_key": job["dedup_key"], "active": True}, {"_id": 0})
+
+    def claim(self, worker_id: str) -> Optional[Dict]:
+        now = datetime.utcnow()
+        return self.collection.find_one_and_update(
+            {"status": "queued"},
+            {"$set": {"status": "running", "worker_id": worker_id, "started_at": now, "heartbeat_at": now}},
+            sort=[("created_at", ASCENDING)],
+            projection={"_id": 0},
+            return_document=ReturnDocument.AFTER
+        )
+
+    def update(self, job_id: str, fields: Dict):
+        self.collection.update_one({"job_id": job_id}, {"$set": fields})
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        return self.collection.find_one({"job_id": job_id}, {"_id": 0})
+
+    def list(self, query: Dict, limit: int = 50) -> List[Dict]:
+        return list(self.collection.find(query, {"_id": 0}, sort=[("created_at", DESCENDING)], limit=limit))
+
+    def requeue_stale(self, older_than: datetime) -> int:
+        result = self.collection.update_many(
+            {"status": "running", "heartbeat_at": {"$lt": older_than}},
+            {"$set": {"status": "queued", "worker_id": None}}
+        )
+        return result.modified_count
+
+
+class MemoryJobStore:
+    """Process-local stand-in with the same interface, for development without Mongo"""
+
+    def __init__(self):
+        self._jobs: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    def insert(self, job: Dict) -> Optional[Dict]:
+        with self._lock:
+            for existing in self._jobs.values():
+                if existing["active"] and existing["dedup_key"] == job["dedup_key"]:
+                    return copy.deepcopy(existing)
+            self._jobs[job["job_id"]] = copy.deepcopy(job)
+            return None
+
+    def claim(self, worker_id: str) -> Optional[Dict]:
+        with self._lock:
+            queued = [j for j in self._jobs.values() if j["status"] == "queued"]
+            if not queued:
+                return None
+            job = min(queued, key=lambda j: j["created_at"])
+            now = datetime.utcnow()
+            job.update(status="running", worker_id=worker_id, started_at=now, heartbeat_at=now)
+            return copy.deepcopy(job)
+
+    def update(self, job_id: str, fields: Dict):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            for key, value in copy.deepcopy(fields).items():
+                # Mirror Mongo's dotted $set paths, e.g. "progress.epoch"
+                target = job
+                *parents, leaf = key.split(".")
+                for parent in parents:
+                    target = target.setdefault(parent, {})
+                target[leaf] = value
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return copy.deepcopy(job) if job else None
+
+    def list(self, query: Dict, limit: int = 50) -> List[Dict]:
+        with self._lock:
+            jobs = [j for j in self._jobs.values() if all(j.get(k) == v for k, v in query.items())]
+            jobs.sort(key=lambda j: j["created_at"], reverse=True)
+            return copy.deepcopy(jobs[:limit])
+
+    def requeue_stale(self, older_than: datetime) -> int:
+        with self._lock:
+            stale = [j for j in self._jobs.values() if j["status"] == "running" and j["heartbeat_at"] < older_than]
+            for job in stale:
+                job.update(status="queued", worker_id=None)
+            return len(stale)
+
+
+class JobQueue:
+    """Background job queue with a small worker pool.
+
+    Handlers are registered per job kind and called as ``handler(job, progress)``;
+    ``progress(**fields)`` stores progress on the job and refreshes its heartbeat.
+    Identical active jobs (same kind, farm and crop by default) are de-duplicated.
+    A maintenance thread refreshes the heartbeat of jobs running in this process and
+    periodically requeues running jobs whose heartbeat went stale (their worker died).
+    """
+
+    def __init__(self, store, workers: int = None, poll_interval: float = 2.0, stale_after_minutes: int = 60,
+                 sweep_interval: float = None):
+        self.store = store
+        self.workers = max(1, workers or JOB_WORKERS)
+        self.poll_interval = poll_interval
+        self.stale_after = timedelta(minutes=stale_after_minutes)
+        # Heartbeats must land well inside the stale window
+        self.sweep_interval = sweep_interval or max(5.0, self.stale_after.total_seconds() / 4)
+        self.handlers: Dict[str, Callable[[Dict, Callable], Any]] = {}
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._running: set = set()
+        self._running_lock = threading.Lock()
+        self._worker_prefix = f"{socket.gethostname()}:{os.getpid()}"
+
+    def register(self, kind: str, handler: Callable[[Dict, Callable], Any]):
+        self.handlers[kind] = handler
+
+    def enqueue(self, kind: str, farm_id: str = None, crop: str = None, params: Dict = None,
+                dedup_key: str = None) -> Dict:
+        """Queue a job and return it; returns the existing job if an identical one is active"""
+        if kind not in self.handlers:
+            raise ValueError(f"No handler registered for job kind '{kind}'")
+
+        now = datetime.utcnow()
+        job = {
+            "job_id": uuid.uuid4().hex,
+            "kind": kind,
+            "farm_id": farm_id,
+            "crop": crop,
+            "params": params or {},
+            "dedup_key": dedup_key or f"{kind}:{farm_id}:{crop}",
+            "status": "queued",
+            "active": True,
+            "progress": {},
+            "result": None,
+            "error": None,
+            "created_at": now,
+            "heartbeat_at": now
+        }
+        existing = self.store.insert(job)
+        if existing:
+            existing["deduplicated"] = True
+            return existing
+
+        self._wake.set()
+        return job
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        return self.store.get(job_id)
+
+    def list(self, **filters) -> List[Dict]:
+        return self.store.list({k: v for k, v in filters.items() if v is not None})
+
+    def start(self):
+        if self._threads:
+            return
+        # Torch intra-op threads are left alone here: they are process-wide and shared with
+        # serving; training jobs pin their budget in their own spawned process instead
+        self._sweep_stale()
+
+        maintenance = threading.Thread(target=self._maintain, name="job-maintenance", daemon=True)
+        maintenance.start()
+        self._threads.append(maintenance)
+        for index in range(self.workers):
+            thread = threading.Thread(
+                target=self._run, args=(f"{self._worker_prefix}:{index}",),
+                name=f"job-worker-{index}", daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"Job queue started with {self.workers} worker(s)")
+
+    def stop(self, timeout: float = None):
+        self._stop.set()
+        self._wake.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def _sweep_stale(self):
+        try:
+            requeued = self.store.requeue_stale(datetime.utcnow() - self.stale_after)
+            if requeued:
+                logger.warning(f"Requeued {requeued} stale job(s)")
+                self._wake.set()
+        except Exception as e:
+            logger.error(f"Stale job sweep failed: {e}")
+
+    def _maintain(self):
+        while not self._stop.wait(self.sweep_interval):
+            with self._running_lock:
+                running = list(self._running)
+            now = datetime.utcnow()
+            for job_id in running:
+                try:
+                    self.store.update(job_id, {"heartbeat_at": now})
+                except Exception as e:
+                    logger.error(f"Heartbeat failed for job {job_id}: {e}")
+            self._sweep_stale()
+
+    def _run(self, worker_id: str):
+        while not self._stop.is_set():
+            try:
+                job = self.store.claim(worker_id)
+            except Exception as e:
+                logger.error(f"Job claim failed: {e}")
+                job = None
+
+            if job is None:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+                continue
+            self._execute(job)
+
+    def _execute(self, job: Dict):
+        job_id = job["job_id"]
+
+        def progress(**fields):
+            self.store.update(job_id, {
+                **{f"progress.{k}": v for k, v in fields.items()},
+                "heartbeat_at": datetime.utcnow()
+            })
+
+        logger.info(f"Running {job['kind']} job {job_id} for {job.get('farm_id')}/{job.get('crop')}")
+        with self._running_lock:
+            self._running.add(job_id)
+        try:
+            result = self.handlers[job["kind"]](job, progress)
+            self.store.update(job_id, {
+                "status": "completed", "active": False, "result": result,
+                "finished_at": datetime.utcnow()
+            })
+        except Exception as e:
+            logger.error(f"Job {job_id} failed: {e}", exc_info=True)
+            self.store.update(job_id, {
+                "status": "failed", "active": False, "error": str(e),
+                "finished_at": datetime.utcnow()
+            })
+        finally:
+            with self._running_lock:
+                self._running.discard(job_id)
+
+
+def create_job_queue(mongo_service=None, **kwargs) -> JobQueue:
+    """Mongo-backed queue unless AGRIYIELD_JOB_STORE=memory or no Mongo service is available"""
+    if JOB_STORE == "mongo" and mongo_service is not None:
+        return JobQueue(MongoJobStore(mongo_service.training_jobs), **kwargs)
+    return JobQueue(MemoryJobStore(), **kwargs)
@@ -0,0 +1,102 @@
+import os
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from ..Modeling.TFTPredictor import QUANTILE_KEYS
+
+logger = logging.getLogger(__name__)
+
+CURVE_GRID = [-50, -40, -30, -20, -15, -10, -5, 0, 5, 10, 15, 20, 30, 40, 50]
+CURVE_DAYS = [int(d) for d in os.getenv("AGRIYIELD_CURVE_DAYS", "7").split(",") if d.strip()]
+# Interpolated answers whose bound exceeds this (t/ha) go to live inference instead
+CURVE_MAX_ERROR = float(os.getenv("AGRIYIELD_CURVE_MAX_ERROR", "0.05"))
+
+
+def curve_id(farm_id: str, crop: str, feature: str, days_affected: int) -> str:
+    return f"{farm_id}:{crop}:{feature}:{days_affected}"
+
+
+def compute_response_curves(predictor, df, farm_id: str, crop: str, features: List[str],
+                            model_version: str, data_version: str,
+                            grid: List[float] = None, days_options: List[int] = None) -> List[Dict]:
+    """Evaluate every (feature, grid node, segment midpoint) for each window in one batched call.
+
+    Midpoints are used only to measure how far linear interpolation strays from the
+    model inside each segment; that measurement is stored as the segment's error bound.
+    """
+    grid = sorted(float(g) for g in (grid or CURVE_GRID))
+    midpoints = [(a + b) / 2 for a, b in zip(grid, grid[1:])]
+    features = [f for f in features if f in predictor.dataset.reals]
+    days_options = days_options or CURVE_DAYS
+
+    scenarios = [
+        {"feature": feature, "days_affected": days, "change_percent": pct, "changes": {feature: pct}}
+        for days in days_options for feature in features for pct in grid + midpoints
+        if pct != 0
+    ]
+    result = predictor.simulate_scenarios(df, scenarios, include_importance=True)
+    baseline = result["baseline"]["confidence"]
+
+    points: Dict[tuple, Dict[float, Dict]] = {}
+    for scenario in result["scenarios"]:
+        key = (scenario["feature"], scenario["days_affected"])
+        points.setdefault(key, {0.0: baseline})[scenario["change_percent"]] = scenario["confidence"]
+
+    now = datetime.utcnow()
+    curves = []
+    for (feature, days), by_pct in points.items():
+        values = {q: [by_pct[pct][q] for pct in grid] for q in QUANTILE_KEYS}
+        segment_error = [
+            max(abs(by_pct[mid][q] - (values[q][i] + values[q][i + 1]) / 2) for q in QUANTILE_KEYS)
+            for i, mid in enumerate(midpoints)
+        ]
+        curves.append({
+            "_id": curve_id(farm_id, crop, feature, days),
+            "farm_id": farm_id,
+            "crop": crop,
+            "feature": feature,
+            "days_affected": days,
+            "grid": grid,
+            "quantiles": values,
+            "segment_error": [round(e, 6) for e in segment_error],
+            "baseline": baseline,
+            "feature_importance": result["baseline"]["feature_importance"],
+            "model_version": model_version,
+            "data_version": data_version,
+            "created_at": now
+        })
+    return curves
+
+
+def interpolate_what_if(curve: Dict, change_percent: float, max_error: float = None) -> Optional[Dict]:
+    """simulate_what_if-shaped result from a stored curve, or None when outside the grid or too uncertain"""
+    grid = curve["grid"]
+    if not grid[0] <= change_percent <= grid[-1]:
+        return None
+
+    segment = max(0, min(len(grid) - 2, int(np.searchsorted(grid, change_percent, side="right")) - 1))
+    on_node = change_percent in grid
+    error_bound = 0.0 if on_node else curve["segment_error"][segment]
+    if error_bound > (CURVE_MAX_ERROR if max_error is None else max_error):
+        return None
+
+    baseline = curve["baseline"]
+    modified = {
+        q: round(float(np.interp(change_percent, grid, curve["quantiles"][q])), 4)
+        for q in QUANTILE_KEYS
+    }
+    delta = {q: round(modified[q] - baseline[q], 4) for q in QUANTILE_KEYS}
+    percent = {q: round(100 * delta[q] / baseline[q], 4) if baseline[q] else 0.0 for q in QUANTILE_KEYS}
+    return {
+        "baseline": {"confidence": baseline, "feature_importance": curve["feature_importance"]},
+        "modified": {"confidence": modified},
+        "delta": delta,
+        "percent_change": percent,
+        "change_percent": change_percent,
+        "feature": curve["feature"],
+        "source": "response_curve",
+        "error_bound": round(error_bound, 6)
+    }
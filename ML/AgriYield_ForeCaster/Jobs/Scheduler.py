@@ -0,0 +1,51 @@
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+
+
+class DailyTrigger:
+    """Calls ``action`` once a day at a local "HH:MM" on a daemon thread.
+
+    The action should only enqueue work (e.g. a job with a per-day dedup key), so that
+    several API processes firing at the same minute collapse into one job.
+    """
+
+    def __init__(self, at: str, action: Callable[[], None], name: str = "daily-trigger"):
+        hour, minute = (int(part) for part in at.split(":"))
+        if not (0 <= hour < 24 and 0 <= minute < 60):
+            raise ValueError(f"Invalid time of day '{at}'")
+        self.hour, self.minute = hour, minute
+        self.action = action
+        self.name = name
+        self._stop = threading.Event()
+        self._thread = None
+
+    def next_run(self, now: datetime = None) -> datetime:
+        now = now or datetime.now()
+        run = now.replace(hour=self.hour, minute=self.minute, second=0, microsecond=0)
+        return run if run > now else run + timedelta(days=1)
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+        logger.info(f"{self.name} scheduled daily at {self.hour:02d}:{self.minute:02d}")
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        target = self.next_run()
+        while not self._stop.wait(max(0.0, (target - datetime.now()).total_seconds())):
+            if datetime.now() < target:
+                # Woke early (wall clock adjusted); keep waiting for the same run
+                continue
+            try:
+                self.action()
+            except Exception as e:
+                logger.error(f"{self.name} failed: {e}", exc_info=True)
+            target = self.next_run()
@@ -0,0 +1,286 @@
+import os
+import json
+import time
+import uuid
+import hashlib
+import logging
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import torch
+
+from ..DataProcessing.DataSetLoader import CropDataLoader, DEFAULT_CONFIG_PATH, discover_crop_datasets
+from ..DataProcessing.DatasetCache import config_hash, dataset_cache
+from ..Modeling.CpuProfile import training_core_budget
+from ..Modeling.ModelRegistry import checkpoint_path
+from ..Modeling.TFT_Training import TFTTrainer, TrainingProgress, build_config
+
+logger = logging.getLogger(__name__)
+
+# Training processes for a full retrain; 0 = as many as the core budget allows at MIN_THREADS each
+TRAIN_PROCESSES = int(os.getenv("AGRIYIELD_TRAIN_PROCESSES", "0"))
+# Small TFTs stop scaling past a few intra-op threads; more processes beat more threads per process
+MIN_THREADS_PER_PROCESS = int(os.getenv("AGRIYIELD_TRAIN_MIN_THREADS", "2"))
+TRAINING_STATE_FILENAME = "training_state.json"
+
+
+def training_state_path(farm_id: str, crop: str, models_root: str = None) -> str:
+    """Sidecar next to best_model.ckpt recording the data hash the checkpoint was trained on"""
+    return os.path.join(os.path.dirname(checkpoint_path(farm_id, crop, models_root)), TRAINING_STATE_FILENAME)
+
+
+def read_training_state(farm_id: str, crop: str, models_root: str = None) -> Optional[Dict]:
+    try:
+        with open(training_state_path(farm_id, crop, models_root)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def source_data_hash(farm_id: str, crop: str, trainer_config: Dict,
+                     config_path: str = DEFAULT_CONFIG_PATH) -> Tuple[str, int]:
+    """Hash of the crop CSV's bytes plus the loader and trainer configs, and the file size.
+
+    Hashing the file instead of the processed frame keeps the skip check cheap enough
+    to run for every farm before any dataset is built.
+    """
+    loader = CropDataLoader(farm_id, config_path)
+    path = loader.crop_file_path(crop)
+    digest = hashlib.md5()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    digest.update(config_hash(loader.config, trainer_config).encode())
+    return digest.hexdigest(), os.path.getsize(path)
+
+
+def _init_worker(threads: int):
+    # Pin each training process to its share of the cores before any work starts
+    torch.set_num_threads(threads)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        pass
+
+
+def _apply_cpu_profile(trainer: TFTTrainer):
+    # Runs inside the training process, so the profile's thread count can own the process-wide pool
+    if trainer.cpu_profile is not None:
+        trainer.cpu_profile.apply_threads()
+
+
+def run_in_training_process(fn: Callable, *args, threads: int = None, **kwargs):
+    """Run ``fn`` in a fresh spawned process pinned to ``threads`` intra-op threads and wait for it.
+
+    torch's thread pool is process-wide, so training inside the API process would throttle
+    serving; a dedicated process also keeps dataloader workers away from the API's threads
+    and Mongo clients.
+    """
+    threads = threads or training_core_budget()
+    with ProcessPoolExecutor(max_workers=1, mp_context=mp.get_context("spawn"),
+                             initializer=_init_worker, initargs=(threads,)) as pool:
+        return pool.submit(fn, *args, **kwargs).result()
+
+
+def train_dataset(farm_id: str, crop: str, data_hash: str, threads: int, mode: str = "auto",
+                  models_root: str = None, model_dir: str = None, trainer_kwargs: Dict = None) -> Dict:
+    """Train one farm/crop inside a training process and record the data hash next to the checkpoint"""
+    from ..Modeling.TFTExport import export_torchscript
+    from ..Modeling.TFTPredictor import TFTPredictor
+
+    started = time.perf_counter()
+    trainer_kwargs = trainer_kwargs or {}
+    data = dataset_cache.get(farm_id, crop, **trainer_kwargs)
+    if data.raw.empty or data.raw['yield'].isna().all():
+        raise ValueError("No valid crop yield data found")
+
+    # One process per model: the process owns its thread share, no dataloader subprocesses
+    trainer = TFTTrainer(config={"cpu": {"cores": threads, "num_workers": 0}}, farm_id=farm_id,
+                         model_dir=model_dir, models_root=models_root, **trainer_kwargs)
+    _apply_cpu_profile(trainer)
+    losses = []
+    callbacks = [TrainingProgress(lambda epoch, max_epochs, metrics: losses.append(metrics.get("val_loss")))]
+
+    if mode == "auto":
+        mode = "finetune" if os.path.exists(checkpoint_path(farm_id, crop, models_root)) else "full"
+    if mode == "finetune":
+        outcome = trainer.finetune_model(data.dataset, data.processed, crop, callbacks=callbacks)
+    else:
+        outcome = trainer.retrain_model(data.dataset, data.processed, crop, callbacks=callbacks)
+        # The fitted network stays in this process; only the summary goes back to the caller
+        outcome.pop("model")
+
+    export_parity = None
+    if outcome["promoted"] and models_root is None:
+        try:
+            predictor = TFTPredictor.load_best_model(farm_id, crop, data.dataset, df=data.processed)
+            export = export_torchscript(farm_id, crop, predictor, data.processed.copy())
+            export_parity = export["parity_max_abs_diff"]
+        except Exception as e:
+            logger.warning(f"TorchScript export skipped for {farm_id}/{crop}: {e}")
+
+    observed = [loss for loss in losses if loss is not None]
+    state = {
+        "data_hash": data_hash,
+        "data_version": data.data_version,
+        "mode": outcome["mode"],
+        "trained_at": datetime.utcnow().isoformat()
+    }
+    # A rejected fine-tune or retrain still marks this data as seen; the old checkpoint stays in place
+    if os.path.exists(checkpoint_path(farm_id, crop, models_root)):
+        with open(training_state_path(farm_id, crop, models_root), "w") as f:
+            json.dump(state, f)
+
+    return {
+        **outcome,
+        "rows": len(data.raw),
+        "data_version": data.data_version,
+        "epochs": len(losses),
+        "best_val_loss": min(observed) if observed else None,
+        "torchscript_parity": export_parity,
+        "threads": threads,
+        "duration_s": round(time.perf_counter() - started, 2)
+    }
+
+
+def train_global_dataset(crop: str, threads: int, farm_ids: List[str] = None, model_dir: str = None) -> Dict:
+    """Train the shared per-crop model inside a training process"""
+    from ..Modeling.GlobalModel import GlobalTFTTrainer, build_global_frame
+
+    started = time.perf_counter()
+    trainer = GlobalTFTTrainer(config={"cpu": {"cores": threads, "num_workers": 0}}, model_dir=model_dir)
+    _apply_cpu_profile(trainer)
+    frame = build_global_frame(crop, farm_ids, prepare=dataset_cache.prepare)
+    processed = trainer.preprocess(frame)
+    dataset = trainer.create_dataset(processed)
+    losses = []
+    outcome = trainer.retrain_model(dataset, processed, crop, callbacks=[
+        TrainingProgress(lambda epoch, max_epochs, metrics: losses.append(metrics.get("val_loss")))
+    ])
+    outcome.pop("model")
+    observed = [loss for loss in losses if loss is not None]
+    return {
+        **outcome,
+        "crop": crop,
+        "farms": int(processed["FARM_ID"].nunique()),
+        "rows": len(processed),
+        "epochs": len(losses),
+        "best_val_loss": min(observed) if observed else None,
+        "threads": threads,
+        "duration_s": round(time.perf_counter() - started, 2)
+    }
+
+
+class TrainingOrchestrator:
+    """Retrains every (farm, crop) under the data root in a pool of training processes.
+
+    Pairs whose crop CSV and configs hash to the value recorded next to their checkpoint
+    are skipped. The core budget (serving reserve excluded) is split evenly between the
+    processes; larger datasets are scheduled first so the pool drains evenly. Each run is
+    recorded in Mongo's TrainingRuns collection.
+    """
+
+    def __init__(self, mongo_service=None, processes: int = None, models_root: str = None,
+                 model_dir: str = None, config_path: str = DEFAULT_CONFIG_PATH):
+        self.mongo_service = mongo_service
+        self.processes = processes or TRAIN_PROCESSES
+        self.models_root = models_root
+        self.model_dir = model_dir
+        self.config_path = config_path
+
+    def plan(self, farm_ids: Iterable[str] = None, crops: Iterable[str] = None,
+             force: bool = False) -> Tuple[List[Dict], List[Dict]]:
+        """Split discovered datasets into (to_train, skipped), largest datasets first"""
+        farm_ids = {str(f) for f in farm_ids} if farm_ids else None
+        crops = {str(c) for c in crops} if crops else None
+        trainer_config = build_config()
+
+        to_train, skipped = [], []
+        for farm_id, crop in discover_crop_datasets(self.config_path):
+            if (farm_ids and farm_id not in farm_ids) or (crops and crop not in crops):
+                continue
+            entry = {"farm_id": farm_id, "crop": crop}
+            try:
+                entry["data_hash"], entry["size"] = source_data_hash(farm_id, crop, trainer_config, self.config_path)
+            except Exception as e:
+                skipped.append({**entry, "reason": f"unreadable: {e}"})
+                continue
+
+            state = read_training_state(farm_id, crop, self.models_root)
+            unchanged = (state and state.get("data_hash") == entry["data_hash"] and
+                         os.path.exists(checkpoint_path(farm_id, crop, self.models_root)))
+            if unchanged and not force:
+                skipped.append({**entry, "reason": "unchanged"})
+            else:
+                to_train.append(entry)
+
+        to_train.sort(key=lambda e: e["size"], reverse=True)
+        return to_train, skipped
+
+    def pool_shape(self, jobs: int) -> Tuple[int, int]:
+        """(processes, intra-op threads per process) for ``jobs`` trainings"""
+        cores = training_core_budget(1)
+        processes = self.processes or max(1, cores // MIN_THREADS_PER_PROCESS)
+        processes = max(1, min(processes, jobs))
+        return processes, training_core_budget(processes)
+
+    def run(self, farm_ids: Iterable[str] = None, crops: Iterable[str] = None, force: bool = False,
+            mode: str = "auto", progress: Callable[..., None] = None) -> Dict:
+        """Train everything that changed; returns per-pair results plus a summary"""
+        batch_id = uuid.uuid4().hex
+        started = time.perf_counter()
+        to_train, skipped = self.plan(farm_ids, crops, force)
+        results = []
+
+        if to_train:
+            processes, threads = self.pool_shape(len(to_train))
+            logger.info(f"Training {len(to_train)} model(s) in {processes} process(es) x {threads} thread(s); "
+                        f"{len(skipped)} skipped")
+            if progress:
+                progress(stage="training", total=len(to_train), done=0, skipped=len(skipped),
+                         processes=processes, threads=threads)
+
+            # spawn: forked children would inherit torch/OpenMP and Mongo client state from the API process
+            with ProcessPoolExecutor(max_workers=processes, mp_context=mp.get_context("spawn"),
+                                     initializer=_init_worker, initargs=(threads,)) as pool:
+                futures = {
+                    pool.submit(train_dataset, entry["farm_id"], entry["crop"], entry["data_hash"], threads,
+                                mode, self.models_root, self.model_dir): entry
+                    for entry in to_train
+                }
+                for future in as_completed(futures):
+                    entry = futures[future]
+                    run = {"batch_id": batch_id, "farm_id": entry["farm_id"], "crop": entry["crop"],
+                           "data_hash": entry["data_hash"], "finished_at": datetime.utcnow()}
+                    try:
+                        run.update(status="success", **future.result())
+                    except Exception as e:
+                        logger.error(f"Training failed for {entry['farm_id']}/{entry['crop']}: {e}")
+                        run.update(status="error", error=str(e))
+                    if self.mongo_service is not None:
+                        self.mongo_service.save_training_run(run)
+                    results.append(run)
+                    if progress:
+                        progress(stage="training", total=len(to_train), done=len(results), skipped=len(skipped),
+                                 percent=round(100 * len(results) / len(to_train), 1))
+
+        succeeded = [r for r in results if r["status"] == "success"]
+        summary = {
+            "batch_id": batch_id,
+            "trained": len(succeeded),
+            "failed": len(results) - len(succeeded),
+            "skipped": len(skipped),
+            "duration_s": round(time.perf_counter() - started, 2),
+            # Sum of per-model times over wall time: close to the process count when scaling is linear
+            "parallel_speedup": round(sum(r["duration_s"] for r in succeeded) /
+                                      max(time.perf_counter() - started, 1e-9), 2) if succeeded else None
+        }
+        if progress:
+            progress(stage="done", percent=100.0, **summary)
+        return {
+            "summary": summary,
+            "results": [{k: v.isoformat() if isinstance(v, datetime) else v for k, v in r.items()} for r in results],
+            "skipped": skipped
+        }
@@ -1,5 +1,4 @@
 import plotly.graph_objects as go
-from plotly.subplots import make_subplots
 import numpy as np
 from typing import Dict, List
 import pandas as pd
@@ -10,58 +9,54 @@ class AttentionVisualizer:
 
     def plot_attention_weights(self, df: pd.DataFrame) -> go.Figure:
         """Create interactive plot of attention weights"""
-        raw_preds, x = self.predictor.predict(df, mode="raw")
-        attention_data = self.predictor.get_attention_weights(raw_preds)
+        return go.Figure(self.figure_spec(self.predictor.explain(df)))
 
-        fig = make_subplots(
-            rows=2, cols=1,
-            subplot_titles=("Attention Weights Over Time", "Feature Importance")
-        )
+    @staticmethod
+    def figure_spec(explanation: Dict, top_n: int = 10) -> Dict:
+        """Plotly-compatible {"data", "layout"} for attention and top dynamic-feature importance.
 
-        # Attention weights
-        attention = attention_data.get('attention', [])
-        fig.add_trace(
-            go.Scatter(
-                x=list(range(len(attention))),
-                y=attention,
-                mode='lines+markers',
-                name='Attention'
-            ),
-            row=1, col=1
-        )
-
-        # Feature importance (Top 10)
-        feature_importance = self.predictor.get_feature_importance(raw_preds, x)
+        Only the plotted values are included (no template, no plotly.js), so the spec stays a
+        few kilobytes; the client renders it with Plotly.newPlot(spec.data, spec.layout).
+        """
+        attention = explanation.get("attention", [])
         dynamic_features = sorted(
-            feature_importance.get('dynamic_features', {}).items(),
+            explanation.get("importance", {}).get("dynamic_features", {}).items(),
             key=lambda x: abs(x[1]),
             reverse=True
-        )[:10]
+        )[:top_n]
 
+        data = [{
+            "type": "scatter", "mode": "lines+markers", "name": "Attention",
+            "x": list(range(len(attention))), "y": attention, "xaxis": "x", "yaxis": "y"
+        }]
         if dynamic_features:
             features, importance = zip(*dynamic_features)
-            fig.add_trace(
-                go.Bar(
-                    x=features,
-                    y=importance,
-                    name='Feature Importance'
-                ),
-                row=2, col=1
-            )
-
-        # Layout
-        fig.update_layout(
-            height=800,
-            title_text="Model Attention and Feature Importance Analysis",
-            showlegend=False
-        )
-
-        fig.update_xaxes(title_text="Time Step", row=1, col=1)
-        fig.update_yaxes(title_text="Attention Weight", row=1, col=1)
-        fig.update_xaxes(title_text="Feature", row=2, col=1)
-        fig.update_yaxes(title_text="Importance Score", row=2, col=1)
-
-        return fig
+            data.append({
+                "type": "bar", "name": "Feature Importance",
+                "x": list(features), "y": list(importance), "xaxis": "x2", "yaxis": "y2"
+            })
+
+        def subplot_title(text, y):
+            return {"text": text, "x": 0.5, "y": y, "xref": "paper", "yref": "paper",
+                    "xanchor": "center", "yanchor": "bottom", "showarrow": False}
+
+        layout = {
+            "height": 800,
+            "title": {"text": "Model Attention and Feature Importance Analysis"},
+            "showlegend": False,
+            "xaxis": {"anchor": "y", "title": {"text": "Time Step"}},
+            "yaxis": {"anchor": "x", "domain": [0.575, 1.0], "title": {"text": "Attention Weight"}},
+            "xaxis2": {"anchor": "y2", "title": {"text": "Feature"}},
+            "yaxis2": {"anchor": "x2", "domain": [0.0, 0.425], "title": {"text": "Importance Score"}},
+            "annotations": [subplot_title("Attention Weights Over Time", 1.0),
+                            subplot_title("Feature Importance", 0.425)]
+        }
+        return {"data": data, "layout": layout}
+
+    @staticmethod
+    def to_html(spec: Dict) -> str:
+        """Embeddable HTML for a figure spec; plotly.js is loaded from the CDN rather than inlined"""
+        return go.Figure(spec).to_html(full_html=False, include_plotlyjs="cdn")
 
     def plot_what_if_scenario(self, scenario_results: Dict) -> go.Figure:
         """Visualize what-if scenario results"""
@@ -0,0 +1,137 @@
+import os
+import logging
+from typing import Dict, Optional
+
+import torch
+
+logger = logging.getLogger(__name__)
+
+# Cores left to the API's serving threads while training runs on the same host
+TRAIN_RESERVED_CORES = int(os.getenv("AGRIYIELD_TRAIN_RESERVED_CORES", "1"))
+TRAIN_PRECISION = os.getenv("AGRIYIELD_TRAIN_PRECISION")  # e.g. "bf16-mixed" or "32-true"; default: detect
+# Trainings that may run at once in this process (one per job-queue worker)
+TRAIN_CONCURRENCY = int(os.getenv("AGRIYIELD_JOB_WORKERS", "1"))
+# Intra-op threads for serving; 0 means every core the container may use
+INFERENCE_THREADS = int(os.getenv("AGRIYIELD_INFERENCE_THREADS", "0"))
+
+
+def _cgroup_cpu_quota() -> Optional[float]:
+    """CPU limit of the container in cores (cgroup v2 cpu.max or v1 CFS quota), or None if unlimited"""
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()[:2]
+        return None if quota == "max" else int(quota) / int(period)
+    except (OSError, ValueError):
+        pass
+    for root in ("/sys/fs/cgroup/cpu", "/sys/fs/cgroup/cpu,cpuacct"):
+        try:
+            with open(os.path.join(root, "cpu.cfs_quota_us")) as f:
+                quota = int(f.read())
+            with open(os.path.join(root, "cpu.cfs_period_us")) as f:
+                period = int(f.read())
+            return None if quota <= 0 else quota / period
+        except (OSError, ValueError):
+            continue
+    return None
+
+
+def available_cores() -> int:
+    """Cores this process may actually use: CPU affinity capped by the cgroup quota"""
+    try:
+        cores = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cores = os.cpu_count() or 1
+    quota = _cgroup_cpu_quota()
+    if quota is not None:
+        cores = min(cores, max(1, int(quota)))
+    return cores
+
+
+def training_core_budget(concurrent: int = TRAIN_CONCURRENCY) -> int:
+    """Cores for each of ``concurrent`` trainings after the serving reserve"""
+    return max(1, (available_cores() - TRAIN_RESERVED_CORES) // max(1, concurrent))
+
+
+def configure_inference_threads() -> int:
+    """Set the serving process's intra-op thread count once, at startup; returns it.
+
+    Training runs in its own processes, so the API keeps the whole cgroup-aware core count
+    unless AGRIYIELD_INFERENCE_THREADS asks for fewer.
+    """
+    threads = INFERENCE_THREADS or available_cores()
+    torch.set_num_threads(threads)
+    logger.info(f"Inference intra-op threads: {threads}")
+    return threads
+
+
+def bf16_supported() -> bool:
+    """True when the CPU has native bf16 (AVX512-BF16 or AMX); emulated bf16 is slower than fp32"""
+    try:
+        return bool(torch.cpu._is_avx512_bf16_supported() or torch.cpu._is_amx_tile_supported())
+    except AttributeError:
+        return False
+
+
+def _single_thread_worker(worker_id):
+    # Each dataloader worker is its own process; one intra-op thread each keeps the budget honest
+    torch.set_num_threads(1)
+
+
+class CpuTrainingProfile:
+    """Thread, dataloader and precision settings for training on a shared CPU host.
+
+    The core budget (cgroup-aware, minus the serving reserve, shared between concurrent
+    trainings) is split between dataloader worker processes and intra-op threads. The
+    thread count is not applied on construction: torch's thread pool is process-wide, so
+    only dedicated training processes call ``apply_threads`` (see Jobs.TrainingOrchestrator).
+    """
+
+    def __init__(self, cores: int = None, num_workers: int = None, precision: str = None,
+                 accumulate_grad_batches: int = 1):
+        self.cores = cores or training_core_budget()
+        # The TimeSeriesDataSet is in memory; a couple of workers is enough to hide collation
+        self.num_workers = num_workers if num_workers is not None else min(2, self.cores // 4)
+        self.threads = max(1, self.cores - self.num_workers)
+        self.precision = precision or TRAIN_PRECISION or ("bf16-mixed" if bf16_supported() else "32-true")
+        self.accumulate_grad_batches = max(1, int(accumulate_grad_batches))
+
+    @classmethod
+    def from_config(cls, settings: Dict) -> "CpuTrainingProfile":
+        return cls(
+            cores=settings.get("cores"),
+            num_workers=settings.get("num_workers"),
+            precision=settings.get("precision"),
+            accumulate_grad_batches=settings.get("accumulate_grad_batches", 1)
+        )
+
+    def apply_threads(self) -> int:
+        """Give this process the intra-op threads left after the dataloader workers; returns the count"""
+        torch.set_num_threads(self.threads)
+        return self.threads
+
+    def dataloader_kwargs(self) -> Dict:
+        if not self.num_workers:
+            return {"num_workers": 0}
+        return {
+            "num_workers": self.num_workers,
+            "persistent_workers": True,
+            # Forked workers would inherit the parent's threads and open Mongo clients
+            "multiprocessing_context": "spawn",
+            "worker_init_fn": _single_thread_worker
+        }
+
+    def trainer_kwargs(self) -> Dict:
+        return {
+            "accelerator": "cpu",
+            "precision": self.precision,
+            "accumulate_grad_batches": self.accumulate_grad_batches
+        }
+
+    def describe(self) -> Dict:
+        return {
+            "cores": self.cores,
+            "threads": self.threads,
+            "num_workers": self.num_workers,
+            "precision": self.precision,
+            "accumulate_grad_batches": self.accumulate_grad_batches
+        }
@@ -0,0 +1,197 @@
+import os
+import logging
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from pytorch_forecasting import TimeSeriesDataSet
+from pytorch_forecasting.data.encoders import NaNLabelEncoder
+
+from .ModelRegistry import checkpoint_path, model_registry
+from .ModelRegistry import dataset_params_path as model_dataset_params_path
+from .TFT_Training import TFTTrainer
+from .TFTPredictor import TFTPredictor
+from ..DataProcessing.DataSetLoader import CropDataLoader, discover_farm_ids
+
+logger = logging.getLogger(__name__)
+
+# Global models live in the registry under this reserved farm directory: {models_root}/_global/{crop}/
+GLOBAL_FARM_ID = "_global"
+# "farm": per-farm checkpoints only, "global": always the shared per-crop model,
+# "auto": per-farm checkpoint when one exists, otherwise the shared model
+MODEL_STRATEGY = os.getenv("AGRIYIELD_MODEL_STRATEGY", "auto")
+
+STATIC_CATEGORICALS = ["crop", "FARM_ID", "district", "soil_type", "irrigation_type", "seed_variety"]
+STATIC_REALS = ["latitude", "longitude", "soil_pH", "organic_matter_content"]
+
+
+def dataset_params_path(crop: str, models_root: str = None) -> str:
+    return model_dataset_params_path(GLOBAL_FARM_ID, crop, models_root)
+
+
+def global_model_available(crop: str) -> bool:
+    return (os.path.exists(checkpoint_path(GLOBAL_FARM_ID, crop, model_registry.models_root)) and
+            os.path.exists(dataset_params_path(crop, model_registry.models_root)))
+
+
+class GlobalTFTTrainer(TFTTrainer):
+    """One TFT per crop across all farms: one series per farm plus static farm attributes"""
+
+    def __init__(self, config=None, **kwargs):
+        kwargs["farm_id"] = GLOBAL_FARM_ID
+        super().__init__(config, **kwargs)
+
+    def preprocess_data(self, df):
+        df = df.sort_values(["FARM_ID", "date"])
+        df["time_idx"] = df.groupby("FARM_ID").cumcount()
+        df["group_id"] = df["FARM_ID"].astype(str)
+        return df
+
+    preprocess = preprocess_data
+
+    def create_dataset(self, df):
+        static_categoricals = [c for c in STATIC_CATEGORICALS if c in df.columns]
+        # Static reals must be known for every farm; partially recorded attributes are left out
+        static_reals = [c for c in STATIC_REALS if c in df.columns and df[c].notna().all()]
+        for col in static_categoricals:
+            df[col] = df[col].astype(str)
+        return TimeSeriesDataSet(
+            df,
+            time_idx="time_idx",
+            target="yield",
+            group_ids=["group_id"],
+            max_encoder_length=self.config["data"]["encoder_length"],
+            max_prediction_length=self.config["data"]["prediction_length"],
+            static_categoricals=static_categoricals,
+            static_reals=static_reals,
+            time_varying_unknown_reals=["yield", "temperature_2m_mean", "precipitation_sum"],
+            # Unseen farms and soil/irrigation classes map to the unknown class instead of failing
+            categorical_encoders={
+                col: NaNLabelEncoder(add_nan=True) for col in static_categoricals + ["group_id"]
+            },
+            target_normalizer=None,
+            add_relative_time_idx=True,
+            add_target_scales=True,
+            allow_missing_timesteps=True
+        )
+
+
+class GlobalTFTPredictor(TFTPredictor):
+    """TFTPredictor for the shared per-crop model; series are keyed by farm instead of crop"""
+
+    @staticmethod
+    def _prepare(df):
+        df = df.sort_values("date")
+        df["time_idx"] = df.groupby("FARM_ID").cumcount()
+        df["group_id"] = df["FARM_ID"].astype(str)
+        for col in STATIC_CATEGORICALS:
+            if col in df.columns:
+                df[col] = df[col].astype(str)
+        return df
+
+    @classmethod
+    def load_global_model(cls, farm_id: str, crop: str, df: pd.DataFrame, registry=None):
+        """Shared model for ``crop`` with an inference dataset built over this farm's rows.
+
+        With ``farm_id=None`` the frame keeps its own FARM_ID column, so one predictor can
+        cover several farms (see TFTPredictor.predict_latest_by_group).
+        """
+        registry = registry or model_registry
+        model = registry.get(GLOBAL_FARM_ID, crop)
+        parameters = registry.dataset_parameters(GLOBAL_FARM_ID, crop)
+        frame = df.copy()
+        if farm_id is not None:
+            frame["FARM_ID"] = str(farm_id)
+        dataset = TimeSeriesDataSet.from_parameters(parameters, cls._prepare(frame), stop_randomization=True)
+        predictor = cls(model, dataset)
+        predictor.model_version = f"{GLOBAL_FARM_ID}:{registry.version(GLOBAL_FARM_ID, crop)}"
+        return predictor
+
+
+def build_global_frame(crop: str, farm_ids: List[str] = None,
+                       prepare: Callable[[pd.DataFrame], pd.DataFrame] = None) -> pd.DataFrame:
+    """Concatenate every farm's rows for ``crop``, tagging each with its farm id"""
+    frames = []
+    for farm_id in farm_ids or discover_farm_ids(crop):
+        try:
+            df = CropDataLoader(farm_id).load_crop_data(crop)
+        except Exception as e:
+            logger.warning(f"Skipping farm '{farm_id}' for global {crop} model: {e}")
+            continue
+        if prepare is not None:
+            df = prepare(df)
+        df["FARM_ID"] = str(farm_id)
+        frames.append(df)
+    if not frames:
+        raise ValueError(f"No farm data found for crop '{crop}'")
+    return pd.concat(frames, ignore_index=True)
+
+
+def holdout_metrics(predictor: TFTPredictor, df: pd.DataFrame, holdout_days: int = 30) -> Optional[Dict]:
+    """MAE, RMSE and 80% band coverage of the median forecast over the last ``holdout_days`` targets"""
+    frame = predictor._prepare(df.copy())
+    start = int(frame["time_idx"].max()) - holdout_days + 1
+    holdout = TimeSeriesDataSet.from_dataset(predictor.dataset, frame, min_prediction_idx=start,
+                                             stop_randomization=True)
+    if len(holdout) == 0:
+        return None
+    loader = holdout.to_dataloader(train=False, batch_size=256)
+    prediction = predictor.model.predict(loader, mode="quantiles", return_y=True)
+    quantiles = prediction.output.float().cpu()
+    actual = prediction.y[0].float().cpu()
+    median = quantiles[..., 3]
+    error = (median - actual).numpy().ravel()
+    covered = ((quantiles[..., 1] <= actual) & (actual <= quantiles[..., 5])).float()
+    return {
+        "mae": round(float(np.abs(error).mean()), 4),
+        "rmse": round(float(np.sqrt((error ** 2).mean())), 4),
+        "coverage_80": round(float(covered.mean()), 4),
+        "windows": int(actual.numel())
+    }
+
+
+def compare_with_farm_models(crop: str, farm_ids: List[str] = None, holdout_days: int = 30,
+                             load_farm_data: Callable[[str, str], object] = None) -> Dict:
+    """Holdout accuracy of the global model against each farm's own model, farm by farm.
+
+    ``load_farm_data(farm_id, crop)`` returns an object with ``processed`` and ``dataset``
+    (a CachedDataset); farms without their own checkpoint are scored with the global model only.
+    """
+    if load_farm_data is None:
+        from ..DataProcessing.DatasetCache import dataset_cache
+        load_farm_data = lambda farm, c: dataset_cache.get(farm, c, encoder_length=90, prediction_length=1)
+
+    rows = []
+    for farm_id in farm_ids or discover_farm_ids(crop):
+        row = {"farm_id": farm_id}
+        try:
+            data = load_farm_data(farm_id, crop)
+            global_predictor = GlobalTFTPredictor.load_global_model(farm_id, crop, data.processed)
+            row["global"] = holdout_metrics(global_predictor, data.processed.assign(FARM_ID=str(farm_id)),
+                                            holdout_days)
+            try:
+                farm_predictor = TFTPredictor.load_best_model(farm_id, crop, data.dataset, df=data.processed)
+                row["farm"] = holdout_metrics(farm_predictor, data.processed, holdout_days)
+            except FileNotFoundError:
+                row["farm"] = None
+        except Exception as e:
+            row["error"] = str(e)
+        rows.append(row)
+
+    def mean_of(key, metric):
+        values = [r[key][metric] for r in rows if r.get(key) and r.get("farm")]
+        return round(float(np.mean(values)), 4) if values else None
+
+    compared = [r for r in rows if r.get("global") and r.get("farm")]
+    return {
+        "crop": crop,
+        "holdout_days": holdout_days,
+        "farms": rows,
+        "summary": {
+            "farms_compared": len(compared),
+            "global_better_mae": sum(1 for r in compared if r["global"]["mae"] < r["farm"]["mae"]),
+            "mean_mae": {"global": mean_of("global", "mae"), "farm": mean_of("farm", "mae")},
+            "mean_rmse": {"global": mean_of("global", "rmse"), "farm": mean_of("farm", "rmse")},
+            "mean_coverage_80": {"global": mean_of("global", "coverage_80"), "farm": mean_of("farm", "coverage_80")}
+        }
+    }
@@ -0,0 +1,175 @@
+import os
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import torch
+from pytorch_forecasting import TemporalFusionTransformer
+
+logger = logging.getLogger(__name__)
+
+MODELS_ROOT = os.getenv("AGRIYIELD_MODELS_DIR", "trainedCropModels")
+MODEL_CACHE_MB = float(os.getenv("AGRIYIELD_MODEL_CACHE_MB", "1024"))
+DATASET_PARAMS_FILENAME = "dataset_params.pt"
+
+
+def checkpoint_path(farm_id: str, crop: str, models_root: str = None) -> str:
+    return os.path.join(models_root or MODELS_ROOT, str(farm_id), str(crop), "best_model.ckpt")
+
+
+def dataset_params_path(farm_id: str, crop: str, models_root: str = None) -> str:
+    """TimeSeriesDataSet parameters (fitted encoders and scalers) saved next to the checkpoint"""
+    return os.path.join(os.path.dirname(checkpoint_path(farm_id, crop, models_root)), DATASET_PARAMS_FILENAME)
+
+
+def model_nbytes(model: torch.nn.Module) -> int:
+    """Approximate resident size of a model's parameters and buffers"""
+    tensors = list(model.parameters()) + list(model.buffers())
+    return sum(t.numel() * t.element_size() for t in tensors)
+
+
+class _Entry:
+    __slots__ = ("model", "version", "nbytes")
+
+    def __init__(self, model, version: Tuple[int, int], nbytes: int):
+        self.model = model
+        self.version = version
+        self.nbytes = nbytes
+
+
+class ModelRegistry:
+    """Process-wide LRU cache of loaded TemporalFusionTransformer checkpoints.
+
+    Entries are keyed by (farm, crop) and tagged with the checkpoint's
+    (mtime_ns, size); a cache hit costs one os.stat, and a changed checkpoint
+    is reloaded transparently. Least recently used models are evicted once the
+    summed parameter size exceeds the memory budget.
+    """
+
+    def __init__(self, models_root: str = None, max_bytes: int = None):
+        self.models_root = models_root or MODELS_ROOT
+        self.max_bytes = int(max_bytes if max_bytes is not None else MODEL_CACHE_MB * 1024 * 1024)
+        self._entries: "OrderedDict[Tuple[str, str], _Entry]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._load_locks: Dict[Tuple[str, str], threading.Lock] = {}
+        self._parameters: Dict[Tuple[str, str], Tuple[Tuple[int, int], Dict]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _version(path: str) -> Tuple[int, int]:
+        stat = os.stat(path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def _load_lock(self, key) -> threading.Lock:
+        with self._lock:
+            return self._load_locks.setdefault(key, threading.Lock())
+
+    def _lookup(self, key, version) -> Optional[_Entry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.version == version:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+        return None
+
+    def get(self, farm_id: str, crop: str) -> TemporalFusionTransformer:
+        """Return the eval-mode model for (farm, crop), loading or reloading the checkpoint if needed"""
+        key = (str(farm_id), str(crop))
+        path = checkpoint_path(farm_id, crop, self.models_root)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"No model found for crop '{crop}' in farm '{farm_id}'")
+
+        version = self._version(path)
+        entry = self._lookup(key, version)
+        if entry is not None:
+            return entry.model
+
+        # One loader per key; concurrent requests for the same model wait instead of loading twice
+        with self._load_lock(key):
+            version = self._version(path)
+            entry = self._lookup(key, version)
+            if entry is not None:
+                return entry.model
+
+            model = TemporalFusionTransformer.load_from_checkpoint(path, map_location="cpu")
+            model.eval()
+            self._store(key, _Entry(model, version, model_nbytes(model)))
+            logger.info(f"Loaded TFT checkpoint for farm '{farm_id}', crop '{crop}' from {path}")
+            return model
+
+    def dataset_parameters(self, farm_id: str, crop: str) -> Optional[Dict]:
+        """Dataset parameters saved with the checkpoint, or None for checkpoints trained before they were saved"""
+        key = (str(farm_id), str(crop))
+        path = dataset_params_path(farm_id, crop, self.models_root)
+        try:
+            version = self._version(path)
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            cached = self._parameters.get(key)
+            if cached is not None and cached[0] == version:
+                return cached[1]
+        parameters = torch.load(path, weights_only=False)
+        with self._lock:
+            self._parameters[key] = (version, parameters)
+        return parameters
+
+    def version(self, farm_id: str, crop: str) -> str:
+        """Checkpoint version tag '<mtime_ns>-<size>', usable in cache keys"""
+        mtime_ns, size = self._version(checkpoint_path(farm_id, crop, self.models_root))
+        return f"{mtime_ns}-{size}"
+
+    def put(self, farm_id: str, crop: str, model: TemporalFusionTransformer):
+        """Register a freshly trained model against the checkpoint it was saved to"""
+        key = (str(farm_id), str(crop))
+        version = self._version(checkpoint_path(farm_id, crop, self.models_root))
+        model.eval()
+        self._store(key, _Entry(model, version, model_nbytes(model)))
+
+    def _store(self, key, entry: _Entry):
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.reloads += 1
+            else:
+                self.misses += 1
+            self._entries[key] = entry
+
+            # Evict least recently used, but never the entry just stored
+            while self.total_bytes() > self.max_bytes and len(self._entries) > 1:
+                evicted_key, _ = self._entries.popitem(last=False)
+                self.evictions += 1
+                logger.info(f"Evicted TFT model {evicted_key} from registry")
+
+    def invalidate(self, farm_id: str = None, crop: str = None):
+        with self._lock:
+            for key in list(self._entries):
+                if (farm_id is None or key[0] == str(farm_id)) and (crop is None or key[1] == str(crop)):
+                    del self._entries[key]
+            for key in list(self._parameters):
+                if (farm_id is None or key[0] == str(farm_id)) and (crop is None or key[1] == str(crop)):
+                    del self._parameters[key]
+
+    def total_bytes(self) -> int:
+        with self._lock:
+            return sum(entry.nbytes for entry in self._entries.values())
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "models": [f"{farm}/{crop}" for farm, crop in self._entries],
+                "bytes": self.total_bytes(),
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "reloads": self.reloads,
+                "evictions": self.evictions
+            }
+
+
+model_registry = ModelRegistry()
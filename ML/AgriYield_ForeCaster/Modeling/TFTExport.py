@@ -0,0 +1,191 @@
+import os
+import json
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, Optional
+
+import torch
+
+from .ModelRegistry import checkpoint_path, model_registry
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FILENAME = "model_ts.pt"
+EXPORT_META_FILENAME = "model_ts.json"
+PARITY_TOLERANCE = float(os.getenv("AGRIYIELD_EXPORT_PARITY_TOL", "1e-4"))
+# Largest batch the export is traced and parity-checked at; keep >= TFTPredictor.MAX_SCENARIO_BATCH
+EXPORT_MAX_BATCH = int(os.getenv("AGRIYIELD_EXPORT_MAX_BATCH", "256"))
+
+# Tensors the TFT forward reads; everything else in the batch dict is bookkeeping
+INPUT_KEYS = ("encoder_cat", "encoder_cont", "decoder_cat", "decoder_cont",
+              "encoder_lengths", "decoder_lengths", "target_scale")
+
+
+class _ExportWrapper(torch.nn.Module):
+    """Positional-tensor front for the TFT so it can be traced; returns quantiles and selection weights"""
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, encoder_cat, encoder_cont, decoder_cat, decoder_cont,
+                encoder_lengths, decoder_lengths, target_scale):
+        out = self.model({
+            "encoder_cat": encoder_cat, "encoder_cont": encoder_cont,
+            "decoder_cat": decoder_cat, "decoder_cont": decoder_cont,
+            "encoder_lengths": encoder_lengths, "decoder_lengths": decoder_lengths,
+            "target_scale": target_scale
+        })
+        return out["prediction"], out["static_variables"], out["encoder_variables"]
+
+
+def export_paths(farm_id: str, crop: str):
+    model_dir = os.path.dirname(checkpoint_path(farm_id, crop, model_registry.models_root))
+    return os.path.join(model_dir, EXPORT_FILENAME), os.path.join(model_dir, EXPORT_META_FILENAME)
+
+
+def _inputs(x: Dict):
+    return tuple(x[key] for key in INPUT_KEYS)
+
+
+def _parity_batch(predictor, x: Dict, rows: int) -> Dict:
+    """``rows`` copies of the latest window with per-row noise on the reals, so rows differ"""
+    batch = {key: predictor._repeat(value, rows) for key, value in x.items()}
+    generator = torch.Generator().manual_seed(rows)
+    for key in ("encoder_cont", "decoder_cont"):
+        noise = torch.randn(batch[key].shape, generator=generator, dtype=batch[key].dtype) * 0.01
+        noise[:x[key].shape[0]] = 0
+        batch[key] = batch[key] + noise
+    return batch
+
+
+def export_torchscript(farm_id: str, crop: str, predictor, df) -> Dict:
+    """Trace the predictor's network at fixed encoder/decoder lengths and save it next to the checkpoint.
+
+    The trace runs on an EXPORT_MAX_BATCH-row batch built from the latest window; the export
+    is kept only if its quantiles match the eager model at batch sizes 1, an odd size and the
+    maximum, and the runtime only serves batches up to the largest verified size.
+    """
+    x = predictor._latest_window(df)
+    encoder_length = int(predictor.dataset.max_encoder_length)
+    decoder_length = int(predictor.dataset.max_prediction_length)
+    if int(x["encoder_lengths"].min()) != encoder_length:
+        raise ValueError(f"Need at least {encoder_length} encoder steps to export a fixed-length model")
+
+    model = predictor.model.eval()
+    wrapper = _ExportWrapper(model).eval()
+    groups = x["encoder_cont"].shape[0]
+    max_batch = max(EXPORT_MAX_BATCH, groups)
+    trace_x = _parity_batch(predictor, x, -(-max_batch // groups))
+    with torch.no_grad():
+        traced = torch.jit.trace(wrapper, _inputs(trace_x), check_trace=False, strict=False)
+        traced = torch.jit.optimize_for_inference(torch.jit.freeze(traced))
+
+    verified = sorted({1, min(7, max_batch), max_batch})
+    parity = 0.0
+    with torch.inference_mode():
+        for rows in verified:
+            batch = predictor._slice(trace_x, 0, rows)
+            eager = model(dict(batch))["prediction"]
+            scripted = traced(*_inputs(batch))[0]
+            parity = max(parity, float((eager - scripted).abs().max()))
+    if parity > PARITY_TOLERANCE:
+        raise RuntimeError(f"TorchScript parity check failed: max quantile diff {parity:.3g}")
+
+    ts_path, meta_path = export_paths(farm_id, crop)
+    torch.jit.save(traced, ts_path)
+    meta = {
+        "encoder_length": encoder_length,
+        "decoder_length": decoder_length,
+        "verified_batch_sizes": verified,
+        "max_batch": max_batch,
+        "checkpoint_version": model_registry.version(farm_id, crop),
+        "static_variables": list(model.static_variables),
+        "encoder_variables": list(model.encoder_variables),
+        "parity_max_abs_diff": parity,
+        "torch_version": torch.__version__,
+        "exported_at": datetime.utcnow().isoformat()
+    }
+    with open(meta_path, "w") as f:
+        json.dump(meta, f, indent=2)
+    _runtimes.pop((str(farm_id), str(crop)), None)
+    logger.info(f"Exported TorchScript model for farm '{farm_id}', crop '{crop}' (parity {parity:.3g})")
+    return meta
+
+
+class TorchScriptRuntime:
+    """Thin CPU runtime over an exported TFT: pre-built tensors in, quantiles out"""
+
+    def __init__(self, ts_path: str, meta: Dict):
+        self.module = torch.jit.load(ts_path, map_location="cpu").eval()
+        self.meta = meta
+        self.encoder_length = meta["encoder_length"]
+        self.decoder_length = meta["decoder_length"]
+        # Exports from before multi-row verification were only checked on a single window
+        self.max_batch = meta.get("max_batch", 1)
+
+    def accepts(self, x: Dict) -> bool:
+        # Traced at fixed lengths; shorter (padded) windows and unverified batch sizes use the eager model
+        return (int(x["encoder_lengths"].min()) == self.encoder_length and
+                int(x["decoder_lengths"].min()) == self.decoder_length and
+                len(x["encoder_lengths"]) <= self.max_batch)
+
+    def forward(self, x: Dict):
+        with torch.inference_mode():
+            prediction, static_variables, encoder_variables = self.module(*_inputs(x))
+        return {
+            "prediction": prediction,
+            "static_variables": static_variables,
+            "encoder_variables": encoder_variables
+        }
+
+    def feature_importance(self, out: Dict) -> Dict:
+        """Same normalised importances as TFTPredictor.get_feature_importance, for full-length windows"""
+        static = out["static_variables"].squeeze(1).sum(0)
+        encoder = out["encoder_variables"].squeeze(-2).sum(1).sum(0)
+
+        def as_percent(names, weights):
+            weights = weights.float()
+            total = float(weights.sum()) or 1.0
+            return {name: round(100 * float(w) / total, 4) for name, w in zip(names, weights)}
+
+        return {
+            "static_features": as_percent(self.meta["static_variables"], static),
+            "dynamic_features": as_percent(self.meta["encoder_variables"], encoder)
+        }
+
+
+_runtimes: Dict[tuple, TorchScriptRuntime] = {}
+_runtime_lock = threading.Lock()
+
+
+def load_runtime(farm_id: str, crop: str) -> Optional[TorchScriptRuntime]:
+    """Exported runtime for (farm, crop) if one exists for the current checkpoint, else None"""
+    key = (str(farm_id), str(crop))
+    ts_path, meta_path = export_paths(farm_id, crop)
+    if not (os.path.exists(ts_path) and os.path.exists(meta_path)):
+        return None
+
+    try:
+        checkpoint_version = model_registry.version(farm_id, crop)
+    except FileNotFoundError:
+        return None
+
+    runtime = _runtimes.get(key)
+    if runtime is not None and runtime.meta["checkpoint_version"] == checkpoint_version:
+        return runtime
+
+    with _runtime_lock:
+        with open(meta_path) as f:
+            meta = json.load(f)
+        if meta.get("checkpoint_version") != checkpoint_version:
+            # Export predates the current checkpoint; ignore it until re-exported
+            return None
+        try:
+            runtime = TorchScriptRuntime(ts_path, meta)
+        except Exception as e:
+            logger.warning(f"Could not load TorchScript export for {farm_id}/{crop}: {e}")
+            return None
+        _runtimes[key] = runtime
+        return runtime
@@ -1,17 +1,61 @@
+import os
+import time
+
+import numpy as np
 import torch
 import pandas as pd
 from pytorch_forecasting import TimeSeriesDataSet
 
+from .ModelRegistry import model_registry
+from .TFTExport import load_runtime
+from ..DataProcessing.WeatherBootstrap import WEATHER_COLUMNS, block_bootstrap_weather
+
+# QuantileLoss default quantiles [0.02, 0.1, 0.25, 0.5, 0.75, 0.9, 0.98]
+QUANTILE_KEYS = ["low_98", "low_90", "low_75", "median", "high_75", "high_90", "high_98"]
+MAX_SCENARIO_BATCH = 256
+DEFAULT_SENSITIVITY_MAGNITUDES = (-20, -10, -5, 5, 10, 20)
+ENSEMBLE_MEMBERS = int(os.getenv("AGRIYIELD_ENSEMBLE_MEMBERS", "200"))
+ENSEMBLE_TIME_BUDGET = float(os.getenv("AGRIYIELD_ENSEMBLE_TIME_BUDGET", "10"))
+ENSEMBLE_PERCENTILES = (5, 10, 25, 50, 75, 90, 95)
+# Most recent windows covered by explain() (attention is averaged over them)
+EXPLAIN_MAX_WINDOWS = int(os.getenv("AGRIYIELD_EXPLAIN_MAX_WINDOWS", "1024"))
+
 class TFTPredictor:
-    def __init__(self, model, dataset):
+    def __init__(self, model, dataset, runtime=None):
         self.model = model.to("cuda" if torch.cuda.is_available() else "cpu")
         self.model.eval()
         self.dataset = dataset
+        # TorchScript export of the same checkpoint; only used on CPU
+        self.runtime = runtime if not torch.cuda.is_available() else None
+        # Checkpoint version for cache keys; set by the loaders
+        self.model_version = None
+
+    @classmethod
+    def load_best_model(cls, farm_id, crop, dataset, registry=None, df=None):
+        """Wrap the cached best checkpoint for (farm, crop); disk is only read when it changes.
 
-    def predict(self, df):
+        With ``df`` (the processed frame) and dataset parameters saved alongside the checkpoint,
+        the inference dataset is rebuilt from those parameters so encoders and scalers match
+        training; otherwise ``dataset`` is used as given.
+        """
+        registry = registry or model_registry
+        model = registry.get(farm_id, crop)
+        parameters = registry.dataset_parameters(farm_id, crop) if df is not None else None
+        if parameters is not None:
+            dataset = TimeSeriesDataSet.from_parameters(parameters, df.copy(), stop_randomization=True)
+        runtime = load_runtime(farm_id, crop) if registry is model_registry else None
+        predictor = cls(model, dataset, runtime=runtime)
+        predictor.model_version = registry.version(farm_id, crop)
+        return predictor
+
+    def _prepare(self, df):
         # Ensure same preprocessing as training
         df["time_idx"] = df.groupby("crop").cumcount()
         df["group_id"] = df["crop"].astype(str)
+        return df
+
+    def predict(self, df, mode="quantiles"):
+        df = self._prepare(df)
 
         predict_ds = TimeSeriesDataSet.from_dataset(
             self.dataset,
@@ -20,20 +64,376 @@ class TFTPredictor:
         )
 
         dataloader = predict_ds.to_dataloader(train=False, batch_size=32)
+        if mode == "raw":
+            prediction = self.model.predict(dataloader, mode="raw", return_x=True)
+            return prediction.output, prediction.x
         return self.model.predict(dataloader, mode="quantiles")
 
-    def simulate_what_if(self, df, feature, change_percent):
-        # Baseline prediction
-        baseline_pred = self.predict(df)
+    def get_confidence_intervals(self, raw_preds, df=None):
+        """Quantile bands of the most recent prediction window"""
+        quantiles = self.model.to_quantiles(raw_preds)[-1]
+        return self._quantile_dict(quantiles)
+
+    def get_feature_importance(self, raw_preds, x=None):
+        """Variable-selection importances in percent, keyed by feature name"""
+        return self._importance_percent(self.model.interpret_output(raw_preds, reduction="sum"))
+
+    def _importance_percent(self, interpretation):
+        def as_percent(names, weights):
+            weights = weights.detach().cpu().float()
+            total = float(weights.sum()) or 1.0
+            return {name: round(100 * float(w) / total, 4) for name, w in zip(names, weights)}
+
+        return {
+            "static_features": as_percent(self.model.static_variables, interpretation["static_variables"]),
+            "dynamic_features": as_percent(self.model.encoder_variables, interpretation["encoder_variables"])
+        }
+
+    def predict_latest(self, df):
+        """Quantiles and variable importances for the most recent window in a single forward pass"""
+        x = self._latest_window(df)
+        outputs, runtime = self._forward_batches(x, x["encoder_cont"].shape[0])
+        out = outputs[-1]
+        confidence = self._quantile_dict(self.model.to_quantiles(out)[-1])
+        importance = runtime.feature_importance(out) if runtime else self.get_feature_importance(out)
+        return confidence, importance
+
+    def predict_latest_by_group(self, df):
+        """predict_latest for every series in ``df`` in stacked forward passes: {group_id: (confidence, importance)}"""
+        predict_ds = TimeSeriesDataSet.from_dataset(self.dataset, self._prepare(df), predict=True,
+                                                    stop_randomization=True)
+        x, _ = next(iter(predict_ds.to_dataloader(train=False, batch_size=len(predict_ds))))
+        groups = predict_ds.decoded_index["group_id"].astype(str).tolist()
+        outputs, runtime = self._forward_batches(x, len(groups))
+
+        results = {}
+        offset = 0
+        for out in outputs:
+            quantiles = self.model.to_quantiles(out)
+            for i in range(quantiles.shape[0]):
+                single = self._slice(out, i, i + 1)
+                importance = runtime.feature_importance(single) if runtime else self.get_feature_importance(single)
+                results[groups[offset + i]] = (self._quantile_dict(quantiles[i]), importance)
+            offset += quantiles.shape[0]
+        return results
+
+    def explain(self, df, max_windows=EXPLAIN_MAX_WINDOWS):
+        """Attention, variable importances and latest-window quantiles from one forward pass.
+
+        Covers the most recent ``max_windows`` windows in a single batch; one interpret_output
+        call gives attention averaged over them and the summed selection weights.
+        """
+        frame = self._prepare(df)
+        first_idx = int(frame["time_idx"].max()) - max_windows + 1
+        explain_ds = TimeSeriesDataSet.from_dataset(self.dataset, frame, min_prediction_idx=first_idx,
+                                                    stop_randomization=True)
+        x, _ = next(iter(explain_ds.to_dataloader(train=False, batch_size=len(explain_ds))))
+        with torch.inference_mode():
+            out = self.model(x)
+            interpretation = self.model.interpret_output(out, reduction="mean")
+            return {
+                "attention": [round(float(v), 6) for v in interpretation["attention"].float().cpu()],
+                "importance": self._importance_percent(interpretation),
+                "confidence": self._quantile_dict(self.model.to_quantiles(out)[-1]),
+                "windows": len(explain_ds)
+            }
+
+    def get_attention_weights(self, raw_preds):
+        interpretation = self.model.interpret_output(raw_preds, reduction="mean")
+        return {"attention": interpretation["attention"].detach().cpu().tolist()}
+
+    # ------------------------- Batched what-if -------------------------
+    @staticmethod
+    def _quantile_dict(quantiles):
+        """[prediction_length, n_quantiles] (or flat) tensor -> named quantiles averaged over the horizon"""
+        if quantiles.dim() > 1:
+            quantiles = quantiles.float().mean(dim=0)
+        return {key: round(float(v), 4) for key, v in zip(QUANTILE_KEYS, quantiles)}
+
+    def _latest_window(self, df):
+        """Model input for the last encoder window of every group, as a single batch"""
+        predict_ds = TimeSeriesDataSet.from_dataset(
+            self.dataset,
+            self._prepare(df),
+            predict=True,
+            stop_randomization=True
+        )
+        x, _ = next(iter(predict_ds.to_dataloader(train=False, batch_size=len(predict_ds))))
+        return x
+
+    @classmethod
+    def _repeat(cls, value, copies):
+        if isinstance(value, torch.Tensor):
+            return value.repeat(copies, *([1] * (value.dim() - 1)))
+        if isinstance(value, (list, tuple)):
+            return type(value)(cls._repeat(v, copies) for v in value)
+        return value
+
+    @classmethod
+    def _slice(cls, value, start, stop):
+        if isinstance(value, torch.Tensor) and value.dim() > 0:
+            return value[start:stop]
+        if isinstance(value, dict):
+            return {k: cls._slice(v, start, stop) for k, v in value.items()}
+        if hasattr(value, "_fields"):
+            # Network outputs are namedtuples
+            return type(value)(*(cls._slice(v, start, stop) for v in value))
+        if isinstance(value, (list, tuple)):
+            return type(value)(cls._slice(v, start, stop) for v in value)
+        return value
+
+    def _scaler_params(self, feature):
+        """(center, scale) of the feature's linear scaler; identity when the feature is unscaled"""
+        scaler = self.dataset.scalers.get(feature)
+        if scaler is None:
+            return 0.0, 1.0
+        center = getattr(scaler, "mean_", getattr(scaler, "center_", 0.0))
+        scale = getattr(scaler, "scale_", 1.0)
+        center = float(torch.as_tensor(center).reshape(-1)[0]) if center is not None else 0.0
+        scale = float(torch.as_tensor(scale).reshape(-1)[0]) if scale is not None else 1.0
+        return center, scale or 1.0
+
+    def _scaled_shift(self, feature):
+        """(center/scale) of the feature's linear scaler, so raw*f maps to scaled*f + (f-1)*center/scale"""
+        center, scale = self._scaler_params(feature)
+        return center / scale
+
+    def _apply_changes(self, x, start, stop, changes, days_affected=None):
+        """Scale the given features by (1 + pct/100) over the last `days_affected` encoder steps and the decoder"""
+        reals = self.dataset.reals
+        encoder_cont = x["encoder_cont"][start:stop]
+        decoder_cont = x["decoder_cont"][start:stop]
+
+        steps = torch.arange(encoder_cont.shape[1], device=encoder_cont.device)
+        lengths = x["encoder_lengths"][start:stop].unsqueeze(1)
+        window = steps.unsqueeze(0) < lengths
+        if days_affected:
+            window &= steps.unsqueeze(0) >= (lengths - int(days_affected))
+        window = window.unsqueeze(-1)
 
-        # Modified prediction
-        modified_df = df.copy()
-        modified_df[feature] = modified_df[feature] * (1 + change_percent/100)
-        modified_pred = self.predict(modified_df)
+        for feature, change_percent in changes.items():
+            if feature not in reals:
+                raise ValueError(f"Feature '{feature}' is not a model input; choose from {list(reals)}")
+            idx = reals.index(feature)
+            factor = 1 + float(change_percent) / 100
+            shift = (factor - 1) * self._scaled_shift(feature)
 
+            enc = encoder_cont[..., idx:idx + 1]
+            encoder_cont[..., idx:idx + 1] = torch.where(window, enc * factor + shift, enc)
+            decoder_cont[..., idx] = decoder_cont[..., idx] * factor + shift
+
+    def _forward_batches(self, x, total, deadline=None):
+        """Run the stacked batch in as few forward passes as MAX_SCENARIO_BATCH allows.
+
+        Returns the outputs and the TorchScript runtime that produced them, or None for the
+        eager model (used when there is no export or the windows are shorter than it was traced at).
+        With a ``deadline`` (time.monotonic()), a chunk is dispatched only if it is projected to
+        finish in time, judged by the previous chunk's duration; the first chunk always runs.
+        """
+        # Checked on the first chunk: chunks never exceed it, and the runtime limits the batch size
+        first = self._slice(x, 0, min(total, MAX_SCENARIO_BATCH))
+        runtime = self.runtime if self.runtime is not None and self.runtime.accepts(first) else None
+        forward = runtime.forward if runtime else self.model
+        outputs = []
+        last_chunk_seconds = 0.0
+        with torch.inference_mode():
+            for start in range(0, total, MAX_SCENARIO_BATCH):
+                if deadline is not None and outputs and time.monotonic() + last_chunk_seconds > deadline:
+                    break
+                chunk = self._slice(x, start, min(total, start + MAX_SCENARIO_BATCH))
+                started = time.monotonic()
+                outputs.append(forward(chunk))
+                last_chunk_seconds = time.monotonic() - started
+        return outputs, runtime
+
+    def simulate_scenarios(self, df, scenarios, include_importance=False):
+        """Evaluate the baseline and every scenario in one stacked batch.
+
+        Each scenario is ``{"changes": {feature: change_percent, ...}, "days_affected": n}``;
+        returns baseline quantiles plus per-scenario quantiles, deltas and percent changes.
+        """
+        base_x = self._latest_window(df)
+        groups = base_x["encoder_cont"].shape[0]
+        copies = len(scenarios) + 1
+
+        x = {key: self._repeat(value, copies) for key, value in base_x.items()}
+        for i, scenario in enumerate(scenarios, start=1):
+            self._apply_changes(x, i * groups, (i + 1) * groups,
+                                scenario.get("changes", {}), scenario.get("days_affected"))
+
+        outputs, runtime = self._forward_batches(x, copies * groups)
+        quantiles = torch.cat([self.model.to_quantiles(out) for out in outputs])
+
+        def block(i):
+            # Average over groups (normally a single crop series)
+            return quantiles[i * groups:(i + 1) * groups].float().mean(dim=0)
+
+        baseline = self._quantile_dict(block(0))
+        results = []
+        for i, scenario in enumerate(scenarios, start=1):
+            modified = self._quantile_dict(block(i))
+            delta = {k: round(modified[k] - baseline[k], 4) for k in QUANTILE_KEYS}
+            percent = {
+                k: round(100 * delta[k] / baseline[k], 4) if baseline[k] else 0.0
+                for k in QUANTILE_KEYS
+            }
+            results.append({**scenario, "confidence": modified, "delta": delta, "percent_change": percent})
+
+        response = {"baseline": {"confidence": baseline}, "scenarios": results}
+        if include_importance:
+            baseline_out = self._slice(outputs[0], 0, groups)
+            response["baseline"]["feature_importance"] = (
+                runtime.feature_importance(baseline_out) if runtime else self.get_feature_importance(baseline_out)
+            )
+        return response
+
+    def simulate_what_if(self, df, feature, change_percent, days_affected=None):
+        result = self.simulate_scenarios(
+            df,
+            [{"changes": {feature: change_percent}, "days_affected": days_affected}],
+            include_importance=True
+        )
+        scenario = result["scenarios"][0]
         return {
-            "baseline": baseline_pred.numpy().tolist(),
-            "modified": modified_pred.numpy().tolist(),
+            "baseline": result["baseline"],
+            "modified": {"confidence": scenario["confidence"]},
+            "delta": scenario["delta"],
+            "percent_change": scenario["percent_change"],
             "change_percent": change_percent,
             "feature": feature
-        }
\ No newline at end of file
+        }
+
+    def sensitivity_analysis(self, df, features, magnitudes=DEFAULT_SENSITIVITY_MAGNITUDES, days_affected=None):
+        """One-at-a-time perturbation of each feature at each magnitude, evaluated as one stacked batch.
+
+        Returns per-feature deltas for every magnitude plus tornado bars (median delta at the
+        largest negative and positive magnitude, with the 10-90% band), sorted by swing.
+        """
+        usable = [f for f in features if f in self.dataset.reals]
+        skipped = [f for f in features if f not in self.dataset.reals]
+        magnitudes = sorted(float(m) for m in magnitudes if float(m) != 0)
+        if not usable or not magnitudes:
+            raise ValueError("No perturbable features or magnitudes given")
+
+        scenarios = [
+            {"feature": feature, "change_percent": magnitude,
+             "changes": {feature: magnitude}, "days_affected": days_affected}
+            for feature in usable for magnitude in magnitudes
+        ]
+        result = self.simulate_scenarios(df, scenarios)
+
+        per_feature = {feature: [] for feature in usable}
+        for scenario in result["scenarios"]:
+            per_feature[scenario["feature"]].append({
+                "change_percent": scenario["change_percent"],
+                "delta": scenario["delta"],
+                "percent_change": scenario["percent_change"]
+            })
+
+        tornado = []
+        for feature, points in per_feature.items():
+            low, high = points[0], points[-1]
+            tornado.append({
+                "feature": feature,
+                "low_change_percent": low["change_percent"],
+                "high_change_percent": high["change_percent"],
+                "low_delta": low["delta"]["median"],
+                "high_delta": high["delta"]["median"],
+                "low_band": [low["delta"]["low_90"], low["delta"]["high_90"]],
+                "high_band": [high["delta"]["low_90"], high["delta"]["high_90"]],
+                "swing": round(abs(high["delta"]["median"] - low["delta"]["median"]), 4)
+            })
+        tornado.sort(key=lambda bar: bar["swing"], reverse=True)
+
+        return {
+            "baseline": result["baseline"]["confidence"],
+            "magnitudes": magnitudes,
+            "tornado": tornado,
+            "features": per_feature,
+            "skipped_features": skipped
+        }
+
+    def simulate_weather_ensemble(self, df, members=ENSEMBLE_MEMBERS, features=None, horizon_days=None,
+                                  block_days=7, time_budget=ENSEMBLE_TIME_BUDGET, seed=0):
+        """Forecast under ``members`` alternative weather trajectories, batched into one inference.
+
+        The weather inputs of the latest window's last ``horizon_days`` encoder steps are replaced
+        by a block bootstrap from the same time of year in the farm's other years. The models are
+        trained with weather as time-varying unknown reals, so the decoder never reads future
+        weather: members are alternative *recent observed* weather, not alternative forecasts.
+        Decoder steps are resampled only for features the network does read there
+        (``decoder_features`` in the response; empty for the current dataset definition).
+        Members are run in stacked chunks while ``time_budget`` seconds allow; the response
+        reports how many were evaluated and the percentile bands across them.
+        """
+        deadline = time.monotonic() + float(time_budget) if time_budget else None
+        df = df.sort_values("date")
+        base_x = self._latest_window(df.copy())
+        groups = base_x["encoder_cont"].shape[0]
+        reals = self.dataset.reals
+
+        features = [f for f in (features or WEATHER_COLUMNS) if f in reals and f in df.columns]
+        if not features:
+            raise ValueError(f"No weather inputs to resample; model inputs are {list(reals)}")
+        lengths = base_x["encoder_lengths"]
+        horizon = min(int(horizon_days or lengths.min()), int(lengths.min()))
+        decoder_steps = base_x["decoder_cont"].shape[1]
+
+        # Row block 0 is the observed weather; blocks 1..members are the bootstrap members
+        dates = df["date"].iloc[-(horizon + decoder_steps):]
+        samples = block_bootstrap_weather(df, dates, features, int(members), int(block_days),
+                                          rng=np.random.default_rng(seed))
+        for j, feature in enumerate(features):
+            center, scale = self._scaler_params(feature)
+            samples[..., j] = (samples[..., j] - center) / scale
+
+        encoder_cont = base_x["encoder_cont"]
+        scaled = torch.as_tensor(samples, dtype=encoder_cont.dtype, device=encoder_cont.device)
+        x = {key: self._repeat(value, int(members) + 1) for key, value in base_x.items()}
+        member_rows = torch.arange(1, int(members) + 1, device=encoder_cont.device) * groups
+        # Unknown reals are masked out of the decoder's variable selection; writing them there is a no-op
+        decoder_features = [f for f in features if f in self.model.decoder_variables]
+        for g in range(groups):
+            rows = member_rows + g
+            length = int(lengths[g])
+            for j, feature in enumerate(features):
+                idx = reals.index(feature)
+                x["encoder_cont"][rows, length - horizon:length, idx] = scaled[:, :horizon, j]
+                if feature in decoder_features:
+                    x["decoder_cont"][rows, :, idx] = scaled[:, horizon:, j]
+
+        outputs, _ = self._forward_batches(x, (int(members) + 1) * groups, deadline=deadline)
+        quantiles = torch.cat([self.model.to_quantiles(out) for out in outputs]).float()
+        if quantiles.dim() > 2:
+            quantiles = quantiles.mean(dim=1)
+        evaluated = quantiles.shape[0] // groups
+        # [members + 1, n_quantiles], averaged over groups
+        quantiles = quantiles[:evaluated * groups].reshape(evaluated, groups, -1).mean(dim=1).cpu().numpy()
+
+        baseline = self._quantile_dict(torch.as_tensor(quantiles[0]))
+        ensemble = quantiles[1:]
+        if not len(ensemble):
+            raise RuntimeError("Time budget exhausted before any ensemble member was evaluated")
+
+        median_idx = QUANTILE_KEYS.index("median")
+        medians = ensemble[:, median_idx]
+        return {
+            "baseline": {"confidence": baseline},
+            "distribution": {
+                f"p{p}": round(float(v), 4) for p, v in zip(ENSEMBLE_PERCENTILES,
+                                                            np.percentile(medians, ENSEMBLE_PERCENTILES))
+            },
+            "bands": {
+                key: {f"p{p}": round(float(np.percentile(ensemble[:, i], p)), 4) for p in (5, 50, 95)}
+                for i, key in enumerate(QUANTILE_KEYS)
+            },
+            "prob_below_baseline": round(float((medians < baseline["median"]).mean()), 4),
+            "members": int(members),
+            "members_evaluated": len(ensemble),
+            "truncated": len(ensemble) < int(members),
+            "features": features,
+            "decoder_features": decoder_features,
+            "horizon_days": horizon,
+            "block_days": int(block_days),
+            "seed": seed
+        }
@@ -1,54 +1,193 @@
 import os
+import copy
 import torch
 import pandas as pd
 from pytorch_forecasting import TimeSeriesDataSet, TemporalFusionTransformer
 from pytorch_forecasting.metrics import QuantileLoss
 from lightning.pytorch import Trainer
-from lightning.pytorch.callbacks import EarlyStopping, ModelCheckpoint
+from lightning.pytorch.callbacks import Callback, EarlyStopping, ModelCheckpoint
+
+from .ModelRegistry import checkpoint_path, dataset_params_path, model_registry
+from .CpuProfile import CpuTrainingProfile
+
+DEFAULT_CONFIG = {
+    "data": {"encoder_length": 90, "prediction_length": 1},
+    "model": {"learning_rate": 0.03, "hidden_size": 16, "dropout": 0.1, "patience": 5},
+    "training": {"max_epochs": 30, "batch_size": 64},
+    # Warm-start fine-tuning on recent rows; the best epoch is picked on the val_days before the
+    # holdout, and promoted only if loss on the final holdout_days does not regress. Full retrains
+    # of a served model use the same holdout_days and tolerance for their promotion check
+    "finetune": {"window_days": 365, "val_days": 30, "holdout_days": 30, "max_epochs": 3, "lr_factor": 0.1,
+                 "tolerance": 0.0},
+    # CPU-only hosts: None means derive from the core budget / detected bf16 support (see CpuProfile);
+    # optimizer steps every accumulate_grad_batches batches (effective batch = batch_size * that)
+    "cpu": {"cores": None, "num_workers": None, "precision": None, "accumulate_grad_batches": 2}
+}
+
+def build_config(config=None, encoder_length=None, prediction_length=None):
+    """DEFAULT_CONFIG merged with ``config`` section by section, plus the keyword overrides"""
+    merged = copy.deepcopy(DEFAULT_CONFIG)
+    for section, values in (config or {}).items():
+        if isinstance(values, dict):
+            merged.setdefault(section, {}).update(values)
+        else:
+            merged[section] = values
+    if encoder_length is not None:
+        merged["data"]["encoder_length"] = encoder_length
+    if prediction_length is not None:
+        merged["data"]["prediction_length"] = prediction_length
+    return merged
+
+
+def preprocess_frame(df):
+    # Basic preprocessing
+    df = df.sort_values(["crop", "date"])
+    df["time_idx"] = df.groupby("crop").cumcount()
+    df["group_id"] = df["crop"].astype(str)
+    return df
+
+
+def build_dataset(df, config):
+    return TimeSeriesDataSet(
+        df,
+        time_idx="time_idx",
+        target="yield",
+        group_ids=["group_id"],
+        max_encoder_length=config["data"]["encoder_length"],
+        max_prediction_length=config["data"]["prediction_length"],
+        static_categoricals=["crop"],
+        time_varying_unknown_reals=["yield", "temperature_2m_mean", "precipitation_sum"],
+        target_normalizer=None,
+        add_relative_time_idx=True,
+        add_target_scales=True,
+        allow_missing_timesteps=True
+    )
+
+
+class TrainingProgress(Callback):
+    """Reports epoch progress and validation loss to a plain callable"""
+
+    def __init__(self, report):
+        self.report = report
+
+    def on_train_epoch_end(self, trainer, pl_module):
+        metrics = {k: float(v) for k, v in trainer.callback_metrics.items() if v.numel() == 1}
+        self.report(trainer.current_epoch + 1, trainer.max_epochs, metrics)
 
 class TFTTrainer:
-    def __init__(self, config):
-        self.config = config
+    def __init__(self, config=None, encoder_length=None, prediction_length=None, farm_id=None,
+                 model_dir=None, data_dir=None, crop_list=None, models_root=None):
+        # Accepts either a full config dict or the keyword form used by the API routes
+        self.config = build_config(config, encoder_length, prediction_length)
+
+        self.farm_id = farm_id
+        self.model_dir = model_dir
+        self.data_dir = data_dir
+        self.crop_list = crop_list or []
+        self.models_root = models_root
         self.device = "cuda" if torch.cuda.is_available() else "cpu"
+        self._cpu_profile = None
         torch.set_float32_matmul_precision('medium')
 
+    @property
+    def cpu_profile(self):
+        # Built on first use: it reads cgroup limits and probes bf16, which only training needs
+        if self.device != "cpu":
+            return None
+        if self._cpu_profile is None:
+            self._cpu_profile = CpuTrainingProfile.from_config(self.config["cpu"])
+        return self._cpu_profile
+
     def preprocess_data(self, df):
-        # Basic preprocessing
-        df = df.sort_values(["crop", "date"])
-        df["time_idx"] = df.groupby("crop").cumcount()
-        df["group_id"] = df["crop"].astype(str)
-        return df
+        return preprocess_frame(df)
+
+    preprocess = preprocess_data
+
+    def _trainer_kwargs(self, evaluation=False):
+        if self.cpu_profile is None:
+            return {"accelerator": "auto", "devices": 1}
+        kwargs = {**self.cpu_profile.trainer_kwargs(), "devices": 1}
+        if evaluation:
+            kwargs.pop("accumulate_grad_batches")
+        return kwargs
+
+    def _dataloader_kwargs(self):
+        return self.cpu_profile.dataloader_kwargs() if self.cpu_profile is not None else {}
 
     def create_dataset(self, df):
-        return TimeSeriesDataSet(
-            df,
-            time_idx="time_idx",
-            target="yield",
-            group_ids=["group_id"],
-            max_encoder_length=self.config["data"]["encoder_length"],
-            max_prediction_length=self.config["data"]["prediction_length"],
-            static_categoricals=["crop"],
-            time_varying_unknown_reals=["yield", "temperature_2m_mean", "precipitation_sum"],
-            target_normalizer=None,
-            add_relative_time_idx=True,
-            add_target_scales=True,
-            allow_missing_timesteps=True
-        )
+        return build_dataset(df, self.config)
+
+    def _holdout_loss(self, model, holdout_ds):
+        loader = holdout_ds.to_dataloader(train=False, batch_size=self.config["training"]["batch_size"] * 2,
+                                          **self._dataloader_kwargs())
+        evaluator = Trainer(**self._trainer_kwargs(evaluation=True), logger=False, enable_progress_bar=False,
+                            enable_checkpointing=False)
+        return float(evaluator.validate(model, dataloaders=loader, verbose=False)[0]["val_loss"])
+
+    def _promote(self, crop_name, candidate_path, parameters, model):
+        """Move a candidate checkpoint into the served place, dataset parameters first"""
+        target = checkpoint_path(self.farm_id, crop_name, self.models_root)
+        params_path = dataset_params_path(self.farm_id, crop_name, self.models_root)
+        # Both files are swapped in with os.replace, so readers never see a partial write
+        torch.save(parameters, params_path + ".tmp")
+        os.replace(params_path + ".tmp", params_path)
+        os.replace(candidate_path, target)
+        if self.models_root in (None, model_registry.models_root):
+            model_registry.put(self.farm_id, crop_name, model)
+
+    def train_model(self, dataset, crop_name, callbacks=None, df=None):
+        return self.retrain_model(dataset, df, crop_name, callbacks=callbacks)["model"]
+
+    def retrain_model(self, dataset, df, crop_name, callbacks=None):
+        """Train a fresh TFT on ``dataset`` and, for a farm, promote it to best_model.ckpt.
+
+        Epochs are checkpointed to a candidate file, so the served checkpoint never holds
+        half-trained weights. When a model is already served and ``df`` (the frame ``dataset``
+        was built from) is given, the last ``holdout_days`` are kept out of training and the
+        candidate replaces the served model only if its holdout loss is no worse (within
+        ``tolerance``), as in finetune_model.
+        """
+        settings = self.config["finetune"]
+        parameters = dataset.get_parameters()
+        train_ds = dataset
+        checkpoint, baseline, target = None, None, None
+        if self.farm_id is not None:
+            target = checkpoint_path(self.farm_id, crop_name, self.models_root)
+            checkpoint = ModelCheckpoint(
+                dirpath=os.path.dirname(target),
+                filename="candidate_full_model",
+                monitor="val_loss",
+                save_top_k=1,
+                enable_version_counter=False
+            )
+            if df is not None and os.path.exists(target):
+                baseline = TemporalFusionTransformer.load_from_checkpoint(target, map_location="cpu")
+                holdout_start = int(df["time_idx"].max()) - settings["holdout_days"] + 1
+                train_ds = TimeSeriesDataSet.from_parameters(parameters, df[df["time_idx"] < holdout_start])
+                candidate_holdout = TimeSeriesDataSet.from_parameters(parameters, df, min_prediction_idx=holdout_start,
+                                                                      stop_randomization=True)
+                # The served model is scored with the encoders and scalers it was trained with
+                params_path = dataset_params_path(self.farm_id, crop_name, self.models_root)
+                baseline_parameters = (torch.load(params_path, weights_only=False) if os.path.exists(params_path)
+                                       else parameters)
+                baseline_holdout = TimeSeriesDataSet.from_parameters(baseline_parameters, df,
+                                                                     min_prediction_idx=holdout_start,
+                                                                     stop_randomization=True)
 
-    def train_model(self, dataset, crop_name):
         trainer = Trainer(
             max_epochs=self.config["training"]["max_epochs"],
-            accelerator="auto",
-            devices=1,
+            **self._trainer_kwargs(),
             callbacks=[
                 EarlyStopping(monitor="val_loss", patience=self.config["model"]["patience"]),
-                ModelCheckpoint(monitor="val_loss")
+                checkpoint or ModelCheckpoint(monitor="val_loss"),
+                *(callbacks or [])
             ],
+            default_root_dir=self.model_dir,
             enable_progress_bar=True
         )
 
         model = TemporalFusionTransformer.from_dataset(
-            dataset,
+            train_ds,
             learning_rate=self.config["model"]["learning_rate"],
             hidden_size=self.config["model"]["hidden_size"],
             dropout_rate=self.config["model"]["dropout"],
@@ -56,14 +195,113 @@ class TFTTrainer:
             log_interval=10
         )
 
-        train_loader = dataset.to_dataloader(train=True, batch_size=self.config["training"]["batch_size"])
-        val_loader = dataset.to_dataloader(train=False, batch_size=self.config["training"]["batch_size"]*2)
+        loader_kwargs = self._dataloader_kwargs()
+        train_loader = train_ds.to_dataloader(train=True, batch_size=self.config["training"]["batch_size"],
+                                              **loader_kwargs)
+        val_loader = train_ds.to_dataloader(train=False, batch_size=self.config["training"]["batch_size"]*2,
+                                            **loader_kwargs)
 
         trainer.fit(model, train_dataloaders=train_loader, val_dataloaders=val_loader)
-        return model
+
+        outcome = {"mode": "full", "promoted": False, "epochs": trainer.current_epoch}
+        candidate_path = checkpoint.best_model_path if checkpoint is not None else None
+        if candidate_path:
+            model = TemporalFusionTransformer.load_from_checkpoint(candidate_path, map_location="cpu")
+            promoted = True
+            if baseline is not None:
+                outcome["baseline_val_loss"] = self._holdout_loss(baseline, baseline_holdout)
+                outcome["candidate_val_loss"] = self._holdout_loss(model, candidate_holdout)
+                outcome["holdout_days"] = settings["holdout_days"]
+                promoted = outcome["candidate_val_loss"] <= outcome["baseline_val_loss"] * (1 + settings["tolerance"])
+            if promoted:
+                self._promote(crop_name, candidate_path, parameters, model)
+            elif os.path.exists(candidate_path):
+                os.remove(candidate_path)
+            outcome["promoted"] = promoted
+        elif target is None:
+            # No farm: nothing is served from this run, the fitted model is simply returned
+            outcome["promoted"] = None
+        outcome["model"] = model
+        return outcome
 
     def train_crop(self, crop_data, crop_name):
         df = self.preprocess_data(crop_data)
         dataset = self.create_dataset(df)
-        return self.train_model(dataset, crop_name)
-    
\ No newline at end of file
+        return self.train_model(dataset, crop_name, df=df)
+
+    def finetune_model(self, dataset, df, crop_name, callbacks=None):
+        """Warm-start from the current checkpoint on a sliding window of recent rows.
+
+        The last ``holdout_days`` targets are held out and the ``val_days`` before them pick the
+        candidate's best epoch, so checkpoint selection never sees the holdout. The candidate
+        replaces best_model.ckpt only if its holdout loss is no worse than the current model's
+        (within ``tolerance``). Raises FileNotFoundError when there is no checkpoint to start from.
+        """
+        settings = self.config["finetune"]
+        encoder_length = self.config["data"]["encoder_length"]
+        target = checkpoint_path(self.farm_id, crop_name, self.models_root)
+        if not os.path.exists(target):
+            raise FileNotFoundError(f"No checkpoint to fine-tune for crop '{crop_name}' in farm '{self.farm_id}'")
+        base = TemporalFusionTransformer.load_from_checkpoint(target, map_location="cpu")
+
+        # Recent rows only, plus enough history to fill the first encoder window
+        last_idx = int(df["time_idx"].max())
+        recent = df[df["time_idx"] > last_idx - settings["window_days"] - encoder_length]
+        holdout_start = last_idx - settings["holdout_days"] + 1
+        val_start = holdout_start - settings["val_days"]
+        # Encoders and scalers the checkpoint was trained with; ``dataset``'s (fitted on the
+        # current data) only for checkpoints saved before their parameters were
+        params_path = dataset_params_path(self.farm_id, crop_name, self.models_root)
+        parameters = (torch.load(params_path, weights_only=False) if os.path.exists(params_path)
+                      else dataset.get_parameters())
+        train_ds = TimeSeriesDataSet.from_parameters(parameters, recent[recent["time_idx"] < val_start])
+        val_ds = TimeSeriesDataSet.from_parameters(parameters, recent[recent["time_idx"] < holdout_start],
+                                                   min_prediction_idx=val_start, stop_randomization=True)
+        holdout_ds = TimeSeriesDataSet.from_parameters(parameters, recent, min_prediction_idx=holdout_start,
+                                                       stop_randomization=True)
+        batch_size = self.config["training"]["batch_size"]
+        loader_kwargs = self._dataloader_kwargs()
+        train_loader = train_ds.to_dataloader(train=True, batch_size=batch_size, **loader_kwargs)
+        val_loader = val_ds.to_dataloader(train=False, batch_size=batch_size * 2, **loader_kwargs)
+
+        baseline_loss = self._holdout_loss(base, holdout_ds)
+
+        candidate = copy.deepcopy(base)
+        candidate.hparams.learning_rate = base.hparams.learning_rate * settings["lr_factor"]
+        checkpoint = ModelCheckpoint(
+            dirpath=os.path.dirname(target),
+            filename="candidate_model",
+            monitor="val_loss",
+            save_top_k=1,
+            enable_version_counter=False
+        )
+        trainer = Trainer(
+            max_epochs=settings["max_epochs"],
+            **self._trainer_kwargs(),
+            callbacks=[checkpoint, *(callbacks or [])],
+            default_root_dir=self.model_dir,
+            enable_progress_bar=False
+        )
+        trainer.fit(candidate, train_dataloaders=train_loader, val_dataloaders=val_loader)
+
+        candidate_path = checkpoint.best_model_path
+        if candidate_path:
+            candidate = TemporalFusionTransformer.load_from_checkpoint(candidate_path, map_location="cpu")
+        candidate_loss = self._holdout_loss(candidate, holdout_ds)
+
+        promoted = candidate_loss <= baseline_loss * (1 + settings["tolerance"])
+        if promoted and candidate_path:
+            self._promote(crop_name, candidate_path, parameters, candidate)
+        elif candidate_path and os.path.exists(candidate_path):
+            os.remove(candidate_path)
+
+        return {
+            "mode": "finetune",
+            "promoted": bool(promoted and candidate_path),
+            "baseline_val_loss": baseline_loss,
+            "candidate_val_loss": candidate_loss,
+            "epochs": trainer.current_epoch,
+            "window_rows": len(recent),
+            "val_days": settings["val_days"],
+            "holdout_days": settings["holdout_days"]
+        }
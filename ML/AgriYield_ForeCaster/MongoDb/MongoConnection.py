@@ -0,0 +1,99 @@
+import os
+import logging
+import threading
+from datetime import datetime
+from typing import Optional
+
+from pymongo import MongoClient
+from pymongo.collection import Collection
+from pymongo.database import Database
+
+logger = logging.getLogger(__name__)
+
+MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/")
+MONGO_DB_NAME = os.getenv("AGRIYIELD_MONGO_DB", "AgriSupportDB")
+
+# Pool tuned for a threaded Flask worker plus the background job threads
+MONGO_CLIENT_OPTIONS = {
+    "maxPoolSize": int(os.getenv("MONGO_MAX_POOL_SIZE", "50")),
+    "minPoolSize": int(os.getenv("MONGO_MIN_POOL_SIZE", "2")),
+    "maxIdleTimeMS": int(os.getenv("MONGO_MAX_IDLE_MS", "300000")),
+    "serverSelectionTimeoutMS": int(os.getenv("MONGO_SERVER_SELECTION_MS", "5000")),
+    "connectTimeoutMS": int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "5000")),
+    "retryWrites": True
+}
+
+# Bump when INDEX_SPECS changes so existing deployments re-run index creation once
+INDEX_VERSION = 3
+INDEX_SPECS = {
+    "Sessions": [
+        (["session_id"], {"unique": True}),
+        (["expires_at"], {"expireAfterSeconds": 0})
+    ],
+    "PredictionCache": [(["expires_at"], {"expireAfterSeconds": 0})],
+    "SimulationCache": [(["expires_at"], {"expireAfterSeconds": 0})],
+    "YieldPredictions": [([("farm_id", 1), ("crop", 1), ("created_at", -1)], {})],
+    "WhatIfSimulations": [([("farm_id", 1), ("crop", 1), ("created_at", -1)], {})],
+    "ChatHistory": [([("session_id", 1), ("timestamp", -1)], {})],
+    "ResponseCurves": [([("farm_id", 1), ("crop", 1)], {})],
+    "TrainingRuns": [([("farm_id", 1), ("crop", 1), ("finished_at", -1)], {}), (["batch_id"], {})],
+    "TrainingJobs": [
+        # Only one queued/running job per dedup key; finished jobs drop the 'active' flag
+        (["dedup_key"], {"unique": True, "name": "active_dedup_key", "partialFilterExpression": {"active": True}}),
+        ([("status", 1), ("created_at", 1)], {}),
+        ([("farm_id", 1), ("crop", 1), ("created_at", -1)], {})
+    ]
+}
+
+_lock = threading.Lock()
+_client: Optional[MongoClient] = None
+_client_pid: Optional[int] = None
+_indexes_ready = False
+
+
+def get_client() -> MongoClient:
+    """One MongoClient per process (recreated after fork, which pymongo clients do not survive)"""
+    global _client, _client_pid
+    if _client is not None and _client_pid == os.getpid():
+        return _client
+    with _lock:
+        if _client is None or _client_pid != os.getpid():
+            _client = MongoClient(MONGO_URI, **MONGO_CLIENT_OPTIONS)
+            _client_pid = os.getpid()
+            logger.info("MongoDB client created.")
+        return _client
+
+
+def get_database() -> Database:
+    return get_client()[MONGO_DB_NAME]
+
+
+def get_collection(name: str) -> Collection:
+    return get_database()[name]
+
+
+def ensure_indexes(db: Database = None, force: bool = False) -> bool:
+    """Create INDEX_SPECS once per process, and only when the stored index version is older"""
+    global _indexes_ready
+    if _indexes_ready and not force:
+        return True
+    with _lock:
+        if _indexes_ready and not force:
+            return True
+        db = db if db is not None else get_database()
+        try:
+            meta = db["_schema"].find_one({"_id": "agriyield_indexes"}) or {}
+            if force or meta.get("version", 0) < INDEX_VERSION:
+                for collection, specs in INDEX_SPECS.items():
+                    for keys, options in specs:
+                        db[collection].create_index(keys, **options)
+                db["_schema"].update_one(
+                    {"_id": "agriyield_indexes"},
+                    {"$set": {"version": INDEX_VERSION, "updated_at": datetime.utcnow()}},
+                    upsert=True
+                )
+                logger.info(f"MongoDB indexes ensured (version {INDEX_VERSION}).")
+            _indexes_ready = True
+        except Exception as e:
+            logging.error(f"❌ Index creation failed: {e}")
+        return _indexes_ready
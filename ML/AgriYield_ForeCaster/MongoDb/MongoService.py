@@ -1,17 +1,21 @@
-import os
 import logging
-from pymongo import MongoClient
+from pymongo import InsertOne, ReplaceOne, UpdateOne
+from pymongo.errors import BulkWriteError
 from datetime import datetime, timedelta
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Tuple
+
+from .MongoConnection import get_client, get_database, ensure_indexes
 
 logger = logging.getLogger(__name__)
 
+SESSION_TIMEOUT_HOURS = 1
+
 
 class MongoService:
     def __init__(self):
-        mongo_uri = os.getenv("MONGO_URI", "mongodb://localhost:27017/")
-        self.client = MongoClient(mongo_uri)
-        self.db = self.client["AgriSupportDB"]
+        # Shared process-wide client; constructing a service costs no connection setup
+        self.client = get_client()
+        self.db = get_database()
 
         # Collections
         self.predictions = self.db["YieldPredictions"]
@@ -20,25 +24,12 @@ class MongoService:
         self.simulations = self.db["WhatIfSimulations"]
         self.prediction_cache = self.db["PredictionCache"]
         self.simulation_cache = self.db["SimulationCache"]
+        self.response_curves = self.db["ResponseCurves"]
+        self.training_jobs = self.db["TrainingJobs"]
+        self.training_runs = self.db["TrainingRuns"]
 
-        # Init
-        self._create_indexes()
-        logging.info("MongoDB service initialized.")
-
-    def _create_indexes(self):
-        """Create necessary indexes for auto-expiry and lookup performance"""
-        try:
-            self.sessions.create_index("session_id", unique=True)
-            self.sessions.create_index("expires_at", expireAfterSeconds=0)
-
-            self.prediction_cache.create_index("expires_at", expireAfterSeconds=0)
-            self.simulation_cache.create_index("expires_at", expireAfterSeconds=0)
-
-            self.predictions.create_index([("farm_id", 1), ("crop", 1), ("created_at", -1)])
-            self.simulations.create_index([("farm_id", 1), ("crop", 1), ("created_at", -1)])
-            self.chats.create_index([("session_id", 1), ("timestamp", -1)])
-        except Exception as e:
-            logging.error(f"❌ Index creation failed: {e}")
+        # Runs once per process, and only if the stored index version is out of date
+        ensure_indexes(self.db)
 
 
     #-----------------SESSION and CHAT MANAGEMENT-----------------
@@ -73,6 +64,17 @@ class MongoService:
             logger.error(f"Error retrieving session for farm_id {farm_id}: {str(e)}")
             return None
 
+    def get_session(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Unexpired session document by session_id"""
+        try:
+            return self.sessions.find_one(
+                {"session_id": str(session_id), "expires_at": {"$gt": datetime.utcnow()}},
+                {"_id": 0}
+            )
+        except Exception as e:
+            logger.error(f"Error retrieving session {session_id}: {str(e)}")
+            return None
+
     def save_session(self, session_data: Dict[str, Any]) -> bool:
         """
         Save or update session with robust validation and error handling
@@ -220,14 +222,14 @@ class MongoService:
             logging.error(f"❌ Failed to get cached prediction: {e}")
             return None
 
-    def cache_prediction(self, cache_key: str, result: Dict[str, Any]) -> bool:
+    def cache_prediction(self, cache_key: str, result: Dict[str, Any], ttl: timedelta = None) -> bool:
         try:
             self.prediction_cache.update_one(
                 {"_id": cache_key},
                 {"$set": {
                     "result": result,
                     "timestamp": datetime.utcnow(),
-                    "expires_at": datetime.utcnow() + timedelta(days=1)
+                    "expires_at": datetime.utcnow() + (ttl or timedelta(days=1))
                 }},
                 upsert=True
             )
@@ -236,6 +238,23 @@ class MongoService:
             logging.error(f"❌ Failed to cache prediction: {e}")
             return False
 
+    def cache_predictions(self, results: Dict[str, Dict[str, Any]], ttl: timedelta = None) -> bool:
+        """Upsert many cached predictions, keyed by cache key, in one unordered bulk_write"""
+        try:
+            if results:
+                now = datetime.utcnow()
+                expires_at = now + (ttl or timedelta(days=1))
+                self.prediction_cache.bulk_write([
+                    UpdateOne({"_id": key},
+                              {"$set": {"result": result, "timestamp": now, "expires_at": expires_at}},
+                              upsert=True)
+                    for key, result in results.items()
+                ], ordered=False)
+            return True
+        except Exception as e:
+            logging.error(f"❌ Failed to cache predictions: {e}")
+            return False
+
     def save_prediction(self, prediction_data: Dict[str, Any]) -> bool:
         try:
             # Clean and prepare prediction data
@@ -449,6 +468,45 @@ class MongoService:
             return False
 
 
+    # ---------- What-if Response Curves ----------
+    def save_response_curves(self, curves: List[Dict[str, Any]]) -> bool:
+        try:
+            if curves:
+                self.response_curves.bulk_write(
+                    [ReplaceOne({"_id": curve["_id"]}, curve, upsert=True) for curve in curves],
+                    ordered=False
+                )
+            return True
+        except Exception as e:
+            logging.error(f"❌ Failed to save response curves: {e}")
+            return False
+
+    def get_response_curve(self, curve_id: str) -> Optional[Dict[str, Any]]:
+        try:
+            return self.response_curves.find_one({"_id": curve_id})
+        except Exception as e:
+            logging.error(f"❌ Failed to get response curve: {e}")
+            return None
+
+    # ---------- Training Runs ----------
+    def save_training_run(self, run: Dict[str, Any]) -> bool:
+        try:
+            # Insert a copy so the caller's dict does not pick up an ObjectId
+            self.training_runs.insert_one(dict(run))
+            return True
+        except Exception as e:
+            logging.error(f"❌ Failed to save training run: {e}")
+            return False
+
+    def get_training_runs(self, farm_id: str = None, crop: str = None, batch_id: str = None,
+                          limit: int = 50) -> List[Dict[str, Any]]:
+        try:
+            query = {k: v for k, v in (("farm_id", farm_id), ("crop", crop), ("batch_id", batch_id)) if v}
+            return list(self.training_runs.find(query, {"_id": 0}, sort=[("finished_at", -1)], limit=limit))
+        except Exception as e:
+            logging.error(f"❌ Failed to fetch training runs: {e}")
+            return []
+
     # ---------- Chat Storage ----------
     def save_chat(self, chat_data: Dict[str, Any]) -> bool:
         try:
@@ -459,6 +517,47 @@ class MongoService:
             logging.error(f"❌ Failed to save chat: {e}")
             return False
 
+    def apply_session_writes(self, session_updates: Dict[str, Dict[str, Any]],
+                             chats: List[Dict[str, Any]]) -> Tuple[Dict[str, Dict[str, Any]], List[Dict[str, Any]]]:
+        """Buffered session updates and chat inserts, as one unordered bulk_write per collection.
+
+        Returns the session updates and chats that were not written, so the caller can retry
+        exactly those; both are empty on success.
+        """
+        failed_updates = {}
+        if session_updates:
+            session_ids = list(session_updates)
+            try:
+                self.sessions.bulk_write(
+                    [UpdateOne({"session_id": sid}, session_updates[sid]) for sid in session_ids],
+                    ordered=False
+                )
+            except Exception as e:
+                logging.error(f"❌ Failed to write session updates: {e}")
+                failed = self._failed_indexes(e, len(session_ids))
+                failed_updates = {session_ids[i]: session_updates[session_ids[i]] for i in failed}
+
+        failed_chats = []
+        if chats:
+            try:
+                self.chats.bulk_write([InsertOne(chat) for chat in chats], ordered=False)
+            except Exception as e:
+                logging.error(f"❌ Failed to write chat history: {e}")
+                # InsertOne stamps an _id, so a retried chat that already landed is a duplicate key
+                failed_chats = [chats[i] for i in self._failed_indexes(e, len(chats), ignore_duplicates=True)]
+
+        return failed_updates, failed_chats
+
+    @staticmethod
+    def _failed_indexes(error: Exception, count: int, ignore_duplicates: bool = False) -> List[int]:
+        """Operation indexes an unordered bulk_write did not apply; all of them for non-bulk errors"""
+        if not isinstance(error, BulkWriteError):
+            return list(range(count))
+        return sorted({
+            write_error["index"] for write_error in error.details.get("writeErrors", [])
+            if not (ignore_duplicates and write_error.get("code") == 11000)
+        })
+
     # ---------- Fetch Helpers ----------
     def get_recent_predictions(self, farm_id: str, crop: str, limit: int = 5) -> List[Dict[str, Any]]:
         try:
@@ -481,3 +580,15 @@ class MongoService:
         except Exception as e:
             logging.error(f"❌ Failed to fetch chat history: {e}")
             return []
+
+
+_shared_service: Optional["MongoService"] = None
+
+
+def get_mongo_service() -> MongoService:
+    """Process-wide MongoService shared by the API routes, chat interface and jobs"""
+    global _shared_service
+    if _shared_service is None:
+        _shared_service = MongoService()
+        logging.info("MongoDB service initialized.")
+    return _shared_service
@@ -1,80 +1,227 @@
+import os
 import uuid
+import atexit
+import logging
+import threading
 from datetime import datetime, timedelta
-from typing import Dict, Optional
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+SESSION_TIMEOUT_SECONDS = int(os.getenv("AGRIYIELD_SESSION_TIMEOUT", "3600"))
+# Heartbeats, last-seen updates and history appends are written to Mongo in batches this often
+SESSION_FLUSH_SECONDS = float(os.getenv("AGRIYIELD_SESSION_FLUSH_SECONDS", "5"))
+SESSION_CONTEXT_KEEP = int(os.getenv("AGRIYIELD_SESSION_CONTEXT_KEEP", "50"))
+
 
 class SessionManager:
-    def __init__(self, mongo_service):
+    """Single owner of chat session state for the REST routes, Socket.IO handlers and chat interface.
+
+    The in-memory cache is authoritative for hot sessions: reads are a dict lookup and
+    activity/history changes are buffered, then written with one ``bulk_write`` per flush.
+    Session creation is written through immediately so other workers can see it.
+    """
+
+    def __init__(self, mongo_service, session_timeout: int = None, flush_interval: float = None):
         self.mongo_service = mongo_service
-        self.sessions = {}  # In-memory session cache
-        self.session_timeout = 3600  # 1 hour in seconds
+        self.session_timeout = session_timeout or SESSION_TIMEOUT_SECONDS
+        self.flush_interval = flush_interval if flush_interval is not None else SESSION_FLUSH_SECONDS
+        self.sessions: Dict[str, Dict] = {}
+        self._lock = threading.RLock()
+        self._dirty: Dict[str, Dict] = {}
+        self._context: Dict[str, List[Dict]] = {}
+        self._chats: List[Dict] = []
+        self._stop = threading.Event()
+        self._flusher: Optional[threading.Thread] = None
+        self.flushes = 0
+        self.writes = 0
 
-    def create_session(self, farm_id: str) -> Dict:
-        """Create a new session with proper synchronization"""
-        session_id = f"{farm_id}_{uuid.uuid4().hex}"
-        expires_at = datetime.utcnow() + timedelta(seconds=self.session_timeout)
+    # ------------------------- Reads -------------------------
+    def get_session(self, session_id: str) -> Optional[Dict]:
+        """Session from memory, falling back to Mongo for sessions created by another worker"""
+        now = datetime.utcnow()
+        with self._lock:
+            session = self.sessions.get(session_id)
+            if session is not None:
+                if now < session["expires_at"]:
+                    return session
+                del self.sessions[session_id]
+                return None
 
-        session_data = {
+        doc = self.mongo_service.get_session(session_id)
+        if not doc:
+            return None
+        for field in ("created_at", "last_accessed", "expires_at"):
+            if isinstance(doc.get(field), str):
+                doc[field] = datetime.fromisoformat(doc[field])
+        if now >= doc["expires_at"]:
+            return None
+
+        session = {
             "session_id": session_id,
+            "farm_id": doc["farm_id"],
+            "context": doc.get("context", []),
+            "created_at": doc.get("created_at", now),
+            "last_accessed": doc.get("last_accessed", now),
+            "expires_at": doc["expires_at"]
+        }
+        with self._lock:
+            return self.sessions.setdefault(session_id, session)
+
+    def validate_session(self, session_id: str) -> bool:
+        return self.get_session(session_id) is not None
+
+    # ------------------------- Writes -------------------------
+    def create_session(self, farm_id: str) -> Dict:
+        now = datetime.utcnow()
+        session_data = {
+            "session_id": f"{farm_id}_{uuid.uuid4().hex}",
             "farm_id": farm_id,
-            "created_at": datetime.utcnow(),
-            "last_accessed": datetime.utcnow(),
-            "expires_at": expires_at,
+            "created_at": now,
+            "last_accessed": now,
+            "expires_at": now + timedelta(seconds=self.session_timeout),
             "context": []
         }
-
-        # Store in both memory and MongoDB
-        self.sessions[session_id] = session_data
-        if not self.mongo_service.save_session(session_data):
+        if not self.mongo_service.save_session(dict(session_data)):
             raise RuntimeError("Failed to save session to database")
-
+        with self._lock:
+            self.sessions[session_data["session_id"]] = session_data
+        self._ensure_flusher()
         return session_data
 
-    def validate_session(self, session_id: str) -> bool:
-        """Validate session with proper synchronization"""
-        # Check memory first
-        if session_id in self.sessions:
-            if datetime.utcnow() < self.sessions[session_id]["expires_at"]:
-                return True
-            del self.sessions[session_id]
+    def update_session_activity(self, session_id: str) -> bool:
+        """Extend the session in memory; the new expiry reaches Mongo on the next flush"""
+        session = self.get_session(session_id)
+        if session is None:
             return False
+        now = datetime.utcnow()
+        with self._lock:
+            session["last_accessed"] = now
+            session["expires_at"] = now + timedelta(seconds=self.session_timeout)
+            self._dirty[session_id] = {"last_accessed": now, "expires_at": session["expires_at"]}
+        self._ensure_flusher()
+        return True
 
-        # Check MongoDB if not in memory
-        session = self.mongo_service.get_active_session(session_id)
-        if session:
-            # Convert string timestamps if needed
-            if isinstance(session.get("expires_at"), str):
-                session["expires_at"] = datetime.fromisoformat(session["expires_at"])
+    def append_history(self, session_id: str, query: str, response, **fields):
+        """Record a chat turn in the session context and queue it for ChatHistory"""
+        session = self.get_session(session_id)
+        if session is None:
+            return
+        turn = {
+            "query": query,
+            "response": response.get("response") if isinstance(response, dict) else str(response)
+        }
+        with self._lock:
+            session["context"].append(turn)
+            del session["context"][:-SESSION_CONTEXT_KEEP]
+            self._context.setdefault(session_id, []).append(turn)
+            self._chats.append({
+                "session_id": session_id,
+                "farm_id": session["farm_id"],
+                "user_message": query,
+                "bot_response": response,
+                "timestamp": datetime.utcnow(),
+                **fields
+            })
+        self._ensure_flusher()
 
-            if datetime.utcnow() < session["expires_at"]:
-                # Load into memory
-                self.sessions[session_id] = session
-                return True
+    def cleanup_expired_sessions(self) -> int:
+        now = datetime.utcnow()
+        with self._lock:
+            expired = [sid for sid, session in self.sessions.items() if now >= session["expires_at"]]
+            for sid in expired:
+                del self.sessions[sid]
+        return len(expired)
 
-        return False
+    # ------------------------- Flushing -------------------------
+    def flush(self) -> int:
+        """Write buffered activity and history in one batch; returns the number of operations"""
+        with self._lock:
+            dirty, self._dirty = self._dirty, {}
+            context, self._context = self._context, {}
+            chats, self._chats = self._chats, []
+        if not (dirty or context or chats):
+            return 0
 
-    def get_session(self, session_id: str) -> Optional[Dict]:
-        """Get complete session data with validation"""
-        if not self.validate_session(session_id):
-            return None
+        updates = {}
+        for session_id in set(dirty) | set(context):
+            update = {}
+            if session_id in dirty:
+                update["$set"] = dirty[session_id]
+            if session_id in context:
+                update["$push"] = {"context": {"$each": context[session_id], "$slice": -SESSION_CONTEXT_KEEP}}
+            updates[session_id] = update
 
-        if session_id in self.sessions:
-            return self.sessions[session_id]
+        failed_updates, failed_chats = self.mongo_service.apply_session_writes(updates, chats)
+        if failed_updates or failed_chats:
+            # Re-queue only what did not land, so written turns are not pushed twice
+            with self._lock:
+                for session_id, update in failed_updates.items():
+                    if "$set" in update:
+                        # A heartbeat taken since this flush is newer and wins
+                        self._dirty.setdefault(session_id, update["$set"])
+                    if "$push" in update:
+                        turns = update["$push"]["context"]["$each"]
+                        self._context[session_id] = turns + self._context.get(session_id, [])
+                self._chats = failed_chats + self._chats
 
-        return None
+        written = len(updates) - len(failed_updates) + len(chats) - len(failed_chats)
+        with self._lock:
+            self.flushes += 1
+            self.writes += written
+        return written
 
-    def update_session_activity(self, session_id: str):
-        """Update session activity in both memory and DB"""
-        if session_id in self.sessions:
-            now = datetime.utcnow()
-            new_expiry = now + timedelta(seconds=self.session_timeout)
+    def _ensure_flusher(self):
+        if self.flush_interval <= 0:
+            # Write-through mode
+            self.flush()
+            return
+        if self._flusher is not None:
+            return
+        with self._lock:
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._run, name="session-flusher", daemon=True)
+                self._flusher.start()
+                atexit.register(self.stop)
 
-            self.sessions[session_id]["last_accessed"] = now
-            self.sessions[session_id]["expires_at"] = new_expiry
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+                self.cleanup_expired_sessions()
+            except Exception as e:
+                logger.error(f"Session flush failed: {e}")
 
-            # Update MongoDB
-            update_data = {
-                "session_id": session_id,
-                "last_accessed": now,
-                "expires_at": new_expiry
+    def stop(self):
+        self._stop.set()
+        try:
+            self.flush()
+        except Exception as e:
+            logger.error(f"Final session flush failed: {e}")
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "sessions": len(self.sessions),
+                "pending_updates": len(set(self._dirty) | set(self._context)),
+                "pending_chats": len(self._chats),
+                "flushes": self.flushes,
+                "writes": self.writes
             }
-            self.mongo_service.save_session(update_data)
\ No newline at end of file
+
+
+_session_manager: Optional[SessionManager] = None
+_session_manager_lock = threading.Lock()
+
+
+def get_session_manager(mongo_service=None) -> SessionManager:
+    """Process-wide session manager shared by every session consumer"""
+    global _session_manager
+    if _session_manager is None:
+        with _session_manager_lock:
+            if _session_manager is None:
+                if mongo_service is None:
+                    from .MongoDb.MongoService import get_mongo_service
+                    mongo_service = get_mongo_service()
+                _session_manager = SessionManager(mongo_service)
+    return _session_manager
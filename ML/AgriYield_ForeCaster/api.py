@@ -20,19 +20,40 @@ api_blueprint = Blueprint('agri_api', __name__, url_prefix='/api/v1')
 
 MODEL_DIR = os.path.abspath(r"C:\Users\bhish\OneDrive\Desktop\AgriSupport\ML\TrainingReports")
 CACHE_EXPIRY_DAYS = 1
+# Batch predictions larger than this run as a background job
+BATCH_SYNC_LIMIT = int(os.getenv("AGRIYIELD_BATCH_SYNC_LIMIT", "25"))
+BATCH_MAX_ITEMS = int(os.getenv("AGRIYIELD_BATCH_MAX_ITEMS", "2000"))
+ENSEMBLE_MAX_MEMBERS = int(os.getenv("AGRIYIELD_ENSEMBLE_MAX_MEMBERS", "2000"))
 SESSION_TIMEOUT_HOURS = 1
+# Nightly retrain + prediction pre-warm at this local "HH:MM"; empty disables the schedule
+PREWARM_AT = os.getenv("AGRIYIELD_PREWARM_AT", "")
+# Outlives the gap between nightly runs so a slow run never leaves the morning uncached
+PREWARM_TTL_HOURS = float(os.getenv("AGRIYIELD_PREWARM_TTL_HOURS", "26"))
+PREWARM_RETRAIN = os.getenv("AGRIYIELD_PREWARM_RETRAIN", "1") == "1"
 
 try:
-    from .DataProcessing.DataSetLoader import CropDataLoader
-    from .DataProcessing.featureEngineering import FeatureEngineer
-    from .Modeling.TFT_Training import TFTTrainer
-    from .Modeling.TFTPredictor import TFTPredictor
+    from .DataProcessing.DataSetLoader import discover_crop_datasets
+    from .DataProcessing.featureEngineering import ensure_numeric
+    from .DataProcessing.DatasetCache import dataset_cache
+    from .DataProcessing.hashing import dataframe_hash
+    from .Modeling.TFT_Training import build_config
+    from .Modeling.TFTPredictor import TFTPredictor, ENSEMBLE_MEMBERS, ENSEMBLE_TIME_BUDGET
+    from .Modeling.ModelRegistry import model_registry, checkpoint_path
+    from .Modeling.GlobalModel import GLOBAL_FARM_ID, GlobalTFTPredictor, MODEL_STRATEGY, global_model_available
+    from .Modeling.CpuProfile import configure_inference_threads, training_core_budget
+    from .Jobs.JobQueue import create_job_queue
+    from .Jobs.TrainingOrchestrator import (TrainingOrchestrator, run_in_training_process, source_data_hash,
+                                            train_dataset, train_global_dataset)
+    from .Jobs.Scheduler import DailyTrigger
+    from .Jobs.ResponseCurves import compute_response_curves, interpolate_what_if, curve_id
     from .Modeling.AttentionVisualizer import AttentionVisualizer
     from .Interfaces.chatInterface import AgriChatInterface
-    from .MongoDb.MongoService import MongoService
+    from .MongoDb.MongoService import get_mongo_service
 
+    configure_inference_threads()
     chat_agent = AgriChatInterface(models_dir="trainedCropModels")
-    mongo_service = MongoService()
+    mongo_service = get_mongo_service()
+    job_queue = create_job_queue(mongo_service)
     logger.info("Core services initialized successfully.")
 except ImportError as e:
     logger.critical(f"Failed to import core services: {e}")
@@ -71,21 +92,9 @@ DYNAMIC_FEATURE_MAP = {
 class DataProcessor:
     @staticmethod
     def dataframe_to_hash(df: pd.DataFrame) -> str:
-        """Generates a consistent MD5 hash for a DataFrame, handling Timestamp objects"""
+        """Generates a consistent, process-stable hash for a DataFrame"""
         try:
-            # Convert DataFrame to dict and handle Timestamp objects
-            data_dict = df.fillna(0).to_dict(orient='records')
-
-            # Convert Timestamp objects to ISO format strings
-            for record in data_dict:
-                for key, value in record.items():
-                    if pd.api.types.is_datetime64_any_dtype(df[key]):
-                        record[key] = value.isoformat() if hasattr(value, 'isoformat') else str(value)
-
-            # Sort keys and generate hash
-            return hashlib.md5(
-                json.dumps(data_dict, sort_keys=True).encode()
-            ).hexdigest()
+            return dataframe_hash(df)
         except Exception as e:
             logger.error(f"Hashing failed: {e}")
             return "default_hash"
@@ -109,17 +118,7 @@ class DataProcessor:
 
     @staticmethod
     def ensure_numeric(df: pd.DataFrame, columns: list) -> pd.DataFrame:
-        df = df.copy()
-        for col in columns:
-            if col in df.columns:
-                try:
-                    df[col] = pd.to_numeric(df[col], errors='coerce')
-                    df[col] = df[col].replace([np.inf, -np.inf], np.nan)
-                    df[col] = df[col].interpolate().ffill().bfill().fillna(0)
-                except Exception as e:
-                    logger.error(f"Column {col} conversion failed: {e}")
-                    df[col] = 0
-        return df
+        return ensure_numeric(df, columns)
 
     @staticmethod
     def safe_round(value, decimals=4):
@@ -131,7 +130,10 @@ class DataProcessor:
 class CacheManager:
     @staticmethod
     def create_cache_key(*args) -> str:
-        return hashlib.md5("_".join(str(arg) for arg in args if arg is not None).encode()).hexdigest()
+        # DataFrames contribute their content hash rather than their repr
+        parts = (DataProcessor.dataframe_to_hash(arg) if isinstance(arg, pd.DataFrame) else str(arg)
+                 for arg in args if arg is not None)
+        return hashlib.md5("_".join(parts).encode()).hexdigest()
 
     @staticmethod
     def validate_cached_result(cached: Any, farm_id: str, crop: str) -> bool:
@@ -145,6 +147,504 @@ class CacheManager:
                 metadata.get('crop') == crop and
                 results.get('confidence_interval', {}).get('median') is not None)
 
+def _run_training_job(job: Dict, progress) -> Dict:
+    """Train and checkpoint a TFT for one farm/crop outside the request cycle.
+
+    ``params.mode``: "full" retrains from scratch, "finetune" warm-starts from the current
+    checkpoint, "auto" (default) fine-tunes when a checkpoint exists. Training runs in a
+    dedicated process with its own thread budget, so progress is reported per stage.
+    """
+    farm_id, crop = job["farm_id"], job["crop"]
+    trainer_kwargs = {
+        "encoder_length": job["params"].get("encoder_length", 90),
+        "prediction_length": job["params"].get("prediction_length", 1)
+    }
+    mode = job["params"].get("mode", "auto")
+    if mode == "auto":
+        mode = "finetune" if os.path.exists(checkpoint_path(farm_id, crop)) else "full"
+    data_hash, _ = source_data_hash(farm_id, crop, build_config(**trainer_kwargs))
+
+    threads = training_core_budget()
+    progress(stage="training", mode=mode, threads=threads, percent=0.0)
+    # Also exports TorchScript and records the data hash; a rejected fine-tune keeps the current checkpoint
+    outcome = run_in_training_process(train_dataset, farm_id, crop, data_hash, threads, mode, None, MODEL_DIR,
+                                      trainer_kwargs, threads=threads)
+    progress(stage="done", percent=100.0)
+
+    if outcome["promoted"]:
+        # Fresh checkpoint: rebuild the what-if response curves in the background
+        job_queue.enqueue("response_curves", farm_id=farm_id, crop=crop)
+    return {"farm_id": farm_id, "crop": crop, **outcome}
+
+def _run_global_training_job(job: Dict, progress) -> Dict:
+    """Train the shared per-crop TFT across every farm with data for the crop"""
+    crop = job["crop"]
+    threads = training_core_budget()
+    progress(stage="training", threads=threads, percent=0.0)
+    outcome = run_in_training_process(train_global_dataset, crop, threads, job["params"].get("farm_ids"),
+                                      MODEL_DIR, threads=threads)
+    progress(stage="done", percent=100.0)
+    return outcome
+
+def _retrain_changed(params: Dict, progress) -> Dict:
+    """Retrain every changed farm/crop under the data root in a pool of training processes"""
+    orchestrator = TrainingOrchestrator(mongo_service, processes=params.get("processes"), model_dir=MODEL_DIR)
+    outcome = orchestrator.run(params.get("farm_ids"), params.get("crops"), force=params.get("force", False),
+                               mode=params.get("mode", "auto"), progress=progress)
+    for run in outcome["results"]:
+        if run["status"] == "success" and run.get("promoted"):
+            job_queue.enqueue("response_curves", farm_id=run["farm_id"], crop=run["crop"])
+    return outcome
+
+def _run_orchestrated_training_job(job: Dict, progress) -> Dict:
+    return _retrain_changed(job["params"], progress)
+
+def _run_response_curve_job(job: Dict, progress) -> Dict:
+    """Precompute what-if response curves for every dynamic feature of one farm/crop"""
+    farm_id, crop = job["farm_id"], job["crop"]
+    data = dataset_cache.get(farm_id, crop, encoder_length=90, prediction_length=1)
+    model = _load_predictor(farm_id, crop, data)
+
+    progress(stage="simulating")
+    curves = compute_response_curves(
+        model, data.processed.copy(), farm_id, crop,
+        features=[f for f in DYNAMIC_FEATURE_MAP.values() if f != "time_idx"],
+        model_version=model.model_version,
+        data_version=data.data_version
+    )
+    mongo_service.save_response_curves(curves)
+    progress(stage="done", percent=100.0)
+    return {"farm_id": farm_id, "crop": crop, "curves": len(curves)}
+
+def _curve_what_if(farm_id: str, crop: str, feature: str, change_percent: float,
+                   days_affected: int, data, model_version: str) -> Optional[Dict]:
+    """Answer a what-if from the precomputed curve when it matches the live model and data"""
+    curve = mongo_service.get_response_curve(curve_id(farm_id, crop, feature, days_affected))
+    if not curve:
+        return None
+    if (curve.get("data_version") != data.data_version or
+            curve.get("model_version") != model_version):
+        # Checkpoint or data changed since the curve was built; refresh it for next time
+        job_queue.enqueue("response_curves", farm_id=farm_id, crop=crop)
+        return None
+    return interpolate_what_if(curve, change_percent)
+
+def _load_predictor(farm_id: str, crop: str, data) -> TFTPredictor:
+    """Per-farm checkpoint or the shared per-crop model, following AGRIYIELD_MODEL_STRATEGY.
+
+    Raises FileNotFoundError when neither is available, so callers can queue training.
+    """
+    if _serving_model(farm_id, crop) == "farm":
+        return TFTPredictor.load_best_model(farm_id, crop, data.dataset, df=data.processed)
+    return GlobalTFTPredictor.load_global_model(farm_id, crop, data.processed)
+
+def _serving_model(farm_id: str, crop: str) -> str:
+    """"farm" or "global": which checkpoint serves farm/crop; FileNotFoundError if none does"""
+    if MODEL_STRATEGY != "global" and os.path.exists(checkpoint_path(farm_id, crop)):
+        return "farm"
+    if MODEL_STRATEGY != "farm" and global_model_available(crop):
+        return "global"
+    raise FileNotFoundError(f"No model found for crop '{crop}' in farm '{farm_id}'")
+
+def _serving_model_version(farm_id: str, crop: str) -> str:
+    """model_version the predictor serving farm/crop will report; FileNotFoundError if none serves it"""
+    if _serving_model(farm_id, crop) == "farm":
+        return model_registry.version(farm_id, crop)
+    return f"{GLOBAL_FARM_ID}:{model_registry.version(GLOBAL_FARM_ID, crop)}"
+
+def _prediction_cache_key(farm_id: str, crop: str, model_version: str, data_version: str) -> str:
+    # Versioned like /visualize: a retrain, fine-tune or new data never serves the old forecast
+    return f"prediction_{farm_id}_{crop}_{model_version}_{data_version}"
+
+def _predict_latest_for_model(model_farm: str, crop: str, members: List[Tuple[str, Any]]):
+    """(predictor, {farm_id: (confidence, importance)}) for the farms served by one model.
+
+    Farms on the shared per-crop model go through it together in stacked forward passes.
+    """
+    if model_farm == GLOBAL_FARM_ID:
+        frame = pd.concat([data.processed.assign(FARM_ID=str(farm_id)) for farm_id, data in members],
+                          ignore_index=True)
+        model = GlobalTFTPredictor.load_global_model(None, crop, frame)
+        return model, model.predict_latest_by_group(frame)
+    farm_id, data = members[0]
+    model = TFTPredictor.load_best_model(farm_id, crop, data.dataset, df=data.processed)
+    return model, {farm_id: model.predict_latest(data.processed.copy())}
+
+def _predict_batch(items: List[Tuple[str, str]], progress=None) -> Dict:
+    """Predict many (farm, crop) pairs, loading each model and dataset once.
+
+    Cache misses are grouped by serving model: a per-farm model predicts its latest window,
+    and every farm on the shared per-crop model is stacked into the same forward passes.
+    Failures are reported per item and never abort the rest of the batch.
+    """
+    groups: Dict[Tuple[str, str], List[int]] = {}
+    for index, pair in enumerate(items):
+        groups.setdefault(pair, []).append(index)
+
+    resolved: Dict[Tuple[str, str], Dict] = {}
+    pending: Dict[Tuple[str, str], List[Tuple[str, Any]]] = {}
+    for farm_id, crop in groups:
+        item = resolved[(farm_id, crop)] = {"farm_id": farm_id, "crop": crop}
+        try:
+            data = dataset_cache.get(farm_id, crop, encoder_length=90, prediction_length=1)
+            if data.raw.empty or data.raw['yield'].isna().all():
+                raise ValueError("No valid crop yield data found")
+            try:
+                source = _serving_model(farm_id, crop)
+                model_version = _serving_model_version(farm_id, crop)
+            except FileNotFoundError:
+                job = _queue_serving_model(farm_id, crop)
+                item.update(status="training", job_id=job["job_id"], job_kind=job["kind"])
+                continue
+            prediction = mongo_service.get_cached_prediction(
+                _prediction_cache_key(farm_id, crop, model_version, data.data_version))
+            if prediction:
+                item.update(status="success", cached=True, prediction=prediction)
+                continue
+            model_key = (farm_id, crop) if source == "farm" else (GLOBAL_FARM_ID, crop)
+            pending.setdefault(model_key, []).append((farm_id, data))
+        except Exception as e:
+            logger.warning(f"Batch prediction failed for {farm_id}/{crop}: {e}")
+            item.update(status="error", error=str(e))
+
+    for done, ((model_farm, crop), members) in enumerate(pending.items(), start=1):
+        try:
+            model, latest = _predict_latest_for_model(model_farm, crop, members)
+            for farm_id, data in members:
+                confidence, importance = latest[str(farm_id)]
+                response = _format_prediction(farm_id, crop, data, confidence, importance)
+                cache_key = _prediction_cache_key(farm_id, crop, model.model_version, data.data_version)
+                _record_prediction(farm_id, crop, model, cache_key, response, source="predict_batch")
+                resolved[(farm_id, crop)].update(status="success", cached=False, prediction=response)
+        except Exception as e:
+            logger.warning(f"Batch prediction failed for model {model_farm}/{crop}: {e}")
+            for farm_id, _ in members:
+                resolved[(farm_id, crop)].update(status="error", error=str(e))
+        if progress is not None:
+            progress(stage="predicting", done=done, total=len(pending),
+                     percent=round(100 * done / len(pending), 1))
+
+    results: List[Optional[Dict]] = [None] * len(items)
+    for pair, indices in groups.items():
+        for index in indices:
+            results[index] = resolved[pair]
+
+    summary = {"total": len(items), "unique": len(groups)}
+    for status in ("success", "training", "error"):
+        summary[status] = sum(1 for item in results if item["status"] == status)
+    return {"results": results, "summary": summary}
+
+def _run_batch_prediction_job(job: Dict, progress) -> Dict:
+    """Background variant of /predict/batch for large member lists"""
+    items = [(str(item["farm_id"]), str(item["crop"])) for item in job["params"]["items"]]
+    return _predict_batch(items, progress)
+
+def _prewarm_predictions(pairs: List[Tuple[str, str]], progress=None) -> Dict:
+    """Compute and cache the /predict response for every (farm, crop) that has a serving model.
+
+    Pairs are grouped by serving model: farms on the shared per-crop model go through it in
+    stacked forward passes. All results are written to PredictionCache in one bulk write with
+    a PREWARM_TTL_HOURS expiry; /predict then serves them and only computes on a miss.
+    """
+    groups: Dict[Tuple[str, str], List[Tuple[str, Any]]] = {}
+    skipped, errors = [], []
+    for farm_id, crop in pairs:
+        try:
+            data = dataset_cache.get(farm_id, crop, encoder_length=90, prediction_length=1)
+            if data.raw.empty or data.raw['yield'].isna().all():
+                raise ValueError("No valid crop yield data found")
+            source = _serving_model(farm_id, crop)
+        except FileNotFoundError as e:
+            skipped.append({"farm_id": farm_id, "crop": crop, "reason": str(e)})
+            continue
+        except Exception as e:
+            errors.append({"farm_id": farm_id, "crop": crop, "error": str(e)})
+            continue
+        model_key = (farm_id, crop) if source == "farm" else (GLOBAL_FARM_ID, crop)
+        groups.setdefault(model_key, []).append((farm_id, data))
+
+    responses = {}
+    for done, ((model_farm, crop), members) in enumerate(groups.items(), start=1):
+        try:
+            model, latest = _predict_latest_for_model(model_farm, crop, members)
+            for farm_id, data in members:
+                confidence, importance = latest[str(farm_id)]
+                cache_key = _prediction_cache_key(farm_id, crop, model.model_version, data.data_version)
+                responses[cache_key] = _format_prediction(farm_id, crop, data, confidence, importance)
+        except Exception as e:
+            logger.warning(f"Pre-warm failed for model {model_farm}/{crop}: {e}")
+            errors.extend({"farm_id": farm_id, "crop": crop, "error": str(e)} for farm_id, _ in members)
+        if progress is not None:
+            progress(stage="prewarming", done=done, total=len(groups), percent=round(100 * done / len(groups), 1))
+
+    mongo_service.cache_predictions(responses, ttl=timedelta(hours=PREWARM_TTL_HOURS))
+    return {
+        "summary": {"pairs": len(pairs), "models": len(groups), "cached": len(responses),
+                    "skipped": len(skipped), "errors": len(errors), "ttl_hours": PREWARM_TTL_HOURS},
+        "skipped": skipped,
+        "errors": errors
+    }
+
+def _run_prewarm_job(job: Dict, progress) -> Dict:
+    """Nightly refresh: retrain changed datasets (unless disabled), then pre-warm predictions.
+
+    Changed datasets are fine-tuned when a checkpoint exists (``params.mode`` "auto"); pass
+    "full" to retrain them from scratch.
+    """
+    params = job["params"]
+    retrain = None
+    if params.get("retrain", PREWARM_RETRAIN):
+        progress(stage="retraining")
+        retrain = _retrain_changed({"mode": params.get("mode", "auto")}, lambda **_: None)["summary"]
+    pairs = [(str(p["farm_id"]), str(p["crop"])) for p in params.get("items") or []] or discover_crop_datasets()
+    outcome = _prewarm_predictions(pairs, progress)
+    progress(stage="done", percent=100.0)
+    return {"retrain": retrain, **outcome}
+
+job_queue.register("train", _run_training_job)
+job_queue.register("train_global", _run_global_training_job)
+job_queue.register("train_all", _run_orchestrated_training_job)
+job_queue.register("response_curves", _run_response_curve_job)
+job_queue.register("predict_batch", _run_batch_prediction_job)
+job_queue.register("prewarm", _run_prewarm_job)
+job_queue.start()
+
+if PREWARM_AT:
+    # Per-day dedup key: API processes firing together share one job while it is active
+    prewarm_trigger = DailyTrigger(PREWARM_AT, lambda: job_queue.enqueue(
+        "prewarm", dedup_key=f"prewarm:{datetime.now().date().isoformat()}"), name="prewarm-trigger")
+    prewarm_trigger.start()
+
+def _serialize_job(job: Dict) -> Dict:
+    return {
+        key: value.isoformat() if isinstance(value, datetime) else value
+        for key, value in job.items()
+        if key not in ("active", "dedup_key")
+    }
+
+def _queue_serving_model(farm_id: str, crop: str) -> Dict:
+    """Queue the job that produces the model serving farm/crop under AGRIYIELD_MODEL_STRATEGY"""
+    if MODEL_STRATEGY == "global":
+        # Per-farm checkpoints are never served under this strategy; train the shared per-crop model
+        return job_queue.enqueue("train_global", crop=crop)
+    return job_queue.enqueue("train", farm_id=farm_id, crop=crop)
+
+def _training_accepted(farm_id: str, crop: str, mode: str = None):
+    """202 response pointing at the (possibly already running) training job for farm/crop.
+
+    An explicit ``mode`` (from /train) always queues the per-farm model; without one, the job
+    is whichever training makes farm/crop servable.
+    """
+    if mode:
+        job = job_queue.enqueue("train", farm_id=farm_id, crop=crop, params={"mode": mode})
+    else:
+        job = _queue_serving_model(farm_id, crop)
+    return jsonify({
+        "metadata": {
+            "farm_id": farm_id,
+            "crop": crop,
+            "timestamp": datetime.now().isoformat(),
+            "status": "training",
+            "message": "No trained model yet; training has been queued"
+        },
+        "job_id": job["job_id"],
+        "job_kind": job["kind"],
+        "job_status": job["status"],
+        "status_url": f"{api_blueprint.url_prefix}/jobs/{job['job_id']}"
+    }), 202
+
+@api_blueprint.route('/train', methods=['POST'])
+def queue_training():
+    if not request.json or 'farm_id' not in request.json or 'crop' not in request.json:
+        return jsonify({"error": "Missing 'farm_id' or 'crop' in request"}), 400
+    mode = request.json.get('mode', 'auto')
+    if mode not in ('auto', 'full', 'finetune'):
+        return jsonify({"error": "'mode' must be one of auto, full, finetune"}), 400
+    return _training_accepted(str(request.json['farm_id']), str(request.json['crop']), mode)
+
+@api_blueprint.route('/train/global', methods=['POST'])
+def queue_global_training():
+    """Queue training of the shared per-crop model across all farms (or the given farm_ids)"""
+    if not request.json or 'crop' not in request.json:
+        return jsonify({"error": "Missing 'crop' in request"}), 400
+    crop = str(request.json['crop'])
+    farm_ids = request.json.get('farm_ids')
+    job = job_queue.enqueue("train_global", crop=crop,
+                            params={"farm_ids": [str(f) for f in farm_ids]} if farm_ids else None)
+    return jsonify({
+        "metadata": {"crop": crop, "timestamp": datetime.now().isoformat(), "status": "training"},
+        "job_id": job["job_id"],
+        "job_status": job["status"],
+        "status_url": f"{api_blueprint.url_prefix}/jobs/{job['job_id']}"
+    }), 202
+
+@api_blueprint.route('/train/all', methods=['POST'])
+def queue_full_retrain():
+    """Queue a parallel retrain of every farm/crop whose data changed (optionally filtered)"""
+    body = request.get_json(silent=True) or {}
+    # Fine-tune where a checkpoint exists unless the caller asks for a from-scratch "full" retrain
+    mode = body.get('mode', 'auto')
+    if mode not in ('auto', 'full', 'finetune'):
+        return jsonify({"error": "'mode' must be one of auto, full, finetune"}), 400
+    params = {
+        "farm_ids": [str(f) for f in body.get('farm_ids') or []],
+        "crops": [str(c) for c in body.get('crops') or []],
+        "force": bool(body.get('force', False)),
+        "mode": mode,
+        "processes": body.get('processes')
+    }
+    job = job_queue.enqueue("train_all", params=params, dedup_key="train_all")
+    return jsonify({
+        "metadata": {"timestamp": datetime.now().isoformat(), "status": "training"},
+        "job_id": job["job_id"],
+        "job_status": job["status"],
+        "status_url": f"{api_blueprint.url_prefix}/jobs/{job['job_id']}"
+    }), 202
+
+@api_blueprint.route('/train/runs', methods=['GET'])
+def list_training_runs():
+    runs = mongo_service.get_training_runs(
+        farm_id=request.args.get('farm_id'),
+        crop=request.args.get('crop'),
+        batch_id=request.args.get('batch_id'),
+        limit=request.args.get('limit', 50, type=int)
+    )
+    return jsonify({"runs": [_serialize_job(run) for run in runs]})
+
+@api_blueprint.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    job = job_queue.get(job_id)
+    if not job:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(_serialize_job(job))
+
+@api_blueprint.route('/jobs', methods=['GET'])
+def list_jobs():
+    jobs = job_queue.list(
+        farm_id=request.args.get('farm_id'),
+        crop=request.args.get('crop'),
+        status=request.args.get('status'),
+        kind=request.args.get('kind')
+    )
+    return jsonify({"jobs": [_serialize_job(job) for job in jobs]})
+
+def _compute_prediction(farm_id: str, crop: str, data, model, cache_key: str, source: str) -> Dict:
+    """Forecast the latest window, format the /predict response and store it in the prediction cache"""
+    # Predict the latest window: confidence & feature importance from one forward pass
+    confidence, importance = model.predict_latest(data.processed.copy())
+    response = _format_prediction(farm_id, crop, data, confidence, importance)
+    return _record_prediction(farm_id, crop, model, cache_key, response, source)
+
+def _record_prediction(farm_id: str, crop: str, model, cache_key: str, response: Dict, source: str) -> Dict:
+    """Store a /predict response in the prediction cache and the prediction history"""
+    mongo_service.cache_prediction(cache_key, response)
+    mongo_service.save_prediction({
+        **response,
+        "farm_id": farm_id,
+        "crop": crop,
+        "model_version": model.__class__.__name__,
+        "created_at": datetime.utcnow(),
+        "timestamp": datetime.utcnow().isoformat(),
+        "source": source
+    })
+
+    return response
+
+def _format_prediction(farm_id: str, crop: str, data, confidence: Dict, importance: Dict) -> Dict:
+    """The /predict response body for one forecast window"""
+    # Fallback if median is invalid
+    if confidence.get("median", 0) <= 0:
+        historical_median = data.raw['yield'].median()
+        if historical_median > 0:
+            confidence["median"] = historical_median
+
+    # Mapping features
+    static_feature_map = {
+        "Feature_0": "crop",
+        "Feature_1": "season",
+        "Feature_2": "district",
+        "Feature_3": "FARM_ID",
+        "Feature_4": "latitude",
+        "Feature_5": "longitude"
+    }
+
+    dynamic_feature_map = {
+        "Feature_0": "time_idx",
+        "Feature_1": "season_day",
+        "Feature_2": "temperature_2m_mean",
+        "Feature_3": "temperature_2m_max",
+        "Feature_4": "temperature_2m_min",
+        "Feature_5": "relative_humidity_2m_mean",
+        "Feature_6": "wind_speed_10m_max",
+        "Feature_7": "wind_direction_10m_dominant",
+        "Feature_8": "precipitation_sum",
+        "Feature_9": "shortwave_radiation_sum",
+        "Feature_10": "surface_pressure_mean",
+        "Feature_11": "cloud_cover_mean"
+    }
+
+    # Human-readable feature importance
+    readable_importance = {
+        "static_features": {
+            static_feature_map.get(k, k): round(v, 2)
+            for k, v in importance.get("static_features", {}).items()
+        },
+        "dynamic_features": {
+            dynamic_feature_map.get(k, k): round(v, 2)
+            for k, v in importance.get("dynamic_features", {}).items()
+        }
+    }
+
+    # Yield unit conversions
+    median_tph = confidence["median"]
+    tph = lambda t: t if t else 0
+    quintals_per_hectare = tph(median_tph) * 10
+    kg_per_acre = tph(median_tph) * 1000 / 2.47105
+    quintals_per_acre = kg_per_acre / 100
+
+    def convert_ci(value):
+        if value is None or pd.isna(value):
+            return None
+        kg_acre = value * 1000 / 2.47105
+        return round(kg_acre / 100, 4)
+
+    confidence_converted = {k: convert_ci(v) for k, v in confidence.items()}
+    confidence_score = "high" if median_tph > 0 else "fallback (historical)"
+
+    # Prepare response
+    response = {
+        "metadata": {
+            "farm_id": farm_id,
+            "crop": crop,
+            "timestamp": datetime.now().isoformat(),
+            "status": "success",
+            "prediction_quality": confidence_score,
+            "RESULT": "GENUINE"
+        },
+        "yield_predictions": {
+            "tonnes_per_hectare": round(median_tph, 4),
+            "quintals_per_hectare": round(quintals_per_hectare, 4),
+            "kg_per_acre": round(kg_per_acre, 2),
+            "quintals_per_acre": round(quintals_per_acre, 4),
+            "confidence_interval": {
+                **confidence_converted,
+                "unit": "quintals_per_acre"
+            }
+        },
+        "feature_analysis": readable_importance,
+        "units_info": {
+            "base_unit": "tonnes_per_hectare",
+            "conversions": {
+                "quintals_per_hectare = tonnes_per_hectare * 10": "q/ha",
+                "kg_per_acre = tonnes_per_hectare * 1000 / 2.47105": "kg/acre",
+                "quintals_per_acre = kg_per_acre / 100": "q/acre",
+                "quintal": "100 kg",
+                "hectare_to_acre": 2.47105
+            }
+        }
+    }
+    return response
+
 @api_blueprint.route('/predict', methods=['POST'])
 def predict_yield():
     try:
@@ -155,157 +655,39 @@ def predict_yield():
         farm_id = str(request.json['farm_id'])
         crop = str(request.json['crop'])
 
-        # Check MongoDB cache first
-        cache_key = f"prediction_{farm_id}_{crop}"
-        cached_result = MongoService().get_cached_prediction(cache_key)
-        if cached_result:
-            return jsonify(cached_result)
-
-        # Load data
-        data_loader = CropDataLoader(farm_id)
-        df = data_loader.load_crop_data(crop)
+        # Load data (cached until the crop CSV or config changes)
+        data = dataset_cache.get(farm_id, crop, encoder_length=90, prediction_length=1)
+        df = data.raw
         if df.empty or df['yield'].isna().all():
             return jsonify({"error": "No valid crop yield data found"}), 400
 
-        df = DataProcessor.ensure_numeric(df, ['yield'])
-
-        # Setup model and trainer
-        trainer = TFTTrainer(
-            encoder_length=90,
-            prediction_length=1,
-            farm_id=farm_id,
-            model_dir=MODEL_DIR
-        )
-        df_processed = trainer.preprocess(df)
-        dataset = trainer.create_dataset(df_processed)
+        # Check MongoDB cache; keyed by checkpoint and data version, so no model load on a hit
+        try:
+            model_version = _serving_model_version(farm_id, crop)
+        except FileNotFoundError as e:
+            logger.warning(f"Model not found, queueing training: {e}")
+            return _training_accepted(farm_id, crop)
+        cached_result = mongo_service.get_cached_prediction(
+            _prediction_cache_key(farm_id, crop, model_version, data.data_version))
+        if cached_result:
+            return jsonify(cached_result)
 
         try:
             # Try loading the pre-trained model
-            model = TFTPredictor.load_best_model(farm_id, crop, dataset)
+            model = _load_predictor(farm_id, crop, data)
         except Exception as load_error:
-            logger.warning(f"Model not found or failed to load. Training new model... {load_error}")
-
-            # Train new model if loading fails
-            model = trainer.train_model(dataset, crop)
-
-        # Predict
-        raw_preds, x = model.predict(df_processed.copy(), mode="raw")
-
-        # Confidence & Feature Importance
-        confidence = model.get_confidence_intervals(raw_preds, df)
-        importance = model.get_feature_importance(raw_preds, df)
-
-        # Fallback if median is invalid
-        if confidence.get("median", 0) <= 0:
-            historical_median = df['yield'].median()
-            if historical_median > 0:
-                confidence["median"] = historical_median
-
-        # Mapping features
-        static_feature_map = {
-            "Feature_0": "crop",
-            "Feature_1": "season",
-            "Feature_2": "district",
-            "Feature_3": "FARM_ID",
-            "Feature_4": "latitude",
-            "Feature_5": "longitude"
-        }
-
-        dynamic_feature_map = {
-            "Feature_0": "time_idx",
-            "Feature_1": "season_day",
-            "Feature_2": "temperature_2m_mean",
-            "Feature_3": "temperature_2m_max",
-            "Feature_4": "temperature_2m_min",
-            "Feature_5": "relative_humidity_2m_mean",
-            "Feature_6": "wind_speed_10m_max",
-            "Feature_7": "wind_direction_10m_dominant",
-            "Feature_8": "precipitation_sum",
-            "Feature_9": "shortwave_radiation_sum",
-            "Feature_10": "surface_pressure_mean",
-            "Feature_11": "cloud_cover_mean"
-        }
-
-        # Human-readable feature importance
-        readable_importance = {
-            "static_features": {
-                static_feature_map.get(k, k): round(v, 2)
-                for k, v in importance.get("static_features", {}).items()
-            },
-            "dynamic_features": {
-                dynamic_feature_map.get(k, k): round(v, 2)
-                for k, v in importance.get("dynamic_features", {}).items()
-            }
-        }
-
-        # Yield unit conversions
-        median_tph = confidence["median"]
-        tph = lambda t: t if t else 0
-        quintals_per_hectare = tph(median_tph) * 10
-        kg_per_acre = tph(median_tph) * 1000 / 2.47105
-        quintals_per_acre = kg_per_acre / 100
-
-        def convert_ci(value):
-            if value is None or pd.isna(value):
-                return None
-            kg_acre = value * 1000 / 2.47105
-            return round(kg_acre / 100, 4)
-
-        confidence_converted = {k: convert_ci(v) for k, v in confidence.items()}
-        confidence_score = "high" if median_tph > 0 else "fallback (historical)"
-
-        # Prepare response
-        response = {
-            "metadata": {
-                "farm_id": farm_id,
-                "crop": crop,
-                "timestamp": datetime.now().isoformat(),
-                "status": "success",
-                "prediction_quality": confidence_score,
-                "RESULT": "GENUINE"
-            },
-            "yield_predictions": {
-                "tonnes_per_hectare": round(median_tph, 4),
-                "quintals_per_hectare": round(quintals_per_hectare, 4),
-                "kg_per_acre": round(kg_per_acre, 2),
-                "quintals_per_acre": round(quintals_per_acre, 4),
-                "confidence_interval": {
-                    **confidence_converted,
-                    "unit": "quintals_per_acre"
-                }
-            },
-            "feature_analysis": readable_importance,
-            "units_info": {
-                "base_unit": "tonnes_per_hectare",
-                "conversions": {
-                    "quintals_per_hectare = tonnes_per_hectare * 10": "q/ha",
-                    "kg_per_acre = tonnes_per_hectare * 1000 / 2.47105": "kg/acre",
-                    "quintals_per_acre = kg_per_acre / 100": "q/acre",
-                    "quintal": "100 kg",
-                    "hectare_to_acre": 2.47105
-                }
-            }
-        }
-
-        # Save to DB
-        MongoService().cache_prediction(cache_key, response)
-        MongoService().save_prediction({
-            **response,
-            "farm_id": farm_id,
-            "crop": crop,
-            "model_version": model.__class__.__name__,
-            "created_at": datetime.utcnow(),
-            "timestamp": datetime.utcnow().isoformat(),
-            "source": "predict_yield"
-        })
+            logger.warning(f"Model not found or failed to load, queueing training: {load_error}")
+            return _training_accepted(farm_id, crop)
 
+        cache_key = _prediction_cache_key(farm_id, crop, model.model_version, data.data_version)
+        response = _compute_prediction(farm_id, crop, data, model, cache_key, source="predict_yield")
         return jsonify(response)
 
     except Exception as e:
         logger.error(f"Prediction failed: {str(e)}", exc_info=True)
 
         # Save error in DB
-        MongoService().save_prediction({
+        mongo_service.save_prediction({
             "farm_id": request.json.get('farm_id'),
             "crop": request.json.get('crop'),
             "error": str(e),
@@ -336,6 +718,58 @@ def predict_yield():
             }
         }), 500
 
+@api_blueprint.route('/predict/batch', methods=['POST'])
+def predict_batch():
+    """Forecast a list of {"farm_id", "crop"} items; large lists (or "async": true) return a job"""
+    items = (request.json or {}).get('items')
+    if not isinstance(items, list) or not items:
+        return jsonify({"error": "'items' must be a non-empty list of {farm_id, crop}"}), 400
+    if len(items) > BATCH_MAX_ITEMS:
+        return jsonify({"error": f"At most {BATCH_MAX_ITEMS} items per batch"}), 400
+    if not all(isinstance(item, dict) and 'farm_id' in item and 'crop' in item for item in items):
+        return jsonify({"error": "Every item needs 'farm_id' and 'crop'"}), 400
+
+    pairs = [(str(item['farm_id']), str(item['crop'])) for item in items]
+    if request.json.get('async') or len(pairs) > BATCH_SYNC_LIMIT:
+        dedup_key = "predict_batch:" + hashlib.md5(json.dumps(sorted(set(pairs))).encode()).hexdigest()
+        job = job_queue.enqueue(
+            "predict_batch",
+            params={"items": [{"farm_id": farm, "crop": crop} for farm, crop in pairs]},
+            dedup_key=dedup_key
+        )
+        return jsonify({
+            "metadata": {
+                "timestamp": datetime.now().isoformat(),
+                "status": "queued",
+                "items": len(pairs)
+            },
+            "job_id": job["job_id"],
+            "job_status": job["status"],
+            "status_url": f"{api_blueprint.url_prefix}/jobs/{job['job_id']}"
+        }), 202
+
+    try:
+        result = _predict_batch(pairs)
+    except Exception as e:
+        logger.error(f"Batch prediction failed: {e}", exc_info=True)
+        return jsonify({"error": str(e)}), 500
+    return jsonify({"metadata": {"timestamp": datetime.now().isoformat(), "status": "success"}, **result})
+
+@api_blueprint.route('/predict/prewarm', methods=['POST'])
+def queue_prewarm():
+    """Queue a pre-warm of the prediction cache (all datasets, or the given items)"""
+    body = request.get_json(silent=True) or {}
+    params = {"retrain": bool(body.get('retrain', False))}
+    if body.get('items'):
+        params["items"] = [{"farm_id": str(i["farm_id"]), "crop": str(i["crop"])} for i in body['items']]
+    job = job_queue.enqueue("prewarm", params=params, dedup_key="prewarm:manual")
+    return jsonify({
+        "metadata": {"timestamp": datetime.now().isoformat(), "status": "prewarming"},
+        "job_id": job["job_id"],
+        "job_status": job["status"],
+        "status_url": f"{api_blueprint.url_prefix}/jobs/{job['job_id']}"
+    }), 202
+
 @api_blueprint.route('/simulate-what-if', methods=['POST'])
 def simulate_what_if_route():
     start_time = datetime.utcnow()
@@ -382,56 +816,44 @@ def simulate_what_if_route():
             default_response["metadata"]["message"] = "Days affected must be positive"
             return jsonify(default_response), 400
 
-        # Check cache first
-        cache_key = f"whatif_{farm_id}_{crop}_{feature}_{change_percent}_{days_affected}"
-        cached_result = MongoService().get_cached_simulation(cache_key)
-        if cached_result:
-            return jsonify(cached_result)
-
-        # Load data
+        # Load and preprocess data (shared with /predict through the dataset cache)
         try:
-            df = CropDataLoader(farm_id).load_crop_data(crop)
+            data = dataset_cache.get(farm_id, crop, encoder_length=90, prediction_length=1)
+            df = data.raw
             if df.empty:
                 default_response["metadata"]["message"] = f"No data available for crop {crop}"
                 return jsonify(default_response), 404
+            processed_df = data.processed
         except Exception as e:
             default_response["metadata"]["message"] = f"Failed to load data: {str(e)}"
             return jsonify(default_response), 500
 
-        # Preprocess data
-        try:
-            trainer = TFTTrainer(
-                data_dir=MODEL_DIR,
-                crop_list=[crop],
-                farm_id=farm_id,
-                model_dir=MODEL_DIR
-            )
-            processed_df = trainer.preprocess(df)
-            dataset = trainer.create_dataset(processed_df)
-        except Exception as e:
-            default_response["metadata"]["message"] = f"Data preprocessing failed: {str(e)}"
-            return jsonify(default_response), 500
-
         # Load or train model
         try:
-            model = TFTPredictor.load_best_model(farm_id, crop, dataset)
+            model = _load_predictor(farm_id, crop, data)
         except Exception as e:
-            try:
-                # Train model if not found
-                model = trainer.train_model(dataset, crop)
-                model = TFTPredictor(model, dataset)
-            except Exception as e:
-                default_response["metadata"]["message"] = f"Model training failed: {str(e)}"
-                return jsonify(default_response), 500
-
-        # Run simulation
+            logger.warning(f"Model not found or failed to load, queueing training: {e}")
+            return _training_accepted(farm_id, crop)
+
+        # Check cache; the data's content hash and the model version keep new data or a retrain off stale results
+        cache_key = CacheManager.create_cache_key(
+            "whatif", farm_id, crop, feature, change_percent, days_affected, data.content_hash, model.model_version
+        )
+        cached_result = mongo_service.get_cached_simulation(cache_key)
+        if cached_result:
+            return jsonify(cached_result)
+
+        # Run simulation: interpolate the precomputed response curve, else live inference
         try:
-            simulation_result = model.simulate_what_if(
-                df=processed_df,
-                feature=feature,
-                change_percent=change_percent,
-                days_affected=days_affected
-            )
+            simulation_result = _curve_what_if(farm_id, crop, feature, change_percent, days_affected, data,
+                                               model.model_version)
+            if simulation_result is None:
+                simulation_result = model.simulate_what_if(
+                    df=processed_df.copy(),
+                    feature=feature,
+                    change_percent=change_percent,
+                    days_affected=days_affected
+                )
 
             # Process results
             baseline_conf = simulation_result["baseline"]["confidence"]
@@ -474,7 +896,9 @@ def simulate_what_if_route():
                     "timestamp": datetime.utcnow().isoformat(),
                     "status": "success",
                     "model_version": "TFTPredictor",
-                    "prediction_quality": "high"
+                    "prediction_quality": "high",
+                    "source": simulation_result.get("source", "live_inference"),
+                    "error_bound": simulation_result.get("error_bound", 0.0)
                 },
                 "results": {
                     "baseline_confidence": {
@@ -534,8 +958,8 @@ def simulate_what_if_route():
             }
 
             # Cache and save results
-            MongoService().cache_simulation(cache_key, response)
-            MongoService().save_whatif_simulation({
+            mongo_service.cache_simulation(cache_key, response)
+            mongo_service.save_whatif_simulation({
                 "simulation_id": f"sim_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}_{farm_id}_{crop}",
                 "farm_id": farm_id,
                 "crop": crop,
@@ -587,14 +1011,227 @@ def simulate_what_if_route():
 
             return jsonify(response)
 
+        except ValueError as e:
+            # _apply_changes rejects a feature the model does not take as input
+            default_response["metadata"]["message"] = f"Invalid simulation request: {str(e)}"
+            return jsonify(default_response), 400
         except Exception as e:
             default_response["metadata"]["message"] = f"Simulation failed: {str(e)}"
             return jsonify(default_response), 500
 
+    except ValueError as e:
+        default_response["metadata"]["message"] = f"Invalid request: {str(e)}"
+        return jsonify(default_response), 400
     except Exception as e:
         default_response["metadata"]["message"] = f"Unexpected error: {str(e)}"
         return jsonify(default_response), 500
 
+@api_blueprint.route('/simulate-scenarios', methods=['POST'])
+def simulate_scenarios_route():
+    """Evaluate many what-if scenarios against one baseline in a single batched inference"""
+    payload = request.get_json(silent=True) or {}
+    missing = [f for f in ("farm_id", "crop", "scenarios") if f not in payload]
+    if missing:
+        return jsonify({"error": f"Missing required fields: {', '.join(missing)}"}), 400
+
+    farm_id = str(payload["farm_id"])
+    crop = str(payload["crop"])
+    if not isinstance(payload["scenarios"], list) or not payload["scenarios"]:
+        return jsonify({"error": "'scenarios' must be a non-empty list"}), 400
+
+    # Each scenario: {"changes": {feature: pct, ...}, "days_affected": n} or {"feature", "change_percent"}
+    scenarios = []
+    for index, item in enumerate(payload["scenarios"]):
+        if not isinstance(item, dict):
+            return jsonify({"error": f"Scenario {index}: must be an object"}), 400
+        changes = item.get("changes") or ({item["feature"]: item.get("change_percent")} if "feature" in item else {})
+        if not isinstance(changes, dict):
+            return jsonify({"error": f"Scenario {index}: 'changes' must map feature names to percentages"}), 400
+        try:
+            changes = {str(k): float(v) for k, v in changes.items()}
+        except (TypeError, ValueError):
+            return jsonify({"error": f"Scenario {index}: change percentages must be numeric"}), 400
+        if not changes or any(not -100 <= v <= 100 for v in changes.values()):
+            return jsonify({"error": f"Scenario {index}: changes must be between -100 and 100 percent"}), 400
+        days_affected = item.get("days_affected")
+        if days_affected is not None:
+            try:
+                days_affected = int(days_affected)
+            except (TypeError, ValueError):
+                return jsonify({"error": f"Scenario {index}: days_affected must be an integer"}), 400
+            if days_affected <= 0:
+                return jsonify({"error": f"Scenario {index}: days_affected must be positive"}), 400
+        scenarios.append({
+            "name": str(item.get("name", f"scenario_{index + 1}")),
+            "changes": changes,
+            "days_affected": days_affected
+        })
+
+    try:
+        data = dataset_cache.get(farm_id, crop, encoder_length=90, prediction_length=1)
+        try:
+            model = _load_predictor(farm_id, crop, data)
+        except FileNotFoundError:
+            return _training_accepted(farm_id, crop)
+
+        cache_key = CacheManager.create_cache_key(
+            "scenarios", farm_id, crop, data.data_version, model.model_version,
+            json.dumps(scenarios, sort_keys=True)
+        )
+        cached = mongo_service.get_cached_simulation(cache_key)
+        if cached:
+            return jsonify(cached)
+
+        started = datetime.utcnow()
+        result = model.simulate_scenarios(data.processed.copy(), scenarios)
+        response = {
+            "metadata": {
+                "farm_id": farm_id,
+                "crop": crop,
+                "scenario_count": len(scenarios),
+                "timestamp": datetime.utcnow().isoformat(),
+                "processing_time_ms": (datetime.utcnow() - started).total_seconds() * 1000,
+                "status": "success"
+            },
+            "results": {
+                "baseline_confidence": result["baseline"]["confidence"],
+                "scenarios": result["scenarios"]
+            }
+        }
+        mongo_service.cache_simulation(cache_key, response)
+        return jsonify(response)
+
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.error(f"Scenario simulation failed: {e}", exc_info=True)
+        return jsonify({"error": f"Scenario simulation failed: {str(e)}"}), 500
+
+@api_blueprint.route('/sensitivity', methods=['POST'])
+def sensitivity_route():
+    """Tornado-chart sensitivity of predicted yield to every dynamic weather/soil driver"""
+    payload = request.get_json(silent=True) or {}
+    if 'farm_id' not in payload or 'crop' not in payload:
+        return jsonify({"error": "Missing 'farm_id' or 'crop' in request"}), 400
+
+    farm_id = str(payload["farm_id"])
+    crop = str(payload["crop"])
+    # time_idx is positional, not a driver an agronomist can change
+    features = payload.get("features") or [f for f in DYNAMIC_FEATURE_MAP.values() if f != "time_idx"]
+    try:
+        magnitudes = [float(m) for m in payload.get("magnitudes", [-20, -10, -5, 5, 10, 20])]
+        days_affected = int(payload["days_affected"]) if payload.get("days_affected") else None
+    except (TypeError, ValueError):
+        return jsonify({"error": "'magnitudes' and 'days_affected' must be numeric"}), 400
+    if any(not -100 <= m <= 100 for m in magnitudes):
+        return jsonify({"error": "Magnitudes must be between -100 and 100 percent"}), 400
+
+    try:
+        data = dataset_cache.get(farm_id, crop, encoder_length=90, prediction_length=1)
+        try:
+            model = _load_predictor(farm_id, crop, data)
+        except FileNotFoundError:
+            return _training_accepted(farm_id, crop)
+
+        model_version = model.model_version
+        cache_key = CacheManager.create_cache_key(
+            "sensitivity", farm_id, crop, data.data_version, model_version,
+            json.dumps([sorted(features), sorted(magnitudes), days_affected])
+        )
+        cached = mongo_service.get_cached_simulation(cache_key)
+        if cached:
+            return jsonify(cached)
+
+        started = datetime.utcnow()
+        analysis = model.sensitivity_analysis(data.processed.copy(), features, magnitudes, days_affected)
+        response = {
+            "metadata": {
+                "farm_id": farm_id,
+                "crop": crop,
+                "model_version": model_version,
+                "data_version": data.data_version,
+                "timestamp": datetime.utcnow().isoformat(),
+                "processing_time_ms": (datetime.utcnow() - started).total_seconds() * 1000,
+                "status": "success"
+            },
+            "results": analysis
+        }
+        mongo_service.cache_simulation(cache_key, response)
+        return jsonify(response)
+
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.error(f"Sensitivity analysis failed: {e}", exc_info=True)
+        return jsonify({"error": f"Sensitivity analysis failed: {str(e)}"}), 500
+
+@api_blueprint.route('/predict/ensemble', methods=['POST'])
+def predict_ensemble_route():
+    """Yield distribution across bootstrapped recent-weather trajectories (Monte Carlo ensemble)"""
+    payload = request.get_json(silent=True) or {}
+    if 'farm_id' not in payload or 'crop' not in payload:
+        return jsonify({"error": "Missing 'farm_id' or 'crop' in request"}), 400
+
+    farm_id = str(payload["farm_id"])
+    crop = str(payload["crop"])
+    try:
+        members = int(payload.get("members", ENSEMBLE_MEMBERS))
+        time_budget = float(payload.get("time_budget", ENSEMBLE_TIME_BUDGET))
+        block_days = int(payload.get("block_days", 7))
+        horizon_days = int(payload["horizon_days"]) if payload.get("horizon_days") else None
+        seed = int(payload.get("seed", 0))
+    except (TypeError, ValueError):
+        return jsonify({"error": "'members', 'time_budget', 'block_days', 'horizon_days' and 'seed' must be numeric"}), 400
+    if not 1 <= members <= ENSEMBLE_MAX_MEMBERS:
+        return jsonify({"error": f"'members' must be between 1 and {ENSEMBLE_MAX_MEMBERS}"}), 400
+    if block_days < 1 or time_budget <= 0:
+        return jsonify({"error": "'block_days' and 'time_budget' must be positive"}), 400
+
+    try:
+        data = dataset_cache.get(farm_id, crop, encoder_length=90, prediction_length=1)
+        try:
+            model = _load_predictor(farm_id, crop, data)
+        except FileNotFoundError:
+            return _training_accepted(farm_id, crop)
+
+        model_version = model.model_version
+        cache_key = CacheManager.create_cache_key(
+            "ensemble", farm_id, crop, data.data_version, model_version,
+            json.dumps([members, block_days, horizon_days, seed, sorted(payload.get("features") or [])])
+        )
+        cached = mongo_service.get_cached_simulation(cache_key)
+        if cached:
+            return jsonify(cached)
+
+        started = datetime.utcnow()
+        ensemble = model.simulate_weather_ensemble(
+            data.processed.copy(), members=members, features=payload.get("features"),
+            horizon_days=horizon_days, block_days=block_days, time_budget=time_budget, seed=seed
+        )
+        response = {
+            "metadata": {
+                "farm_id": farm_id,
+                "crop": crop,
+                "model_version": model_version,
+                "data_version": data.data_version,
+                "timestamp": datetime.utcnow().isoformat(),
+                "processing_time_ms": (datetime.utcnow() - started).total_seconds() * 1000,
+                "status": "success",
+                "unit": "tonnes_per_hectare"
+            },
+            "results": ensemble
+        }
+        # A truncated run depends on machine load; only full runs are reproducible enough to cache
+        if not ensemble["truncated"]:
+            mongo_service.cache_simulation(cache_key, response)
+        return jsonify(response)
+
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.error(f"Ensemble forecast failed: {e}", exc_info=True)
+        return jsonify({"error": f"Ensemble forecast failed: {str(e)}"}), 500
+
 def _generate_recommendation(feature, change_percent, impact_percent, risk_level):
     """Generate actionable recommendation based on simulation results"""
     if risk_level == "high":
@@ -611,6 +1248,11 @@ def _generate_recommendation(feature, change_percent, impact_percent, risk_level
             return f"Small but measurable impact from {feature} change. May combine with other optimizations"
 
 
+@api_blueprint.route('/models/cache', methods=['GET'])
+def model_cache_stats():
+    """Loaded-model registry and dataset cache occupancy and hit/miss counters"""
+    return jsonify({"models": model_registry.stats(), "datasets": dataset_cache.stats()})
+
 #_____________________________________________________________________________________________________________________________________
 @api_blueprint.route('/session', methods=['POST'])
 def start_session():
@@ -620,11 +1262,10 @@ def start_session():
             return jsonify({"error": "farm_id is required"}), 400
 
         farm_id = str(request.json['farm_id']).strip()
-        chat_interface = AgriChatInterface()
 
         # Create new session
-        session_id = chat_interface.create_session(farm_id)
-        session = chat_interface.get_session(session_id)
+        session_id = chat_agent.create_session(farm_id)
+        session = chat_agent.get_session(session_id)
 
         if not session:
             return jsonify({"error": "Session creation failed"}), 500
@@ -654,10 +1295,8 @@ def chat_endpoint():
         if not session_id or not message:
             return jsonify({"error": "session_id and message are required"}), 400
 
-        chat_interface = AgriChatInterface()
-
         # Validate session
-        session = chat_interface.get_session(session_id)
+        session = chat_agent.get_session(session_id)
         if not session:
             return jsonify({
                 "error": "Invalid or expired session",
@@ -665,7 +1304,7 @@ def chat_endpoint():
             }), 401
 
         # Process query
-        response = chat_interface.process_query(
+        response = chat_agent.process_query(
             session_id=session_id,
             query=message,
             crop_data=crop_data
@@ -681,8 +1320,7 @@ def chat_endpoint():
 def verify_session(session_id):
     """Verify session validity"""
     try:
-        chat_interface = AgriChatInterface()
-        session = chat_interface.get_session(session_id)
+        session = chat_agent.get_session(session_id)
 
         if not session:
             return jsonify({
@@ -703,19 +1341,16 @@ def verify_session(session_id):
 
 @api_blueprint.route('/session/<session_id>/heartbeat', methods=['POST'])
 def session_heartbeat(session_id):
-    """Extend session lifetime"""
-    chat_interface = AgriChatInterface()
-    if chat_interface.validate_session(session_id):
-        chat_interface.update_session_activity(session_id)
+    """Extend session lifetime; the Mongo write is coalesced into the next batched flush"""
+    if chat_agent.session_manager.update_session_activity(session_id):
         return jsonify({"status": "updated"})
     return jsonify({"error": "Invalid session"}), 401
 
 @api_blueprint.route('/session/<session_id>', methods=['GET'])
 def get_session_info(session_id):
     """Get session information"""
-    chat_interface = AgriChatInterface()
-    if chat_interface.validate_session(session_id):
-        session = chat_interface.sessions.get(session_id)
+    session = chat_agent.get_session(session_id)
+    if session:
         return jsonify({
             "session_id": session_id,
             "farm_id": session["farm_id"],
@@ -731,7 +1366,8 @@ def get_session_info(session_id):
 def visualize_data():
     """
     API endpoint for visualizing attention weights of the TFT model.
-    Requires farm_id and crop to load relevant data and model.
+    Requires farm_id and crop to load relevant data and model; returns a plotly figure
+    spec ({"data", "layout"}), plus "plot_html" when "format" is "html".
     """
     try:
         # 1. Request Validation
@@ -742,53 +1378,37 @@ def visualize_data():
         farm_id = str(request.json['farm_id']).strip()
         crop = str(request.json['crop']).strip()
 
-        # 2. Data Loading
-        data_loader = CropDataLoader(farm_id)
-        df = pd.DataFrame()
+        # 2. Data Loading (same cached frame and dataset the model is served with)
         try:
-            df = data_loader.load_crop_data(crop)
-            if df.empty:
-                logger.warning(f"No data found for visualization for farm '{farm_id}', crop '{crop}'.")
-                return jsonify({"error": "No crop data available for visualization"}), 400
+            data = dataset_cache.get(farm_id, crop, encoder_length=90, prediction_length=1)
         except Exception as e:
             logger.error(f"Data loading failed for visualization for farm '{farm_id}', crop '{crop}': {e}", exc_info=True)
             return jsonify({"error": "Data loading failed for visualization", "details": str(e)}), 400
 
-        # 3. Data Preprocessing for Visualization
-        # Ensure 'yield' column exists and is numeric, fill NaNs
-        df = DataProcessor.ensure_numeric(df, ['yield', 'time_idx'])
-        if df['yield'].isna().all():
+        if data.raw.empty:
+            logger.warning(f"No data found for visualization for farm '{farm_id}', crop '{crop}'.")
+            return jsonify({"error": "No crop data available for visualization"}), 400
+        if data.raw['yield'].isna().all():
             logger.warning("Yield data is entirely missing or invalid after preprocessing for visualization.")
             return jsonify({"error": "Yield data is invalid for visualization"}), 400
 
-        # Feature engineering (if required by your TFTTrainer/FeatureEngineer setup)
+        # 3. Figure spec: one forward pass, cached per model and data version
+        output_format = request.json.get('format', request.args.get('format', 'json'))
         try:
-            # Assuming FeatureEngineer needs data_loader.config to initialize
-            feature_engineer = FeatureEngineer(data_loader.config)
-            # preprocess_data might return a tuple, ensure we only take the DataFrame
-            df_processed, _ = feature_engineer.preprocess_data(df.copy())
-            logger.info("Data successfully feature engineered for visualization.")
-        except Exception as e:
-            logger.error(f"Feature engineering failed for visualization: {e}", exc_info=True)
-            return jsonify({"error": "Data processing failed for visualization", "details": str(e)}), 500
-
-        # 4. Model Setup and Visualization
-        plot_html = ""
-        try:
-            trainer = TFTTrainer(
-                encoder_length=90, # Match training configuration
-                prediction_length=1, # Match training configuration
-                farm_id=farm_id,
-                model_dir=MODEL_DIR
-            )
-            dataset = trainer.create_dataset(df_processed) # Create dataset from processed data
-            model = TFTPredictor.load_best_model(farm_id, crop, dataset) # Load the trained model
-
-            visualizer = AttentionVisualizer(predictor=model)
-            # plot_attention_weights typically needs the processed DataFrame
-            fig = visualizer.plot_attention_weights(df_processed)
-            plot_html = fig.to_html(full_html=False) # Convert plot to HTML for embedding
-            logger.info(f"Attention weights plot generated for farm '{farm_id}', crop '{crop}'.")
+            model = _load_predictor(farm_id, crop, data) # Load the trained model
+            cache_key = f"visualize_{farm_id}_{crop}_{model.model_version}_{data.data_version}"
+            result = mongo_service.get_cached_prediction(cache_key)
+            cached = bool(result)
+            if not cached:
+                explanation = model.explain(data.processed.copy())
+                result = {
+                    "figure": AttentionVisualizer.figure_spec(explanation),
+                    "confidence_interval": explanation["confidence"],
+                    "feature_importance": explanation["importance"],
+                    "windows": explanation["windows"]
+                }
+                mongo_service.cache_prediction(cache_key, result)
+                logger.info(f"Attention figure built for farm '{farm_id}', crop '{crop}'.")
         except FileNotFoundError as e:
             logger.warning(f"Model checkpoint not found for visualization for farm '{farm_id}', crop '{crop}'. Error: {e}")
             return jsonify({"error": "Model not found for visualization. Please ensure it's trained."}), 500
@@ -796,16 +1416,22 @@ def visualize_data():
             logger.error(f"Visualization failed: {e}", exc_info=True)
             return jsonify({"error": "Visualization failed", "details": str(e)}), 500
 
-        # 5. Return Response
-        return jsonify({
-            "plot_html": plot_html,
+        # 4. Return Response (HTML only when asked for)
+        response = {
+            **result,
             "metadata": {
                 "farm_id": farm_id,
                 "crop": crop,
                 "timestamp": datetime.now().isoformat(),
-                "status": "success"
+                "status": "success",
+                "model_version": model.model_version,
+                "data_version": data.data_version,
+                "cached": cached
             }
-        })
+        }
+        if output_format == "html":
+            response["plot_html"] = AttentionVisualizer.to_html(result["figure"])
+        return jsonify(response)
 
     except Exception as e:
         logger.error(f"An unexpected error occurred during visualization: {e}", exc_info=True)
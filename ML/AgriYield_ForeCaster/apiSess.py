@@ -1,10 +1,11 @@
 from flask import Blueprint
 from flask_socketio import SocketIO, emit, join_room
 from flask import request, current_app
-from datetime import datetime, timedelta
-import uuid
+from datetime import datetime
 import logging
 
+from .SessionManager import get_session_manager
+
 # Initialize Blueprint
 apiSessionblueprint = Blueprint('apiSession', __name__)
 
@@ -19,58 +20,6 @@ def init_socketio(app):
     socketio.init_app(app, cors_allowed_origins="*")
     return socketio
 
-class SessionManager:
-    def __init__(self, mongo_service):
-        self.mongo_service = mongo_service
-        self.sessions = {}
-        self.session_timeout = 3600  # 1 hour in seconds
-
-    def create_session(self, farm_id: str) -> dict:
-        session_id = f"{farm_id}_{uuid.uuid4().hex}"
-        expires_at = datetime.utcnow() + timedelta(seconds=self.session_timeout)
-
-        session_data = {
-            "session_id": session_id,
-            "farm_id": farm_id,
-            "created_at": datetime.utcnow(),
-            "last_accessed": datetime.utcnow(),
-            "expires_at": expires_at,
-            "context": []
-        }
-
-        self.sessions[session_id] = session_data
-        if not self.mongo_service.save_session(session_data):
-            raise RuntimeError("Failed to save session to database")
-        return session_data
-
-    def validate_session(self, session_id: str) -> bool:
-        if session_id in self.sessions:
-            if datetime.utcnow() < self.sessions[session_id]["expires_at"]:
-                return True
-            del self.sessions[session_id]
-            return False
-
-        session = self.mongo_service.get_active_session(session_id)
-        if session:
-            if isinstance(session.get("expires_at"), str):
-                session["expires_at"] = datetime.fromisoformat(session["expires_at"])
-            if datetime.utcnow() < session["expires_at"]:
-                self.sessions[session_id] = session
-                return True
-        return False
-
-    def update_session_activity(self, session_id: str):
-        if session_id in self.sessions:
-            now = datetime.utcnow()
-            new_expiry = now + timedelta(seconds=self.session_timeout)
-            self.sessions[session_id]["last_accessed"] = now
-            self.sessions[session_id]["expires_at"] = new_expiry
-            self.mongo_service.save_session({
-                "session_id": session_id,
-                "last_accessed": now,
-                "expires_at": new_expiry
-            })
-
 # Socket.IO Event Handlers
 @socketio.on('connect')
 def handle_connect():
@@ -197,7 +146,8 @@ def check_session_status(session_id):
 
 def init_app(app, mongo_service, chat_interface):
     """Initialize the API with the Flask app"""
-    app.session_manager = SessionManager(mongo_service)
+    # Same manager instance the chat interface and REST session routes use
+    app.session_manager = getattr(chat_interface, "session_manager", None) or get_session_manager(mongo_service)
     app.chat_interface = chat_interface
     socketio.init_app(app)
     app.register_blueprint(apiSessionblueprint)
@@ -0,0 +1,82 @@
+"""Benchmark TFT CPU inference: eager Lightning predict vs one-window eager vs TorchScript runtime.
+
+Needs a trained checkpoint and crop data for the farm. Exports the model if no
+current TorchScript export exists, then checks quantile parity between the eager
+model and the runtime on the latest window and on a stacked what-if batch.
+
+Usage (from the repository root):
+    python -m ML.AgriYield_ForeCaster.benchmarks.bench_inference --farm FARM_001 --crop Wheat --repeat 20
+"""
+import sys
+import time
+import argparse
+import statistics
+
+import torch
+
+from ..DataProcessing.DatasetCache import dataset_cache
+from ..Modeling.TFTPredictor import TFTPredictor
+from ..Modeling.TFTExport import PARITY_TOLERANCE, export_torchscript, load_runtime
+
+
+def time_call(fn, repeat: int) -> list:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark TFT CPU inference paths")
+    parser.add_argument("--farm", required=True)
+    parser.add_argument("--crop", required=True)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--scenarios", type=int, default=64)
+    args = parser.parse_args(argv)
+
+    data = dataset_cache.get(args.farm, args.crop, encoder_length=90, prediction_length=1)
+    eager = TFTPredictor.load_best_model(args.farm, args.crop, data.dataset, df=data.processed)
+    eager.runtime = None
+
+    if load_runtime(args.farm, args.crop) is None:
+        export_torchscript(args.farm, args.crop, eager, data.processed.copy())
+    scripted = TFTPredictor.load_best_model(args.farm, args.crop, data.dataset, df=data.processed)
+    if scripted.runtime is None:
+        print("No usable TorchScript runtime (CUDA visible or export failed)")
+        return 1
+
+    print(f"Threads: {torch.get_num_threads()}   rows: {len(data.processed)}")
+    cases = (
+        ("lightning predict(raw)", lambda: eager.predict(data.processed.copy(), mode="raw")),
+        ("eager latest window", lambda: eager.predict_latest(data.processed.copy())),
+        ("torchscript latest window", lambda: scripted.predict_latest(data.processed.copy())),
+    )
+    for name, fn in cases:
+        fn()  # warm-up
+        samples = time_call(fn, args.repeat)
+        print(f"  {name:<26} median {statistics.median(samples):9.3f} ms   "
+              f"min {min(samples):9.3f} ms   max {max(samples):9.3f} ms")
+
+    # Quantile parity on the latest window and on a stacked what-if batch
+    feature = "temperature_2m_mean"
+    scenarios = [{"changes": {feature: pct}, "days_affected": 7}
+                 for pct in torch.linspace(-50, 50, args.scenarios).tolist()]
+    eager_confidence, _ = eager.predict_latest(data.processed.copy())
+    scripted_confidence, _ = scripted.predict_latest(data.processed.copy())
+    eager_batch = eager.simulate_scenarios(data.processed.copy(), scenarios)
+    scripted_batch = scripted.simulate_scenarios(data.processed.copy(), scenarios)
+
+    diffs = [abs(eager_confidence[k] - scripted_confidence[k]) for k in eager_confidence]
+    for a, b in zip(eager_batch["scenarios"], scripted_batch["scenarios"]):
+        diffs.extend(abs(a["confidence"][k] - b["confidence"][k]) for k in a["confidence"])
+    worst = max(diffs)
+    # Results are rounded to 4 decimals, so allow one unit in the last place on top of the export tolerance
+    ok = worst <= PARITY_TOLERANCE + 1e-4
+    print(f"Quantile parity over {len(scenarios) + 1} windows: max abs diff {worst:.3g} -> {'ok' if ok else 'FAIL'}")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
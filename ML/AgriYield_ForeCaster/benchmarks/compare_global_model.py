@@ -0,0 +1,58 @@
+"""Compare holdout accuracy of the shared per-crop TFT against per-farm TFTs.
+
+Scores both models on the last --holdout-days targets of every farm that has data
+for the crop (farms without their own checkpoint are scored with the global model
+only) and prints per-farm MAE/RMSE/80% coverage plus averages.
+
+Usage (from the repository root):
+    python -m ML.AgriYield_ForeCaster.benchmarks.compare_global_model --crop Wheat --holdout-days 30
+    python -m ML.AgriYield_ForeCaster.benchmarks.compare_global_model --crop Wheat --json > report.json
+"""
+import sys
+import json
+import argparse
+
+from ..Modeling.GlobalModel import compare_with_farm_models, global_model_available
+
+
+def _fmt(metrics, key):
+    return f"{metrics[key]:8.4f}" if metrics else "       -"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Global vs per-farm TFT accuracy")
+    parser.add_argument("--crop", required=True)
+    parser.add_argument("--farms", nargs="*", help="Farm ids (default: every farm with data for the crop)")
+    parser.add_argument("--holdout-days", type=int, default=30)
+    parser.add_argument("--json", action="store_true", help="Print the full report as JSON")
+    args = parser.parse_args(argv)
+
+    if not global_model_available(args.crop):
+        print(f"No global model for {args.crop}; train one with POST /api/v1/train/global first")
+        return 1
+
+    report = compare_with_farm_models(args.crop, args.farms, args.holdout_days)
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return 0
+
+    print(f"{'farm':<20} {'MAE glob':>8} {'MAE farm':>8} {'RMSE glob':>9} {'RMSE farm':>9} "
+          f"{'cov glob':>8} {'cov farm':>8}")
+    for row in report["farms"]:
+        if "error" in row:
+            print(f"{row['farm_id']:<20} error: {row['error']}")
+            continue
+        g, f = row.get("global"), row.get("farm")
+        print(f"{row['farm_id']:<20} {_fmt(g, 'mae')} {_fmt(f, 'mae')} {_fmt(g, 'rmse'):>9} {_fmt(f, 'rmse'):>9} "
+              f"{_fmt(g, 'coverage_80')} {_fmt(f, 'coverage_80')}")
+
+    summary = report["summary"]
+    print(f"\nFarms with both models: {summary['farms_compared']}, "
+          f"global model better on MAE for {summary['global_better_mae']}")
+    for metric in ("mean_mae", "mean_rmse", "mean_coverage_80"):
+        print(f"  {metric:<17} global {summary[metric]['global']}   per-farm {summary[metric]['farm']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,58 @@
+"""Retrain every farm/crop whose data changed, in parallel training processes.
+
+Prints the plan (what would train, what is skipped as unchanged), then trains and
+reports per-model durations plus the parallel speedup (summed model time over wall
+time; close to the process count when the pool scales linearly). Runs are recorded
+in Mongo's TrainingRuns collection unless --no-mongo is given.
+
+Usage (from the repository root):
+    python -m ML.AgriYield_ForeCaster.benchmarks.retrain_all --dry-run
+    python -m ML.AgriYield_ForeCaster.benchmarks.retrain_all --processes 8 --force --crops Wheat
+"""
+import sys
+import json
+import argparse
+
+from ..Jobs.TrainingOrchestrator import TrainingOrchestrator
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Parallel retrain of all farm/crop models")
+    parser.add_argument("--farms", nargs="*", help="Farm ids (default: every farm under the data root)")
+    parser.add_argument("--crops", nargs="*", help="Crops (default: every crop CSV found)")
+    parser.add_argument("--processes", type=int, help="Training processes (default: from the core budget)")
+    parser.add_argument("--mode", choices=("full", "finetune", "auto"), default="auto",
+                        help="auto fine-tunes pairs that already have a checkpoint (default)")
+    parser.add_argument("--force", action="store_true", help="Retrain even if the data hash is unchanged")
+    parser.add_argument("--dry-run", action="store_true", help="Only print what would be trained")
+    parser.add_argument("--no-mongo", action="store_true", help="Do not record runs in Mongo")
+    args = parser.parse_args(argv)
+
+    mongo_service = None
+    if not (args.no_mongo or args.dry_run):
+        from ..MongoDb.MongoService import get_mongo_service
+        mongo_service = get_mongo_service()
+    orchestrator = TrainingOrchestrator(mongo_service, processes=args.processes)
+
+    to_train, skipped = orchestrator.plan(args.farms, args.crops, args.force)
+    processes, threads = orchestrator.pool_shape(len(to_train) or 1)
+    print(f"{len(to_train)} to train, {len(skipped)} skipped; "
+          f"{processes} process(es) x {threads} thread(s)")
+    for entry in skipped:
+        print(f"  skip  {entry['farm_id']}/{entry['crop']}: {entry['reason']}")
+    if args.dry_run:
+        for entry in to_train:
+            print(f"  train {entry['farm_id']}/{entry['crop']} ({entry['size']} bytes)")
+        return 0
+
+    outcome = orchestrator.run(args.farms, args.crops, force=args.force, mode=args.mode)
+    for run in outcome["results"]:
+        detail = f"{run['duration_s']:8.1f}s  val_loss {run['best_val_loss']}" if run["status"] == "success" \
+            else f"error: {run['error']}"
+        print(f"  {run['status']:<7} {run['farm_id']}/{run['crop']}  {detail}")
+    print(json.dumps(outcome["summary"], indent=2))
+    return 0 if outcome["summary"]["failed"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,10 +1,7 @@
-import os
 import logging
 from functools import wraps
 from flask import jsonify
 from datetime import datetime, timedelta
-from pytorch_forecasting import TemporalFusionTransformer
-
 from .Modeling.TFTPredictor import TFTPredictor
 
 # ------------------------- Error Handling Wrapper -------------------------
@@ -50,13 +47,8 @@ def load_tft_model(farm_id: str, crop_name: str, dataset=None) -> TFTPredictor:
     Returns:
         TFTPredictor object
     """
-    model_path = f"trainedCropModels/{farm_id}/{crop_name}/best_model.ckpt"
-
-    if not os.path.exists(model_path):
-        raise FileNotFoundError(f"No model found for crop '{crop_name}' in farm '{farm_id}'")
-
     if dataset is None:
         raise ValueError("TimeSeriesDataSet must be provided to load TFTPredictor")
 
-    model = TemporalFusionTransformer.load_from_checkpoint(model_path)
-    return TFTPredictor(model=model, dataset=dataset)
+    # Served from the in-process registry; raises FileNotFoundError when no checkpoint exists
+    return TFTPredictor.load_best_model(farm_id, crop_name, dataset)
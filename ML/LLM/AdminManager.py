@@ -4,7 +4,7 @@ import threading
 from datetime import datetime, timedelta
 from typing import Dict, List, Any
 from .config import logger, SCRAPING_INTERVALS
-from .utils.weatherutils import fetch_weather_data
+from .utils.weatherutils import fetch_weather_data_batch
 from .utils.newsutils import fetch_agri_news
 from .utils.bulletinUtils import fetch_imd_agromet_bulletin
 
@@ -52,23 +52,16 @@ class AdminManager:
                     {"state": "Uttar Pradesh", "lat": 26.8467, "lon": 80.9462},
                 ]
 
+            # One Open-Meteo request and one bulk upsert for all locations
             success_count = 0
-            for location in locations:
+            for weather_data in fetch_weather_data_batch(locations, self.db):
                 try:
-                    weather_data = fetch_weather_data(
-                        location["lat"],
-                        location["lon"],
-                        self.db
-                    )
-                    if weather_data and "error" not in weather_data:
-                        # Add location info to weather data
-                        weather_data["location"] = location["state"]
-                        self.pinecone_manager.add_weather_data(weather_data, location["state"])
-                        success_count += 1
-                        logger.info(f"Weather data processed for {location['state']}")
+                    self.pinecone_manager.add_weather_data(weather_data, weather_data["location"])
+                    success_count += 1
+                    logger.info(f"Weather data processed for {weather_data['location']}")
 
                 except Exception as e:
-                    logger.error(f"Weather scraping failed for {location['state']}: {e}")
+                    logger.error(f"Weather scraping failed for {weather_data['location']}: {e}")
                     continue
 
             self.last_scrape_times["weather"] = datetime.now()
@@ -0,0 +1,56 @@
+from datetime import timedelta
+from langchain_core.vectorstores import InMemoryVectorStore     # type:ignore
+from langchain_core.embeddings import DeterministicFakeEmbedding    # type:ignore
+from langchain_community.embeddings import HuggingFaceEmbeddings    # type:ignore
+from .config import logger, PINECONE_INDEXES, LOCAL_EMBEDDINGS
+from .PineConeManager import PineconeManager
+
+class NamespacedInMemoryStore:
+    """InMemoryVectorStore per namespace, mirroring Pinecone's namespace arguments"""
+
+    def __init__(self, embeddings):
+        self.embeddings = embeddings
+        self.namespaces = {}
+
+    def _store(self, namespace: str = None) -> InMemoryVectorStore:
+        namespace = namespace or ""
+        if namespace not in self.namespaces:
+            self.namespaces[namespace] = InMemoryVectorStore(self.embeddings)
+        return self.namespaces[namespace]
+
+    def add_documents(self, documents, namespace: str = None, **kwargs):
+        return self._store(namespace).add_documents(documents, **kwargs)
+
+    def as_retriever(self, search_type: str = "similarity", search_kwargs: dict = None):
+        search_kwargs = dict(search_kwargs or {})
+        namespace = search_kwargs.pop("namespace", None)
+        return self._store(namespace).as_retriever(search_type=search_type, search_kwargs=search_kwargs)
+
+class LocalVectorManager(PineconeManager):
+    """In-process vector store backend exposing the same interface as PineconeManager.
+
+    Used for offline development and benchmarks: no Pinecone client is created and
+    every index lives in memory for the lifetime of the process.
+    """
+
+    def __init__(self, default_data_dir: str, embeddings=None):
+        self.pc = None
+        self.embeddings = embeddings or self._default_embeddings()
+        self.vector_stores = {}
+        self.data_expiry = timedelta(hours=24)
+        self.default_data_dir = default_data_dir
+
+        self._setup_indexes()
+
+    def _default_embeddings(self):
+        if LOCAL_EMBEDDINGS == "fake":
+            return DeterministicFakeEmbedding(size=384)
+        return HuggingFaceEmbeddings(
+            model_name="sentence-transformers/all-MiniLM-L6-v2"
+        )
+
+    def _setup_indexes(self):
+        """Create one in-memory store per index type"""
+        for index_type in PINECONE_INDEXES:
+            self.vector_stores[index_type] = NamespacedInMemoryStore(self.embeddings)
+            logger.info(f"Local index ready for {index_type}")
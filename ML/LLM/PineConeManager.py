@@ -1,4 +1,5 @@
 import os
+import re
 import time
 import uuid
 import shutil
@@ -10,7 +11,7 @@ from langchain_community.embeddings import HuggingFaceEmbeddings    # type:ignor
 from langchain.schema import Document   # type:ignore
 from langchain_community.document_loaders import PyPDFLoader    # type:ignore
 from langchain.text_splitter import RecursiveCharacterTextSplitter  # type:ignore
-from .config import logger, PINECONE_INDEXES
+from .config import logger, PINECONE_INDEXES, STATE_PARTITIONED_INDEXES
 from .utils.PDFUtil import save_data_as_pdf
 
 class PineconeManager:
@@ -54,6 +55,26 @@ class PineconeManager:
         """Convert datetime to string for Pinecone compatibility"""
         return dt.isoformat()
 
+    @staticmethod
+    def state_namespace(state: str) -> str:
+        """Pinecone namespace for a state, e.g. 'Uttar Pradesh' -> 'uttar-pradesh'"""
+        return re.sub(r"[^a-z0-9]+", "-", (state or "").strip().lower()).strip("-")
+
+    def _add_partitioned(self, index_type: str, documents: List[Document]):
+        """Write documents to their state namespace and to the default (global) namespace"""
+        by_namespace: Dict[str, List[Document]] = {}
+        for doc in documents:
+            namespace = self.state_namespace(doc.metadata.get("state", ""))
+            if namespace:
+                doc.metadata["namespace"] = namespace
+                by_namespace.setdefault(namespace, []).append(doc)
+
+        store = self.vector_stores[index_type]
+        for namespace, docs in by_namespace.items():
+            store.add_documents(docs, namespace=namespace)
+        # The default namespace keeps a copy so queries without a state still see everything
+        store.add_documents(documents)
+
     def _filter_to_minimal_docs(self, docs: List[Document]) -> List[Document]:
         """Filter documents to minimal metadata"""
         minimal_docs = []
@@ -105,6 +126,7 @@ class PineconeManager:
                 metadata={
                     "type": "weather",
                     "location": location,
+                    "state": weather_data.get("state", location),
                     "timestamp": self._format_timestamp(datetime.now()),
                     "expiry": self._format_timestamp(datetime.now() + self.data_expiry),
                     "source": "open-meteo",
@@ -112,7 +134,7 @@ class PineconeManager:
                 }
             )
 
-            self.vector_stores["weather"].add_documents([document])
+            self._add_partitioned("weather", [document])
             logger.info(f"Weather data added for {location}")
 
         except Exception as e:
@@ -185,7 +207,7 @@ class PineconeManager:
                 )
                 documents.append(document)
 
-            self.vector_stores["bulletins"].add_documents(documents)
+            self._add_partitioned("bulletins", documents)
             logger.info(f"Added {len(bulletins)} bulletins")
 
         except Exception as e:
@@ -336,12 +358,14 @@ class PineconeManager:
             logger.error(f"Error deleting file: {e}")
             return False
 
-    def get_retriever(self, index_type: str, search_kwargs: Dict = None):
-        """Get retriever for specific index type"""
+    def get_retriever(self, index_type: str, search_kwargs: Dict = None, state: str = None):
+        """Get retriever for specific index type, scoped to a state namespace when partitioned"""
         if index_type not in self.vector_stores:
             raise ValueError(f"Unknown index type: {index_type}")
 
-        search_kwargs = search_kwargs or {"k": 3}
+        search_kwargs = dict(search_kwargs or {"k": 3})
+        if state and index_type in STATE_PARTITIONED_INDEXES:
+            search_kwargs["namespace"] = self.state_namespace(state)
         return self.vector_stores[index_type].as_retriever(
             search_type="similarity",
             search_kwargs=search_kwargs
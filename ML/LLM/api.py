@@ -1,5 +1,5 @@
 # api.py
-from flask import Blueprint, request, jsonify, session
+from flask import Blueprint, request, jsonify, session, make_response
 import os
 import logging
 import json
@@ -19,9 +19,13 @@ from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.metrics.pairwise import cosine_similarity
 import numpy as np
 
-from .config import logger, MONGO_URI, MONGO_DB
+from .config import logger, MONGO_URI, MONGO_DB, VECTOR_BACKEND, STATE_PARTITIONED_INDEXES, WEATHER_MONGO_TIMEOUT_MS
 from .PineConeManager import PineconeManager
+from .LocalVectorManager import LocalVectorManager
 from .AdminManager import AdminManager
+from .utils.timingutils import StageTimer, latency_stats
+from .utils.weatherqueryutils import WeatherAnswerer
+from .utils.locationutils import detect_state
 
 # Load environment variables
 load_dotenv()
@@ -51,8 +55,15 @@ def load_questionnaires():
         return {}
 
 # Initialize managers
-pinecone_manager = PineconeManager(PINECONE_API_KEY, DEFAULT_DATA_DIR)
+if VECTOR_BACKEND == "local":
+    pinecone_manager = LocalVectorManager(DEFAULT_DATA_DIR)
+else:
+    pinecone_manager = PineconeManager(PINECONE_API_KEY, DEFAULT_DATA_DIR)
 admin_manager = AdminManager(db, pinecone_manager)
+# Own client so a down Mongo costs the chat path a short wait, not the 30 s default
+weather_client = MongoClient(MONGO_URI, serverSelectionTimeoutMS=WEATHER_MONGO_TIMEOUT_MS,
+                             connectTimeoutMS=WEATHER_MONGO_TIMEOUT_MS)
+weather_answerer = WeatherAnswerer(weather_client[MONGO_DB])
 questionnaire_data = load_questionnaires()
 
 # Enhanced Session Context Management
@@ -594,6 +605,15 @@ ALLOWED_EXTENSIONS = {'pdf'}
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def build_llm():
+    """Chat model used for answer generation (replaced by a stub in offline benchmarks)"""
+    return ChatGoogleGenerativeAI(
+        model="gemini-2.0-flash-exp",
+        google_api_key=GEMINI_API_KEY,
+        temperature=0.3,
+        max_output_tokens=1500
+    )
+
 # FIXED: Proper MultiContextRetriever implementation
 class MultiContextRetriever(BaseRetriever):
     """Proper implementation of multi-context retriever"""
@@ -611,6 +631,7 @@ class MultiContextRetriever(BaseRetriever):
 @Agribot_bp1.route("/chat", methods=["GET", "POST"])
 def chat():
     """Enhanced chat endpoint with multi-index retrieval and session context"""
+    timer = StageTimer()
     try:
         # Get message
         if request.method == "POST":
@@ -623,90 +644,128 @@ def chat():
 
         logger.info(f"Processing query: {msg}")
 
+        # A state named in the query wins; otherwise use the farmer's profile state
+        profile_state = request.values.get("state", "").strip()
+        if profile_state:
+            session['state'] = profile_state
+        state = detect_state(msg) or session.get('state')
+
         # Determine top 2 context types using enhanced NLP
-        top_contexts = determine_top_contexts(msg)
-        context_types = [ctx for ctx, score in top_contexts]
+        with timer.stage("classify"):
+            top_contexts = determine_top_contexts(msg)
+            context_types = [ctx for ctx, score in top_contexts]
 
-        # Add session context preferences if available
-        session_preferences = session_manager.get_context_preferences()
-        if session_preferences and len(context_types) < 2:
-            for pref_ctx in session_preferences:
-                if pref_ctx not in context_types and len(context_types) < 2:
-                    context_types.append(pref_ctx)
+            # Add session context preferences if available
+            session_preferences = session_manager.get_context_preferences()
+            if session_preferences and len(context_types) < 2:
+                for pref_ctx in session_preferences:
+                    if pref_ctx not in context_types and len(context_types) < 2:
+                        context_types.append(pref_ctx)
 
-        # Ensure we have at least one context
-        if not context_types:
-            context_types = ['general']
+            # Ensure we have at least one context
+            if not context_types:
+                context_types = ['general']
 
         logger.info(f"Query: '{msg}' -> Selected contexts: {context_types} with scores: {[score for _, score in top_contexts]}")
 
+        # Structured path: answer factual weather questions straight from Mongo aggregates
+        weather_facts = None
+        if 'weather' in context_types:
+            with timer.stage("weather_lookup"):
+                weather_facts = weather_answerer.lookup(msg)
+            if weather_facts and not weather_answerer.needs_reasoning(msg):
+                answer = WeatherAnswerer.render(weather_facts)
+                session_manager.add_to_history(msg, answer, ['weather'], top_contexts)
+                return _timed_response(_format_enhanced_response(answer, ['weather'], top_contexts), timer, ['weather'])
+
         # Get retrievers for all selected contexts
         all_documents = []
+        if weather_facts:
+            # Give the LLM the exact numbers to reason over
+            all_documents.append(Document(
+                page_content=WeatherAnswerer.render(weather_facts),
+                metadata={"source": "weather_daily", "source_context": "weather"}
+            ))
 
         # ALWAYS include general index for comprehensive coverage
         if 'general' not in context_types:
             context_types.append('general')
 
-        for context_type in context_types:
-            try:
-                retriever = pinecone_manager.get_retriever(context_type)
-                documents = retriever.get_relevant_documents(msg)
-                # Add context metadata to documents
-                for doc in documents:
-                    doc.metadata['source_context'] = context_type
-                all_documents.extend(documents)
-                logger.info(f"Retrieved {len(documents)} documents from {context_type} index")
-            except Exception as e:
-                logger.warning(f"Failed to retrieve from {context_type}: {e}")
-                continue
-
-        # If we have very few documents from specialized contexts, prioritize general
-        specialized_docs = [doc for doc in all_documents if doc.metadata.get('source_context') != 'general']
-        general_docs = [doc for doc in all_documents if doc.metadata.get('source_context') == 'general']
-
-        # If specialized contexts returned few results but general has many, boost general
-        if len(specialized_docs) < 3 and len(general_docs) > 5:
-            logger.info(f"Boosting general index results: {len(general_docs)} documents available")
-            # Keep all general docs and top specialized docs
-            all_documents = general_docs + specialized_docs[:2]
-
-        # Get conversation context
-        conversation_context = session_manager.get_conversation_context(context_types)
-
-        # Initialize LLM
-        llm = ChatGoogleGenerativeAI(
-            model="gemini-2.0-flash-exp",
-            google_api_key=GEMINI_API_KEY,
-            temperature=0.3,
-            max_output_tokens=1500
-        )
-
-        # Create RAG chain with enhanced prompt
-        prompt_template = ChatPromptTemplate.from_template(system_prompt)
-        question_answer_chain = create_stuff_documents_chain(
-            llm, prompt_template, document_variable_name="context"
-        )
-
-        # FIXED: Use proper BaseRetriever implementation
-        multi_retriever = MultiContextRetriever(all_documents)
-        rag_chain = create_retrieval_chain(multi_retriever, question_answer_chain)
+        with timer.stage("retrieve"):
+            for context_type in context_types:
+                try:
+                    with timer.stage(f"retrieve.{context_type}"):
+                        documents = []
+                        if state and context_type in STATE_PARTITIONED_INDEXES:
+                            retriever = pinecone_manager.get_retriever(context_type, state=state)
+                            documents = retriever.get_relevant_documents(msg)
+                        if not documents:
+                            # No state known or empty partition: fall back to global search
+                            retriever = pinecone_manager.get_retriever(context_type)
+                            documents = retriever.get_relevant_documents(msg)
+                    # Add context metadata to documents
+                    for doc in documents:
+                        doc.metadata['source_context'] = context_type
+                    all_documents.extend(documents)
+                    logger.info(f"Retrieved {len(documents)} documents from {context_type} index")
+                except Exception as e:
+                    logger.warning(f"Failed to retrieve from {context_type}: {e}")
+                    continue
+
+        with timer.stage("prompt"):
+            # If we have very few documents from specialized contexts, prioritize general
+            specialized_docs = [doc for doc in all_documents if doc.metadata.get('source_context') != 'general']
+            general_docs = [doc for doc in all_documents if doc.metadata.get('source_context') == 'general']
+
+            # If specialized contexts returned few results but general has many, boost general
+            if len(specialized_docs) < 3 and len(general_docs) > 5:
+                logger.info(f"Boosting general index results: {len(general_docs)} documents available")
+                # Keep all general docs and top specialized docs
+                all_documents = general_docs + specialized_docs[:2]
+
+            # Get conversation context
+            conversation_context = session_manager.get_conversation_context(context_types)
+
+            # Initialize LLM
+            llm = build_llm()
+
+            # Create RAG chain with enhanced prompt
+            prompt_template = ChatPromptTemplate.from_template(system_prompt)
+            question_answer_chain = create_stuff_documents_chain(
+                llm, prompt_template, document_variable_name="context"
+            )
+
+            # FIXED: Use proper BaseRetriever implementation
+            multi_retriever = MultiContextRetriever(all_documents)
+            rag_chain = create_retrieval_chain(multi_retriever, question_answer_chain)
 
         # Get response with enhanced context
-        response = rag_chain.invoke({
-            "input": msg,
-            "conversation_context": conversation_context,
-            "selected_contexts": ", ".join(context_types)
-        })
+        with timer.stage("llm"):
+            response = rag_chain.invoke({
+                "input": msg,
+                "conversation_context": conversation_context,
+                "selected_contexts": ", ".join(context_types)
+            })
         answer = response.get("answer", "").strip()
 
         # Store in session history with context information
         session_manager.add_to_history(msg, answer, context_types, top_contexts)
 
-        return _format_enhanced_response(answer, context_types, top_contexts)
+        return _timed_response(_format_enhanced_response(answer, context_types, top_contexts), timer, context_types)
 
     except Exception as e:
         logger.error(f"Chat error: {e}")
-        return jsonify({"error": f"Service temporarily unavailable: {str(e)}"}), 500
+        return _timed_response((jsonify({"error": f"Service temporarily unavailable: {str(e)}"}), 500), timer, status="error")
+
+def _timed_response(result, timer: StageTimer, context_types: List[str] = None, status: str = "success"):
+    """Attach stage timings to the response, the structured log and the rolling histograms"""
+    timings = timer.as_ms()
+    latency_stats.record(timings)
+    logger.info(timer.to_log(timings, status=status, contexts=context_types or []))
+
+    response = make_response(result)
+    response.headers["X-Timing"] = timer.to_header(timings)
+    return response
 
 def _format_enhanced_response(answer: str, context_types: List[str], top_contexts: List[Tuple[str, float]]) -> str:
     """Format enhanced response showing used contexts"""
@@ -840,7 +899,8 @@ def admin_status():
         status = admin_manager.get_scraping_status()
         return jsonify({
             "status": "success",
-            "data": status
+            "data": status,
+            "chat_latency_ms": latency_stats.snapshot()
         })
     except Exception as e:
         return jsonify({"status": "error", "message": str(e)}), 500
@@ -0,0 +1,215 @@
+"""Offline throughput benchmark for the Agribot /chat RAG path.
+
+Drives the real ``chat()`` view through the Flask test client with the local
+vector store, a deterministic stub LLM and a synthetic corpus built from
+questionData.json. No Pinecone or Gemini access is needed.
+
+Usage (from the repository root):
+    python -m ML.LLM.benchmarks.bench_chat --concurrency 1 4 16 --requests 50 --llm-latency-ms 20
+"""
+import os
+import sys
+import json
+import time
+import random
+import hashlib
+import argparse
+import threading
+import tracemalloc
+from typing import Dict, List
+
+# Must be set before the Agribot module is imported
+os.environ.setdefault("AGRIBOT_VECTOR_BACKEND", "local")
+os.environ.setdefault("AGRIBOT_LOCAL_EMBEDDINGS", "fake")
+
+from flask import Flask     # noqa: E402
+from langchain_core.documents import Document   # type:ignore  # noqa: E402
+from langchain_core.language_models.chat_models import BaseChatModel   # type:ignore  # noqa: E402
+from langchain_core.messages import AIMessage   # type:ignore  # noqa: E402
+from langchain_core.outputs import ChatGeneration, ChatResult   # type:ignore  # noqa: E402
+
+from .. import api as agribot_api  # noqa: E402
+
+
+class StubChatModel(BaseChatModel):
+    """Deterministic chat model: sleeps for a fixed latency and echoes a digest of the prompt"""
+    latency_ms: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "agribot-stub"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        prompt = "\n".join(str(m.content) for m in messages)
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        digest = hashlib.md5(prompt.encode("utf-8")).hexdigest()[:12]
+        text = f"Stub answer {digest} ({len(prompt)} prompt chars)"
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+
+def load_questions(path: str = None) -> Dict[str, List[str]]:
+    """Questions per context type, using the classifier's own questionnaire mapping"""
+    if path:
+        with open(path, "r", encoding="utf-8") as f:
+            agribot_api.questionnaire_data = json.load(f)
+        agribot_api.context_classifier = agribot_api.AdvancedContextClassifier()
+
+    classifier = agribot_api.context_classifier
+    questions = {ctx: list(patterns) for ctx, patterns in classifier.questionnaire_patterns.items() if patterns}
+    if not questions:
+        # No questionData.json available: synthesise questions from the classifier keywords
+        questions = {
+            ctx: [f"What is the {kw} advice for my crop?" for kw in keywords]
+            for ctx, keywords in classifier.context_keywords.items()
+        }
+    return questions
+
+
+def build_corpus(questions: Dict[str, List[str]], docs_per_question: int, seed: int) -> Dict[str, List[Document]]:
+    rng = random.Random(seed)
+    keywords = agribot_api.context_classifier.context_keywords
+    corpus = {}
+    for ctx, ctx_questions in questions.items():
+        docs = []
+        for q_idx, question in enumerate(ctx_questions):
+            for n in range(docs_per_question):
+                filler = " ".join(rng.choice(keywords.get(ctx, ["farming"])) for _ in range(60))
+                docs.append(Document(
+                    page_content=f"{question}\n{filler}",
+                    metadata={"type": ctx, "source": f"synthetic_{ctx}_{q_idx}_{n}"}
+                ))
+        corpus[ctx] = docs
+    return corpus
+
+
+def load_corpus(corpus: Dict[str, List[Document]]) -> int:
+    total = 0
+    for ctx, docs in corpus.items():
+        if ctx in agribot_api.pinecone_manager.vector_stores and docs:
+            agribot_api.pinecone_manager.vector_stores[ctx].add_documents(docs)
+            total += len(docs)
+    return total
+
+
+def parse_timing_header(value: str) -> Dict[str, float]:
+    timings = {}
+    for part in value.split(","):
+        name, _, dur = part.strip().partition(";dur=")
+        if name and dur:
+            timings[name] = float(dur)
+    return timings
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def run_level(app: Flask, queries: List[str], concurrency: int, requests_per_client: int, seed: int) -> Dict:
+    agribot_api.session_manager.conversation_history.clear()
+    agribot_api.session_manager.context_scores.clear()
+    agribot_api.latency_stats.reset()
+
+    stage_samples: Dict[str, List[float]] = {}
+    errors = []
+    lock = threading.Lock()
+
+    def worker(worker_id: int):
+        rng = random.Random(seed + worker_id)
+        client = app.test_client()  # one cookie jar -> one chat session per worker
+        for _ in range(requests_per_client):
+            resp = client.post("/api/agribot/chat", data={"msg": rng.choice(queries)})
+            timings = parse_timing_header(resp.headers.get("X-Timing", ""))
+            with lock:
+                if resp.status_code != 200:
+                    errors.append(resp.status_code)
+                for name, value in timings.items():
+                    stage_samples.setdefault(name, []).append(value)
+
+    tracemalloc.start()
+    baseline_mem, _ = tracemalloc.get_traced_memory()
+    started = time.perf_counter()
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    elapsed = time.perf_counter() - started
+    current_mem, peak_mem = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    total = concurrency * requests_per_client
+    sessions = len(agribot_api.session_manager.conversation_history) or 1
+    return {
+        "concurrency": concurrency,
+        "requests": total,
+        "errors": len(errors),
+        "elapsed_s": round(elapsed, 3),
+        "requests_per_s": round(total / elapsed, 2) if elapsed else 0.0,
+        "sessions": sessions,
+        "memory_per_session_kb": round((current_mem - baseline_mem) / sessions / 1024, 2),
+        "peak_memory_kb": round(peak_mem / 1024, 2),
+        "stages_ms": {
+            name: {
+                "p50": percentile(values, 50),
+                "p95": percentile(values, 95),
+                "p99": percentile(values, 99)
+            }
+            for name, values in sorted(stage_samples.items())
+        }
+    }
+
+
+def print_report(results: List[Dict]):
+    for res in results:
+        print(f"\nconcurrency={res['concurrency']}  requests={res['requests']}  errors={res['errors']}  "
+              f"rps={res['requests_per_s']}  mem/session={res['memory_per_session_kb']} KB  "
+              f"peak={res['peak_memory_kb']} KB")
+        print(f"  {'stage':<24}{'p50':>10}{'p95':>10}{'p99':>10}")
+        for name, pct in res["stages_ms"].items():
+            print(f"  {name:<24}{pct['p50']:>10.3f}{pct['p95']:>10.3f}{pct['p99']:>10.3f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline benchmark for the Agribot /chat endpoint")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--requests", type=int, default=25, help="requests per concurrent client")
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0)
+    parser.add_argument("--docs-per-question", type=int, default=3)
+    parser.add_argument("--questions", help="path to a questionData.json (defaults to the bundled data dir)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", help="write raw results to this file")
+    args = parser.parse_args(argv)
+
+    agribot_api.build_llm = lambda: StubChatModel(latency_ms=args.llm_latency_ms)
+
+    questions = load_questions(args.questions)
+    indexed = load_corpus(build_corpus(questions, args.docs_per_question, args.seed))
+    queries = [q for qs in questions.values() for q in qs]
+    print(f"Indexed {indexed} synthetic documents, {len(queries)} distinct queries")
+
+    app = Flask(__name__)
+    app.secret_key = "agribot-bench"
+    app.register_blueprint(agribot_api.Agribot_bp1, url_prefix="/api/agribot")
+
+    # Warm-up so lazy initialisation is not attributed to the first level
+    run_level(app, queries, 1, 2, args.seed)
+
+    results = [run_level(app, queries, c, args.requests, args.seed) for c in args.concurrency]
+    print_report(results)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    agribot_api.admin_manager.is_running = False
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
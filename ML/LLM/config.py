@@ -25,6 +25,11 @@ PINECONE_API_KEY = os.getenv("PINECONE_API_KEY1", "your-pinecone-api-key")
 PINECONE_ENV = os.getenv("PINECONE_ENV", "us-east-1")
 PINECONE_INDEX_NAME = os.getenv("PINECONE_INDEX_NAME", "agri-chatbot")
 
+# Vector store backend: "pinecone" (default) or "local" (in-process, no network)
+VECTOR_BACKEND = os.getenv("AGRIBOT_VECTOR_BACKEND", "pinecone")
+# Embeddings for the local backend: "huggingface" or "fake" (deterministic hashing, for benchmarks)
+LOCAL_EMBEDDINGS = os.getenv("AGRIBOT_LOCAL_EMBEDDINGS", "huggingface")
+
 # MongoDB
 MONGODB_URI = os.getenv("MONGODB_URI", "mongodb://localhost:27017/")
 DATABASE_NAME = os.getenv("DATABASE_NAME", "agribot")
@@ -53,6 +58,9 @@ PINECONE_INDEXES = {
     "general": "agribot-general"
 }
 
+# Indexes partitioned into one namespace per state (plus the default namespace for global search)
+STATE_PARTITIONED_INDEXES = {"weather", "bulletins"}
+
 # API Configuration
 WEATHER_API_URL = "https://api.open-meteo.com/v1/forecast"
 NEWS_SOURCES = [
@@ -71,4 +79,6 @@ SCRAPING_INTERVALS = {
 
 # MongoDB configuration
 MONGO_URI = "mongodb://localhost:27017/"
-MONGO_DB = "agribot_db"
\ No newline at end of file
+MONGO_DB = "agribot_db"
+# Server-selection timeout for the structured weather lookup; past it the query falls back to RAG
+WEATHER_MONGO_TIMEOUT_MS = int(os.getenv("AGRIBOT_WEATHER_MONGO_TIMEOUT_MS", "500"))
\ No newline at end of file
@@ -1,5 +1,31 @@
+import re
 import requests
 
+INDIAN_STATES = [
+    "Andhra Pradesh", "Arunachal Pradesh", "Assam", "Bihar", "Chhattisgarh", "Goa", "Gujarat",
+    "Haryana", "Himachal Pradesh", "Jharkhand", "Karnataka", "Kerala", "Madhya Pradesh",
+    "Maharashtra", "Manipur", "Meghalaya", "Mizoram", "Nagaland", "Odisha", "Punjab",
+    "Rajasthan", "Sikkim", "Tamil Nadu", "Telangana", "Tripura", "Uttar Pradesh",
+    "Uttarakhand", "West Bengal", "Delhi", "Jammu and Kashmir", "Ladakh", "Puducherry",
+    "Chandigarh", "Andaman and Nicobar Islands", "Lakshadweep",
+    "Dadra and Nagar Haveli and Daman and Diu"
+]
+# Longest names first so "Andhra Pradesh" is not shadowed by a shorter overlap
+_STATE_PATTERNS = [
+    (state, re.compile(rf"\b{re.escape(state.lower())}\b"))
+    for state in sorted(INDIAN_STATES, key=len, reverse=True)
+]
+
+def detect_state(text):
+    """Return the first Indian state/UT named in the text, if any"""
+    if not text:
+        return None
+    text_lower = text.lower()
+    for state, pattern in _STATE_PATTERNS:
+        if pattern.search(text_lower):
+            return state
+    return None
+
 def get_user_location(ip=None):
     try:
         if ip:
@@ -0,0 +1,102 @@
+import json
+import threading
+from collections import deque
+from time import perf_counter_ns
+from typing import Dict, List
+
+
+class _Stage:
+    """Context manager that records one stage into a StageTimer"""
+    __slots__ = ("timer", "name", "start")
+
+    def __init__(self, timer, name: str):
+        self.timer = timer
+        self.name = name
+        self.start = 0
+
+    def __enter__(self):
+        self.start = perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.timer.add(self.name, perf_counter_ns() - self.start)
+        return False
+
+
+class StageTimer:
+    """Per-request monotonic stage timer (values kept in nanoseconds)"""
+
+    def __init__(self):
+        self.started = perf_counter_ns()
+        self.stages: Dict[str, int] = {}
+
+    def stage(self, name: str) -> _Stage:
+        return _Stage(self, name)
+
+    def add(self, name: str, elapsed_ns: int):
+        # Repeated stages (e.g. retries) accumulate
+        self.stages[name] = self.stages.get(name, 0) + elapsed_ns
+
+    def total_ns(self) -> int:
+        return perf_counter_ns() - self.started
+
+    def as_ms(self) -> Dict[str, float]:
+        timings = {name: round(ns / 1e6, 3) for name, ns in self.stages.items()}
+        timings["total"] = round(self.total_ns() / 1e6, 3)
+        return timings
+
+    def to_header(self, timings: Dict[str, float] = None) -> str:
+        """Server-Timing style header value: 'classify;dur=1.2, retrieve.weather;dur=80.1'"""
+        timings = timings or self.as_ms()
+        return ", ".join(f"{name};dur={value}" for name, value in timings.items())
+
+    def to_log(self, timings: Dict[str, float] = None, **extra) -> str:
+        return json.dumps({"event": "chat_timing", **extra, "timings_ms": timings or self.as_ms()})
+
+
+class LatencyStats:
+    """Rolling per-stage latency windows with on-demand percentiles"""
+
+    def __init__(self, window: int = 1000):
+        self.window = window
+        self._samples: Dict[str, deque] = {}
+        self._lock = threading.Lock()
+
+    def record(self, timings_ms: Dict[str, float]):
+        with self._lock:
+            for name, value in timings_ms.items():
+                samples = self._samples.get(name)
+                if samples is None:
+                    samples = self._samples[name] = deque(maxlen=self.window)
+                samples.append(value)
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+
+    @staticmethod
+    def _percentile(ordered: List[float], pct: float) -> float:
+        if not ordered:
+            return 0.0
+        index = min(len(ordered) - 1, max(0, int(round(pct / 100 * (len(ordered) - 1)))))
+        return ordered[index]
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        """Percentiles are computed on read so recording stays O(1)"""
+        with self._lock:
+            copies = {name: list(samples) for name, samples in self._samples.items()}
+
+        result = {}
+        for name, values in copies.items():
+            ordered = sorted(values)
+            result[name] = {
+                "count": len(ordered),
+                "p50": self._percentile(ordered, 50),
+                "p95": self._percentile(ordered, 95),
+                "p99": self._percentile(ordered, 99),
+                "max": ordered[-1] if ordered else 0.0
+            }
+        return result
+
+
+latency_stats = LatencyStats()
@@ -0,0 +1,181 @@
+import re
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from zoneinfo import ZoneInfo
+from pymongo.errors import PyMongoError
+from ..config import logger
+
+IST = ZoneInfo("Asia/Kolkata")
+
+WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+
+# Metric groups a question can ask about, with the weather_daily fields that answer them
+METRIC_KEYWORDS = {
+    "rain": ["rain", "rainfall", "precipitation", "shower", "drizzle", "wet"],
+    "temperature": ["temperature", "temp", "hot", "cold", "heat", "warm", "cool"],
+    "humidity": ["humidity", "humid", "moisture"]
+}
+
+# Questions asking for advice or explanation rather than numbers go to the LLM
+REASONING_CUES = [
+    "should", "why", "can i", "could i", "is it safe", "is it good", "suitable", "advice",
+    "advise", "recommend", "best time", "when to", "when should", "sow", "spray", "irrigate",
+    "harvest", "effect", "impact", "affect", "plan", "compare", "explain",
+    "sowing", "spraying", "irrigating", "irrigation", "harvesting", "planning"
+]
+
+# Whole-word patterns, so "sow" does not fire on "show", "plan" on "plant" or "rain" on "train"
+METRIC_PATTERNS = {
+    metric: re.compile(r"\b(?:" + "|".join(map(re.escape, words)) + r")s?\b")
+    for metric, words in METRIC_KEYWORDS.items()
+}
+REASONING_PATTERN = re.compile(r"\b(?:" + "|".join(map(re.escape, REASONING_CUES)) + r")\b")
+
+class WeatherAnswerer:
+    """Answers simple weather questions from the weather_daily aggregates without vector search.
+
+    ``db`` should come from a client with a short server-selection timeout: an unreachable
+    Mongo then costs one short wait per refresh interval and the query falls back to RAG.
+    """
+
+    def __init__(self, db, refresh_seconds: int = 600):
+        self.db = db
+        self.refresh_seconds = refresh_seconds
+        self._locations: Dict[str, tuple] = {}
+        self._loaded_at = 0.0
+
+    def _known_locations(self) -> Dict[str, tuple]:
+        """lower-case name -> (field, value), refreshed periodically from Mongo"""
+        if time.monotonic() - self._loaded_at > self.refresh_seconds:
+            try:
+                locations = {}
+                for state in self.db.weather_daily.distinct("state"):
+                    if state:
+                        locations[state.lower()] = ("state", state)
+                for location in self.db.weather_daily.distinct("location"):
+                    if location:
+                        locations[location.lower()] = ("location", location)
+                self._locations = locations
+            except PyMongoError as e:
+                # Keep the last known set; with none, every query takes the RAG path until the next refresh
+                logger.warning(f"Could not load weather locations: {e}")
+            self._loaded_at = time.monotonic()
+        return self._locations
+
+    def extract_location(self, query: str) -> Optional[tuple]:
+        query_lower = query.lower()
+        # Longest match first so "Uttar Pradesh" wins over a shorter overlapping name
+        for name in sorted(self._known_locations(), key=len, reverse=True):
+            if re.search(rf"\b{re.escape(name)}\b", query_lower):
+                return self._locations[name]
+        return None
+
+    @staticmethod
+    def extract_dates(query: str, today=None) -> List[str]:
+        query_lower = query.lower()
+        today = today or datetime.now(IST).date()
+
+        iso = re.search(r"\b(\d{4}-\d{2}-\d{2})\b", query_lower)
+        if iso:
+            return [iso.group(1)]
+
+        span = re.search(r"\bnext (\d+) days\b", query_lower)
+        if span:
+            days = max(1, min(int(span.group(1)), 7))
+            return [(today + timedelta(days=i)).isoformat() for i in range(1, days + 1)]
+        if "this week" in query_lower:
+            return [(today + timedelta(days=i)).isoformat() for i in range(7)]
+
+        if "day after tomorrow" in query_lower:
+            return [(today + timedelta(days=2)).isoformat()]
+        if "tomorrow" in query_lower:
+            return [(today + timedelta(days=1)).isoformat()]
+
+        for index, weekday in enumerate(WEEKDAYS):
+            if re.search(rf"\b{weekday}\b", query_lower):
+                offset = (index - today.weekday()) % 7
+                return [(today + timedelta(days=offset)).isoformat()]
+
+        return [today.isoformat()]
+
+    @staticmethod
+    def requested_metrics(query: str) -> List[str]:
+        query_lower = query.lower()
+        metrics = [m for m, pattern in METRIC_PATTERNS.items() if pattern.search(query_lower)]
+        return metrics or list(METRIC_KEYWORDS)
+
+    @staticmethod
+    def needs_reasoning(query: str) -> bool:
+        query_lower = query.lower()
+        return REASONING_PATTERN.search(query_lower) is not None
+
+    def lookup(self, query: str) -> Optional[Dict]:
+        """Structured facts for a weather query, or None when location/data is unknown"""
+        location = self.extract_location(query)
+        if not location:
+            return None
+
+        field, value = location
+        dates = self.extract_dates(query)
+        try:
+            records = list(self.db.weather_daily.find(
+                {field: value, "date": {"$in": dates}},
+                {"_id": 0},
+                sort=[("location", 1), ("date", 1)]
+            ))
+        except PyMongoError as e:
+            logger.warning(f"Weather lookup failed for {value}: {e}")
+            return None
+
+        if not records:
+            return None
+
+        return {
+            "location": value,
+            "dates": dates,
+            "metrics": self.requested_metrics(query),
+            "records": records
+        }
+
+    @staticmethod
+    def render(facts: Dict) -> str:
+        lines = [f"**Forecast for {facts['location']}**", ""]
+        # A state query matches every location in it: one block per location, not repeated dates
+        by_location: Dict[str, List[Dict]] = {}
+        for record in facts["records"]:
+            by_location.setdefault(record.get("location") or facts["location"], []).append(record)
+
+        for name, records in by_location.items():
+            if len(by_location) > 1:
+                lines.append(f"_{name}_")
+            for record in records:
+                lines.append(WeatherAnswerer._render_record(record, facts["metrics"]))
+            if len(by_location) > 1:
+                lines.append("")
+
+        updated = facts["records"][0].get("updated_at")
+        if updated:
+            if lines[-1]:
+                lines.append("")
+            lines.append(f"_Source: Open-Meteo forecast, updated {updated:%Y-%m-%d %H:%M} UTC_")
+        return "\n".join(lines).rstrip()
+
+    @staticmethod
+    def _render_record(record: Dict, metrics: List[str]) -> str:
+        parts = []
+        if "temperature" in metrics:
+            parts.append(
+                f"🌡️ {record.get('temperature_min', 'N/A')}–{record.get('temperature_max', 'N/A')}°C "
+                f"(avg {record.get('temperature_avg', 'N/A')}°C)"
+            )
+        if "rain" in metrics:
+            precipitation = record.get("precipitation_sum")
+            if precipitation is None:
+                outlook = "precipitation N/A"
+            else:
+                outlook = "no rain expected" if precipitation == 0 else f"{precipitation} mm precipitation"
+            parts.append(f"🌧️ {outlook}")
+        if "humidity" in metrics:
+            parts.append(f"💧 humidity {record.get('humidity_avg', 'N/A')}%")
+        return f"- **{record['date']}**: " + ", ".join(parts)
@@ -1,6 +1,7 @@
-import requests, json, numpy as np, os
+import requests, json, numpy as np, os, warnings
 from datetime import datetime
-from ..config import DEFAULT_DATA_DIR
+from pymongo import UpdateOne, ASCENDING
+from ..config import DEFAULT_DATA_DIR, WEATHER_API_URL
 from ..config import logger
 
 def fetch_weather_data(lat, lon, db):
@@ -27,3 +28,149 @@ def fetch_weather_data(lat, lon, db):
     except Exception as e:
         logger.error(f"Weather fetch failed: {e}")
         return {"error": str(e)}
+
+
+HOURLY_VARIABLES = ["temperature_2m", "relative_humidity_2m", "precipitation", "rain"]
+MAX_LOCATIONS_PER_REQUEST = 100
+_weather_indexes_ready = False
+
+def _ensure_weather_indexes(db):
+    """Create the (location, date) upsert key once per process"""
+    global _weather_indexes_ready
+    if _weather_indexes_ready:
+        return
+    try:
+        db.weather_daily.create_index([("location", ASCENDING), ("date", ASCENDING)], unique=True)
+        db.weather_daily.create_index([("state", ASCENDING), ("date", ASCENDING)])
+        _weather_indexes_ready = True
+    except Exception as e:
+        logger.warning(f"Weather index creation failed: {e}")
+
+def _stack_hourly(payloads, variable, hours):
+    """(locations x hours) float matrix; missing values become NaN"""
+    rows = []
+    for p in payloads:
+        values = (p.get("hourly", {}).get(variable) or [])[:hours]
+        rows.append(values + [np.nan] * (hours - len(values)))
+    return np.array(rows, dtype=float)
+
+def fetch_weather_data_batch(locations, db, forecast_days=7, save_json=False):
+    """Fetch forecasts for many locations in one Open-Meteo call.
+
+    Daily aggregates for every location are computed in one vectorized pass and
+    upserted into ``weather_daily`` keyed by (location, date), so repeated
+    scrapes replace documents instead of adding new ones. Returns one summary
+    record per location in the same shape as ``fetch_weather_data``.
+    """
+    if not locations:
+        return []
+    if len(locations) > MAX_LOCATIONS_PER_REQUEST:
+        summaries = []
+        for start in range(0, len(locations), MAX_LOCATIONS_PER_REQUEST):
+            chunk = locations[start:start + MAX_LOCATIONS_PER_REQUEST]
+            summaries.extend(fetch_weather_data_batch(chunk, db, forecast_days, save_json))
+        return summaries
+
+    params = {
+        "latitude": ",".join(str(loc["lat"]) for loc in locations),
+        "longitude": ",".join(str(loc["lon"]) for loc in locations),
+        "hourly": ",".join(HOURLY_VARIABLES),
+        "timezone": "Asia/Kolkata",
+        "forecast_days": forecast_days
+    }
+    try:
+        res = requests.get(WEATHER_API_URL, params=params, timeout=20)
+        res.raise_for_status()
+        data = res.json()
+    except Exception as e:
+        logger.error(f"Batched weather fetch failed: {e}")
+        return []
+
+    # A single coordinate pair returns an object, several return a list
+    payloads = data if isinstance(data, list) else [data]
+    if len(payloads) != len(locations):
+        logger.error(f"Weather API returned {len(payloads)} results for {len(locations)} locations")
+        return []
+
+    times = payloads[0].get("hourly", {}).get("time", [])
+    days = len(times) // 24
+    if days == 0:
+        logger.error("Weather API returned no hourly data")
+        return []
+    hours = days * 24
+    dates = [t[:10] for t in times[:hours:24]]
+
+    temperature = _stack_hourly(payloads, "temperature_2m", hours)
+    humidity = _stack_hourly(payloads, "relative_humidity_2m", hours)
+    precipitation = _stack_hourly(payloads, "precipitation", hours)
+    rain = _stack_hourly(payloads, "rain", hours)
+
+    # (locations x days x 24) views for daily aggregation
+    n = len(locations)
+    daily_temp = temperature.reshape(n, days, 24)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", category=RuntimeWarning)  # all-NaN slices
+        aggregates = {
+            "temperature_avg": np.nanmean(daily_temp, axis=2),
+            "temperature_max": np.nanmax(daily_temp, axis=2),
+            "temperature_min": np.nanmin(daily_temp, axis=2),
+            "humidity_avg": np.nanmean(humidity.reshape(n, days, 24), axis=2),
+            "precipitation_sum": np.nansum(precipitation.reshape(n, days, 24), axis=2),
+            "rain_sum": np.nansum(rain.reshape(n, days, 24), axis=2)
+        }
+        period_temp = np.nanmean(temperature, axis=1)
+        period_humidity = np.nanmean(humidity, axis=1)
+    aggregates = {key: np.round(values, 2) for key, values in aggregates.items()}
+
+    now = datetime.utcnow()
+    operations = []
+    summaries = []
+    for i, loc in enumerate(locations):
+        name = loc.get("name", loc["state"])
+        daily = []
+        for d, date in enumerate(dates):
+            doc = {
+                "location": name,
+                "state": loc["state"],
+                "date": date,
+                "latitude": loc["lat"],
+                "longitude": loc["lon"],
+                "updated_at": now
+            }
+            for key, values in aggregates.items():
+                value = values[i, d]
+                doc[key] = None if np.isnan(value) else float(value)
+            daily.append(doc)
+            operations.append(UpdateOne(
+                {"location": name, "date": date},
+                {"$set": doc},
+                upsert=True
+            ))
+
+        summaries.append({
+            "latitude": loc["lat"],
+            "longitude": loc["lon"],
+            "location": name,
+            "state": loc["state"],
+            "temperature_avg": None if np.isnan(period_temp[i]) else float(period_temp[i]),
+            "humidity_avg": None if np.isnan(period_humidity[i]) else float(period_humidity[i]),
+            "timestamp": now,
+            "daily": daily
+        })
+
+    try:
+        _ensure_weather_indexes(db)
+        result = db.weather_daily.bulk_write(operations, ordered=False)
+        logger.info(
+            f"Weather upserted for {n} locations x {days} days "
+            f"({result.upserted_count} new, {result.modified_count} updated)"
+        )
+    except Exception as e:
+        logger.error(f"Weather bulk write failed: {e}")
+
+    if save_json:
+        file = os.path.join(DEFAULT_DATA_DIR, "weather", f"weather_batch_{now.strftime('%Y%m%d_%H%M%S')}.json")
+        with open(file, "w", encoding="utf-8") as f:
+            json.dump(summaries, f, default=str, indent=2)
+
+    return summaries